@@ -0,0 +1,45 @@
+"""Keyset (cursor) pagination helpers"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """Encode the (created_at, id) of the last row of a page"""
+    value = f"{created_at.isoformat() if created_at else ''}|{row_id}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(created_at_column, id_column, cursor: str, descending: bool = False):
+    """WHERE clause selecting rows after the cursor in (created_at, id) order"""
+    created_at, row_id = decode_cursor(cursor)
+    
+    if created_at is None:
+        return id_column < row_id if descending else id_column > row_id
+    
+    if descending:
+        return or_(
+            created_at_column < created_at,
+            and_(created_at_column == created_at, id_column < row_id)
+        )
+    return or_(
+        created_at_column > created_at,
+        and_(created_at_column == created_at, id_column > row_id)
+    )
@@ -1,32 +1,96 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 from typing import List, Optional
+import io
 import os
+import secrets
+import tempfile
+import time
 from pathlib import Path
 
-from app.core.database import get_db
+from app.api.pagination import encode_cursor, after_cursor
+from app.core.database import get_async_db
+from app.core.write_queue import get_write_queue
 from app.core.config import get_settings
-from app.models.face import Face, MatchResult
-from app.services import face_recognition_service
+from app.core.metrics import observe_stage, timed
+from app.core.profiler import ProfilerBusy, get_memory_profiler, get_stack_sampler
+from app.core.tracing import get_tracer
+from app.models.face import DEFAULT_COLLECTION, Face, MatchResult
+from app.services import clustering_service, collection_service, dedup_service, import_service
+from app.services.face_recognition_service import get_face_service
+from app.services.phash_service import get_perceptual_cache
+from app.services.retention_service import (
+    QUERIES, DETECTIONS, CROPS, category_dir, get_retention_manager
+)
+from app.services.clustering_service import get_gallery_clusterer
+from app.services.history_service import get_history_writer
+from app.services.identity_index import get_index_registry
+from app.services.import_service import get_bulk_importer
+from app.services.search_filter import SearchFilter
+from app.services.stats_service import get_stats_service
+from app.services.thumbnail_service import get_thumbnail_service, thumbnail_url
 
 settings = get_settings()
+face_recognition_service = get_face_service()
 router = APIRouter(prefix="/api", tags=["face-recognition"])
 
 
+def _collection(collection: Optional[str]) -> str:
+    """Validated collection name of a request (400 otherwise)"""
+    try:
+        return collection_service.validate_collection(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Guard of destructive / expensive maintenance endpoints (X-Admin-Token)"""
+    if not settings.ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard of the profiling endpoints (PROFILER_ENABLED + X-Admin-Token)"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    _require_admin_token(x_admin_token)
+
+
+def _require_trace_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard of the slow-trace endpoints (TRACE_ENABLED + X-Admin-Token)"""
+    if not settings.TRACE_ENABLED:
+        raise HTTPException(status_code=404, detail="Tracing disabled")
+    _require_admin_token(x_admin_token)
+
+
 @router.post("/detect-face")
 async def detect_face(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    render: bool = Form(False),
+    crop: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Detect faces in uploaded image
     
+    By default only box coordinates and confidences are returned: the image
+    is decoded in memory and nothing is encoded or written to disk. The
+    client draws the overlay itself.
+    
+    Args:
+        file: Image file
+        render: Also save the image with drawn boxes
+        crop: Also save one cropped image per face
+    
     Returns:
         - Number of faces detected
-        - Face locations
-        - Image path with drawn boxes
+        - Face boxes with confidences
         - Warning if multiple faces detected
-        - Cropped face images
+        - Image path with drawn boxes / cropped face images (only on request)
     """
     try:
         # Validate file
@@ -37,7 +101,8 @@ async def detect_face(
             )
         
         # Read file content
-        content = await file.read()
+        with timed("upload_read"):
+            content = await file.read()
         
         # Validate image
         if not face_recognition_service.validate_image(content):
@@ -47,31 +112,50 @@ async def detect_face(
         if len(content) > settings.MAX_FILE_SIZE:
             raise HTTPException(status_code=400, detail="File too large")
         
-        # Save file
-        file_path = face_recognition_service.save_uploaded_file(content, file.filename)
+        # Decode in memory
+        image = face_recognition_service.decode_image(content)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Detect faces
-        face_locations = face_recognition_service.detect_faces(file_path)
+        # Detect faces (reused for near-identical images seen before)
+        faces = get_perceptual_cache().get_face_boxes(image)
+        face_locations = [(f["top"], f["right"], f["bottom"], f["left"]) for f in faces]
         
-        # Draw boxes around faces
+        file_path = None
         output_path = None
         cropped_faces = []
         warning = None
         
         if face_locations:
-            output_path = face_recognition_service.draw_face_boxes(file_path, face_locations)
-            
             # ⚠️ Warning if multiple faces
             if len(face_locations) > 1:
                 warning = f"⚠️ Multiple faces detected ({len(face_locations)}). For Add to Database, please use single-face images."
             
-            # 🔪 Auto-crop each face
-            cropped_faces = face_recognition_service.crop_faces(file_path, face_locations)
+            if render or crop:
+                file_path = face_recognition_service.save_uploaded_file(content, file.filename, DETECTIONS)
+            
+            # Draw boxes around faces
+            if render:
+                output_path = face_recognition_service.draw_face_boxes(file_path, face_locations)
+            
+            # 🔪 Crop each face
+            if crop:
+                cropped_faces = face_recognition_service.crop_faces(
+                    file_path, face_locations, output_dir=category_dir(CROPS)
+                )
+        
+        height, width = image.shape[:2]
         
         return {
             "success": True,
             "num_faces": len(face_locations),
+            "faces": [
+                {"box": {k: f[k] for k in ("x", "y", "w", "h")}, "confidence": f["confidence"]}
+                for f in faces
+            ],
             "face_locations": face_locations,
+            "image_width": width,
+            "image_height": height,
             "original_image": file_path,
             "detected_image": output_path,
             "cropped_faces": cropped_faces,
@@ -90,7 +174,9 @@ async def add_face(
     file: UploadFile = File(...),
     name: str = Form(...),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    duplicate_policy: Optional[str] = Form(None),
+    collection: str = Form(DEFAULT_COLLECTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Add a new face to the database
@@ -99,11 +185,22 @@ async def add_face(
         file: Image file containing face
         name: Name of the person
         description: Optional description
+        duplicate_policy: reject / merge / keep for a near-identical face of
+            the same name (default ENROLL_DUPLICATE_POLICY)
+        collection: Collection (gallery partition) to enroll into
     
     Returns:
-        Created face record
+        Created (or merged) face record
     """
     try:
+        collection = _collection(collection)
+        policy = duplicate_policy or settings.ENROLL_DUPLICATE_POLICY
+        if policy not in dedup_service.POLICIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid duplicate_policy. Allowed: {', '.join(dedup_service.POLICIES)}"
+            )
+        
         # Validate file type
         if not file.filename.lower().endswith(tuple(settings.ALLOWED_EXTENSIONS)):
             raise HTTPException(
@@ -112,45 +209,74 @@ async def add_face(
             )
         
         # Read and validate file
-        content = await file.read()
+        with timed("upload_read"):
+            content = await file.read()
         if not face_recognition_service.validate_image(content):
             raise HTTPException(status_code=400, detail="Invalid image file")
         
         if len(content) > settings.MAX_FILE_SIZE:
             raise HTTPException(status_code=400, detail="File too large")
         
-        # Save file
-        file_path = face_recognition_service.save_uploaded_file(content, file.filename)
+        image = face_recognition_service.decode_image(content)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Get face encoding
-        encoding = face_recognition_service.get_face_encoding(file_path)
+        # Always encoded fresh: a pHash-cached encoding may belong to a
+        # different person in a similar photo and would corrupt the gallery
+        encoding = face_recognition_service.get_face_encoding(image)
         
         if encoding is None:
-            # Clean up file
-            os.remove(file_path)
             raise HTTPException(
                 status_code=400,
                 detail="No face detected in image. Please upload a clear face image."
             )
         
+        # Save file
+        file_path = face_recognition_service.save_uploaded_file(content, file.filename)
+        
         # Serialize encoding
         encoding_bytes = face_recognition_service.encode_face_to_bytes(encoding)
         
-        # Create database record
+        # Create database record; the near-duplicate check against faces of
+        # the same name runs in the same write job
         new_face = Face(
+            collection=collection,
             name=name,
             description=description,
             image_path=file_path,
             encoding=encoding_bytes
         )
         
-        db.add(new_face)
-        db.commit()
-        db.refresh(new_face)
+        try:
+            status, face, duplicate = await dedup_service.enroll(new_face, encoding, policy)
+        except Exception:
+            os.remove(file_path)
+            raise
+        
+        if status != dedup_service.ADDED:
+            # Nothing references the saved upload
+            os.remove(file_path)
+        
+        if status == dedup_service.REJECTED:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Near-duplicate of face #{duplicate[0]} ({name}), distance {duplicate[1]:.3f}",
+                headers={"X-Duplicate-Of": str(duplicate[0])}
+            )
+        if status == dedup_service.MERGED:
+            return {
+                "success": True,
+                "face": face.to_dict(),
+                "merged": True,
+                "duplicate_of": duplicate[0],
+                "message": f"Merged into existing face #{duplicate[0]} for {name}"
+            }
         
         return {
             "success": True,
-            "face": new_face.to_dict(),
+            "face": face.to_dict(),
+            "merged": False,
+            "duplicate_of": duplicate[0] if duplicate else None,
             "message": f"Successfully added face for {name}"
         }
     
@@ -164,7 +290,8 @@ async def add_face(
 async def batch_add_faces(
     file: UploadFile = File(...),
     names: str = Form(...),  # Comma-separated names
-    db: Session = Depends(get_db)
+    collection: str = Form(DEFAULT_COLLECTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     🔥 Batch add multiple faces from one image with multiple people
@@ -172,11 +299,14 @@ async def batch_add_faces(
     Args:
         file: Image file containing multiple faces
         names: Comma-separated names (e.g., "John, Jane, Bob")
+        collection: Collection (gallery partition) to enroll into
     
     Returns:
         List of added faces
     """
     try:
+        collection = _collection(collection)
+        
         # Validate file
         if not file.filename.lower().endswith(tuple(settings.ALLOWED_EXTENSIONS)):
             raise HTTPException(
@@ -185,7 +315,8 @@ async def batch_add_faces(
             )
         
         # Read and validate
-        content = await file.read()
+        with timed("upload_read"):
+            content = await file.read()
         if not face_recognition_service.validate_image(content):
             raise HTTPException(status_code=400, detail="Invalid image file")
         
@@ -212,7 +343,8 @@ async def batch_add_faces(
         # Crop faces
         cropped_faces = face_recognition_service.crop_faces(file_path, face_locations)
         
-        # Add each face to database
+        # Add each face to database (one commit for the whole group)
+        new_faces = []
         added_faces = []
         for idx, (cropped_path, name) in enumerate(zip(cropped_faces, name_list)):
             # Get encoding
@@ -222,16 +354,24 @@ async def batch_add_faces(
                 encoding_bytes = face_recognition_service.encode_face_to_bytes(encoding)
                 
                 new_face = Face(
+                    collection=collection,
                     name=name,
                     description=f"Auto-added from batch (face #{idx + 1})",
                     image_path=cropped_path,
                     encoding=encoding_bytes
                 )
                 
-                db.add(new_face)
+                new_faces.append(new_face)
                 added_faces.append(name)
         
-        db.commit()
+        if new_faces:
+            def insert_faces(session):
+                session.add_all(new_faces)
+                get_stats_service().faces_added(session, new_faces)
+                get_index_registry().faces_added(session, new_faces)
+                return new_faces
+            
+            await get_write_queue().submit(insert_faces)
         
         return {
             "success": True,
@@ -246,11 +386,173 @@ async def batch_add_faces(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/import-faces")
+async def import_faces(
+    archive: UploadFile = File(...),
+    manifest: Optional[UploadFile] = File(None),
+    collection: str = Form(DEFAULT_COLLECTION),
+    wait: bool = Form(False)
+):
+    """
+    Bulk-enroll every image of a zip / tar archive as one background job
+    
+    Args:
+        archive: .zip or .tar(.gz) archive of face images
+        manifest: Optional CSV (filename,name,description); a manifest.csv
+            inside the archive is used otherwise
+        collection: Collection (gallery partition) to enroll into
+        wait: Block until the import finishes and return the full report
+    
+    Returns:
+        Import job (poll /api/import-faces/{job_id} for progress and errors)
+    """
+    staged_path = None
+    try:
+        collection = _collection(collection)
+        
+        # Stage the upload once; entries are read from it one at a time
+        max_bytes = settings.IMPORT_MAX_ARCHIVE_MB * 1024 * 1024
+        fd, staged_path = tempfile.mkstemp(prefix="import_", suffix=Path(archive.filename or "").suffix)
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await archive.read(1024 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=400, detail="Archive too large")
+                f.write(chunk)
+        
+        # Unsupported or corrupt archives are rejected before a job is queued
+        await run_in_threadpool(import_service.validate_archive, staged_path)
+        
+        manifest_rows = None
+        if manifest is not None and manifest.filename:
+            manifest_rows = import_service.read_manifest(io.BytesIO(await manifest.read()))
+        
+        job = get_bulk_importer().submit(staged_path, archive.filename or "archive", manifest_rows, collection)
+        staged_path = None
+        
+        if wait:
+            await run_in_threadpool(job.wait)
+        
+        return {
+            "success": True,
+            "job": job.to_dict(include_errors=job.done),
+            "message": job.message or f"Import {job.id} queued"
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if staged_path and os.path.exists(staged_path):
+            os.remove(staged_path)
+
+
+@router.get("/import-faces")
+async def list_import_jobs():
+    """List recent bulk import jobs"""
+    return {
+        "success": True,
+        "jobs": get_bulk_importer().list_jobs()
+    }
+
+
+@router.get("/import-faces/{job_id}")
+async def get_import_job(job_id: str):
+    """Get progress and per-file error report of a bulk import job"""
+    job = get_bulk_importer().get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    
+    return {
+        "success": True,
+        "job": job.to_dict()
+    }
+
+
+@router.post("/clusters", dependencies=[Depends(_require_admin_token)])
+async def start_clustering(
+    threshold: Optional[float] = Form(None),
+    method: str = Form(clustering_service.COMPONENTS),
+    collection: Optional[str] = Form(None),
+    wait: bool = Form(False)
+):
+    """
+    Cluster the whole gallery by similarity as a background job
+    
+    Args:
+        threshold: Max cosine distance linking two faces (default CLUSTER_DISTANCE)
+        method: "components" (single linkage) or "average"
+        collection: Only this collection (default: whole gallery)
+        wait: Block until the job finishes
+    
+    Returns:
+        Clustering job (poll /api/clusters/{job_id}; clusters at /api/clusters/{job_id}/results)
+    """
+    try:
+        job = get_gallery_clusterer().submit(
+            threshold, method, _collection(collection) if collection else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if wait:
+        await run_in_threadpool(job.wait)
+    
+    return {
+        "success": True,
+        "job": job.to_dict(),
+        "message": job.message or f"Clustering {job.id} queued"
+    }
+
+
+@router.get("/clusters")
+async def list_clustering_jobs():
+    """List recent gallery clustering jobs"""
+    return {
+        "success": True,
+        "jobs": get_gallery_clusterer().list_jobs()
+    }
+
+
+@router.get("/clusters/{job_id}")
+async def get_clustering_job(job_id: str):
+    """Get progress and summary of a gallery clustering job"""
+    job = get_gallery_clusterer().get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Clustering job not found")
+    
+    return {
+        "success": True,
+        "job": job.to_dict()
+    }
+
+
+@router.get("/clusters/{job_id}/results")
+async def get_clustering_results(job_id: str):
+    """Download the clusters of a finished job (JSONL, one cluster per line)"""
+    job = get_gallery_clusterer().get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Clustering job not found")
+    if job.status != clustering_service.COMPLETED or not os.path.exists(job.output_path):
+        raise HTTPException(status_code=409, detail=f"Clustering job is {job.status}")
+    
+    return FileResponse(job.output_path, media_type="application/x-ndjson", filename=f"clusters_{job.id}.jsonl")
+
+
 @router.post("/search-face")
 async def search_face(
     file: UploadFile = File(...),
     top_k: int = Form(5),
-    db: Session = Depends(get_db)
+    created_after: Optional[str] = Form(None),
+    created_before: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    names: Optional[str] = Form(None),
+    collection: str = Form(DEFAULT_COLLECTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search for similar faces in database
@@ -258,11 +560,23 @@ async def search_face(
     Args:
         file: Image file containing face to search
         top_k: Number of top results to return
+        created_after: Only faces enrolled at or after this ISO date/datetime
+        created_before: Only faces enrolled before this ISO date/datetime
+        description: Only faces whose description contains this text
+        names: Only these comma-separated names
+        collection: Collection (gallery partition) to search
     
     Returns:
         List of matching faces with confidence scores
     """
     try:
+        collection = _collection(collection)
+        try:
+            face_filter = SearchFilter.from_params(created_after, created_before, description, names)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+
         # Validate file
         if not file.filename.lower().endswith(tuple(settings.ALLOWED_EXTENSIONS)):
             raise HTTPException(
@@ -271,43 +585,62 @@ async def search_face(
             )
         
         # Read and validate file
-        content = await file.read()
+        with timed("upload_read"):
+            content = await file.read()
         if not face_recognition_service.validate_image(content):
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Save file temporarily
-        file_path = face_recognition_service.save_uploaded_file(content, file.filename)
+        image = face_recognition_service.decode_image(content)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Get face encoding
-        encoding = face_recognition_service.get_face_encoding(file_path)
+        # Get face encoding (reused for near-identical images seen before)
+        with timed("query_encode"):
+            encoding = get_perceptual_cache().get_encoding(image)
         
         if encoding is None:
-            os.remove(file_path)
             raise HTTPException(
                 status_code=400,
                 detail="No face detected in image. Please upload a clear face image."
             )
         
-        # Search for similar faces
-        results = face_recognition_service.search_face(encoding, db, top_k)
+        # Save file temporarily (swept by the retention manager)
+        file_path = face_recognition_service.save_uploaded_file(content, file.filename, QUERIES)
+        
+        # Search for similar faces (identity prototypes first, then their members)
+        identities = None
+        search_start = time.perf_counter()
+        if settings.IDENTITY_INDEX_ENABLED:
+            results, identities = await face_recognition_service.search_identities_async(
+                encoding, db, top_k, face_filter, collection
+            )
+        else:
+            results = await face_recognition_service.search_face_async(
+                encoding, db, top_k, face_filter, collection
+            )
+        observe_stage("search", time.perf_counter() - search_start)
+        for result in results:
+            result["face"]["thumbnail_url"] = thumbnail_url(result["face"]["image_path"])
         
-        # Save match result for best match
+        # Save match result for best match (buffered, off the request path)
         if results:
             best_match = results[0]
-            match_result = MatchResult(
-                query_image_path=file_path,
-                matched_face_id=best_match["face"]["id"] if best_match["is_match"] else None,
-                distance=best_match["distance"],
-                confidence=best_match["confidence"]
-            )
-            db.add(match_result)
-            db.commit()
+            with timed("history_record"):
+                get_history_writer().record(
+                    query_image_path=file_path,
+                    matched_face_id=best_match["face"]["id"] if best_match["is_match"] else None,
+                    distance=best_match["distance"],
+                    confidence=best_match["confidence"]
+                )
         
         return {
             "success": True,
             "query_image": file_path,
+            "collection": collection,
             "num_results": len(results),
             "results": results,
+            "identities": identities,
+            "filter": None if face_filter.empty else face_filter.to_dict(),
             "message": f"Found {len(results)} matching face(s)" if results else "No matches found"
         }
     
@@ -321,25 +654,59 @@ async def search_face(
 async def get_all_faces(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    collection: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get all faces from database
+    Get all faces from database (oldest first)
     
     Args:
-        skip: Number of records to skip
+        skip: Number of records to skip (legacy; prefer cursor)
         limit: Maximum number of records to return
+        cursor: next_cursor of the previous page
+        name_prefix: Only faces whose name starts with this prefix
+        collection: Only faces of this collection (default: all)
     
     Returns:
-        List of face records
+        List of face records and the cursor of the next page
     """
     try:
-        faces = db.query(Face).offset(skip).limit(limit).all()
+        query = select(Face).options(defer(Face.encoding))
+        
+        if collection is not None:
+            query = query.where(Face.collection == _collection(collection))
+        
+        if name_prefix:
+            # Range predicate so the name index is used (LIKE may not be)
+            query = query.where(Face.name >= name_prefix, Face.name < name_prefix + "\uffff")
+        
+        if cursor:
+            query = query.where(after_cursor(Face.created_at, Face.id, cursor))
+        elif skip:
+            query = query.offset(skip)
+        
+        query = query.order_by(Face.created_at, Face.id).limit(limit + 1)
+        result = await db.execute(query)
+        faces = result.scalars().all()
+        
+        next_cursor = None
+        if len(faces) > limit:
+            faces = faces[:limit]
+            next_cursor = encode_cursor(faces[-1].created_at, faces[-1].id)
+        
         return {
             "success": True,
             "count": len(faces),
-            "faces": [face.to_dict() for face in faces]
+            "faces": [
+                {**face.to_dict(), "thumbnail_url": thumbnail_url(face.image_path)}
+                for face in faces
+            ],
+            "next_cursor": next_cursor
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -347,11 +714,11 @@ async def get_all_faces(
 @router.get("/faces/{face_id}")
 async def get_face(
     face_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific face by ID"""
     try:
-        face = db.query(Face).filter(Face.id == face_id).first()
+        face = await db.get(Face, face_id, options=[defer(Face.encoding)])
         
         if not face:
             raise HTTPException(status_code=404, detail="Face not found")
@@ -369,11 +736,11 @@ async def get_face(
 @router.delete("/faces/{face_id}")
 async def delete_face(
     face_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a face from database"""
     try:
-        face = db.query(Face).filter(Face.id == face_id).first()
+        face = await db.get(Face, face_id)
         
         if not face:
             raise HTTPException(status_code=404, detail="Face not found")
@@ -383,8 +750,12 @@ async def delete_face(
             os.remove(face.image_path)
         
         # Delete from database
-        db.delete(face)
-        db.commit()
+        def remove_face(session):
+            if session.query(Face).filter(Face.id == face_id).delete():
+                get_stats_service().face_deleted(session, face.name, face.collection)
+                get_index_registry().faces_removed(session, [face_id])
+        
+        await get_write_queue().submit(remove_face)
         
         return {
             "success": True,
@@ -400,36 +771,323 @@ async def delete_face(
 async def get_match_history(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get match history"""
+    """
+    Get match history (newest first)
+    
+    Args:
+        skip: Number of records to skip (legacy; prefer cursor)
+        limit: Maximum number of records to return
+        cursor: next_cursor of the previous page
+    """
     try:
-        results = db.query(MatchResult).order_by(
-            MatchResult.created_at.desc()
-        ).offset(skip).limit(limit).all()
+        query = select(MatchResult)
+        
+        if cursor:
+            query = query.where(
+                after_cursor(MatchResult.created_at, MatchResult.id, cursor, descending=True)
+            )
+        elif skip:
+            query = query.offset(skip)
+        
+        query = query.order_by(
+            MatchResult.created_at.desc(), MatchResult.id.desc()
+        ).limit(limit + 1)
+        result = await db.execute(query)
+        results = result.scalars().all()
+        
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_cursor(results[-1].created_at, results[-1].id)
         
         return {
             "success": True,
             "count": len(results),
-            "results": [result.to_dict() for result in results]
+            "results": [result.to_dict() for result in results],
+            "next_cursor": next_cursor
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/stats")
-async def get_stats(db: Session = Depends(get_db)):
-    """Get system statistics"""
+async def get_stats():
+    """Get system statistics (served from in-memory counters)"""
+    try:
+        return {
+            "success": True,
+            "stats": get_stats_service().snapshot()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collections")
+async def get_collections():
+    """List collections with their face / identity counts and index state"""
+    return {
+        "success": True,
+        "collections": collection_service.list_collections()
+    }
+
+
+@router.get("/collections/{collection}/stats")
+async def get_collection_stats(collection: str):
+    """Get counters and index state of one collection"""
+    return {
+        "success": True,
+        "stats": collection_service.describe_collection(_collection(collection))
+    }
+
+
+@router.post("/collections/{collection}/index")
+async def load_collection_index(collection: str):
+    """Load (warm up) the identity index of a collection"""
+    index = await run_in_threadpool(get_index_registry().get, _collection(collection))
+    return {
+        "success": True,
+        "index": index.get_stats()
+    }
+
+
+@router.delete("/collections/{collection}/index")
+async def evict_collection_index(collection: str):
+    """Drop the identity index of a collection from memory (reloaded on next search)"""
+    evicted = get_index_registry().evict(_collection(collection))
+    return {
+        "success": True,
+        "evicted": evicted,
+        "message": f"Index of '{collection}' evicted" if evicted else f"Index of '{collection}' was not loaded"
+    }
+
+
+@router.get("/upload-config")
+async def get_upload_config():
+    """
+    Get preferred upload parameters
+    
+    Clients downscale images so the longer side is at most max_dimension
+    and re-encode them as JPEG before uploading.
+    """
+    return {
+        "success": True,
+        "config": {
+            "max_dimension": settings.UPLOAD_MAX_DIMENSION,
+            "jpeg_quality": settings.UPLOAD_JPEG_QUALITY,
+            "mime_type": "image/jpeg",
+            "max_file_size": settings.MAX_FILE_SIZE,
+            "allowed_extensions": settings.allowed_extensions_list
+        }
+    }
+
+
+@router.get("/thumbnails")
+async def get_thumbnail(
+    request: Request,
+    path: str,
+    size: int = settings.THUMBNAIL_DEFAULT_SIZE,
+    format: Optional[str] = None
+):
+    """
+    Get a cached, resized variant of an uploaded image
+    
+    Args:
+        path: Image path as returned by the API (e.g. ./uploads/xxx.jpg)
+        size: Max width/height, rounded up to a configured size
+        format: "webp" or "jpeg" (default: webp if the client accepts it)
+    
+    Returns:
+        Thumbnail image with ETag / Cache-Control headers
+    """
     try:
-        total_faces = db.query(Face).count()
-        total_searches = db.query(MatchResult).count()
+        if format is None:
+            format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        
+        thumbnail_service = get_thumbnail_service()
+        thumbnail = await run_in_threadpool(
+            thumbnail_service.describe, path, size, format.lower()
+        )
+        
+        # Uploads are written once under unique names, so variants never change
+        headers = {
+            "ETag": thumbnail["etag"],
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Vary": "Accept",
+        }
+        
+        # Revalidation is answered from the ETag alone, before any decoding
+        if_none_match = request.headers.get("if-none-match", "")
+        if thumbnail["etag"] in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
         
+        await run_in_threadpool(thumbnail_service.render, thumbnail)
+        
+        return FileResponse(thumbnail["path"], media_type=thumbnail["media_type"], headers=headers)
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/db/write-queue")
+async def get_write_queue_stats():
+    """Get single-writer queue statistics"""
+    return {
+        "success": True,
+        "write_queue": get_write_queue().get_stats()
+    }
+
+
+@router.get("/db/history-writer")
+async def get_history_writer_stats():
+    """Get buffered search-history writer statistics"""
+    return {
+        "success": True,
+        "history_writer": get_history_writer().get_stats()
+    }
+
+
+@router.get("/debug/slow-traces", dependencies=[Depends(_require_trace_admin)])
+async def get_slow_traces(limit: int = 20):
+    """Get the most recent slow requests with their span trees (newest first)"""
+    tracer = get_tracer()
+    return {
+        "success": True,
+        "tracer": tracer.get_stats(),
+        "traces": tracer.recent(limit)
+    }
+
+
+@router.get("/debug/slow-traces/{trace_id}", dependencies=[Depends(_require_trace_admin)])
+async def get_slow_trace(trace_id: str):
+    """Get one buffered slow trace"""
+    trace = get_tracer().find(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not slow or already evicted)")
+    return {
+        "success": True,
+        "trace": trace
+    }
+
+
+@router.post("/debug/profile", dependencies=[Depends(_require_admin)])
+async def profile_process(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    format: str = "collapsed",
+    idle: bool = False
+):
+    """
+    Sample the Python stacks of every thread for a few seconds
+
+    Args:
+        seconds: Sampling duration (at most PROFILER_MAX_SECONDS)
+        interval_ms: Time between samples
+        format: "collapsed" (flamegraph.pl / speedscope input) or "json" (top functions)
+        idle: Keep threads blocked waiting for work
+
+    Returns:
+        Collapsed stacks as text, or the hottest functions as JSON
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be collapsed or json")
+    if not 0 < seconds <= settings.PROFILER_MAX_SECONDS or not 1 <= interval_ms <= 1000:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {settings.PROFILER_MAX_SECONDS}], interval_ms in [1, 1000]"
+        )
+    
+    sampler = get_stack_sampler()
+    try:
+        profile = await run_in_threadpool(sampler.sample, seconds, interval_ms / 1000, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "collapsed":
+        return PlainTextResponse(sampler.collapsed(profile["collapsed"]))
+    return {
+        "success": True,
+        "profile": {key: value for key, value in profile.items() if key != "collapsed"}
+    }
+
+
+@router.post("/debug/tracemalloc/start", dependencies=[Depends(_require_admin)])
+async def start_tracemalloc(frames: int = 10):
+    """Start allocation tracing and take the baseline snapshot"""
+    return {
+        "success": True,
+        "tracemalloc": get_memory_profiler().start(frames)
+    }
+
+
+@router.get("/debug/tracemalloc/diff", dependencies=[Depends(_require_admin)])
+async def diff_tracemalloc(limit: int = 25, key_type: str = "lineno", reset: bool = False):
+    """Allocation growth per source line since the baseline (reset: new baseline)"""
+    try:
+        diff = await run_in_threadpool(get_memory_profiler().diff, limit, key_type, reset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "success": True,
+        "diff": diff
+    }
+
+
+@router.post("/debug/tracemalloc/stop", dependencies=[Depends(_require_admin)])
+async def stop_tracemalloc():
+    """Stop allocation tracing"""
+    return {
+        "success": True,
+        "tracemalloc": get_memory_profiler().stop()
+    }
+
+
+@router.get("/phash/stats")
+async def get_phash_stats():
+    """Get perceptual-hash prefilter hit rates"""
+    return {
+        "success": True,
+        "phash": get_perceptual_cache().get_stats()
+    }
+
+
+@router.get("/identity-index/stats")
+async def get_identity_index_stats():
+    """Get per-collection identity index sizes, memory and stage-2 workload"""
+    return {
+        "success": True,
+        "identity_index": get_index_registry().get_stats()
+    }
+
+
+@router.get("/retention/stats")
+async def get_retention_stats():
+    """Get upload retention policies and reclaimed-space metrics"""
+    try:
         return {
             "success": True,
-            "stats": {
-                "total_faces": total_faces,
-                "total_searches": total_searches
-            }
+            "retention": get_retention_manager().get_metrics()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/retention/sweep", dependencies=[Depends(_require_admin_token)])
+async def run_retention_sweep():
+    """Run a retention sweep immediately"""
+    try:
+        result = await run_in_threadpool(get_retention_manager().sweep)
+        return {
+            "success": True,
+            "result": result
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
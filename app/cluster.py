@@ -0,0 +1,82 @@
+"""
+Offline gallery clustering (identity audit)
+
+    python -m app.cluster [--threshold 0.4] [--method components|average]
+                          [--workers N] [--collection NAME] [--output clusters.jsonl]
+
+Every face is compared with every other face in cache-sized blocks on all
+cores; faces within the threshold are linked and the resulting clusters
+are written to a JSONL file (one cluster per line). Clusters with several
+names point at duplicate identities or mislabeled faces; names spread
+over several clusters point at mislabels.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cluster", description="Cluster the face gallery by similarity")
+    parser.add_argument("--threshold", type=float, default=settings.CLUSTER_DISTANCE,
+                        help="Max cosine distance linking two faces")
+    parser.add_argument("--method", choices=["components", "average"], default="components",
+                        help="components (single linkage) or average (split components by average linkage)")
+    parser.add_argument("--block-size", type=int, default=settings.CLUSTER_BLOCK_SIZE,
+                        help="Rows / columns per similarity tile")
+    parser.add_argument("--workers", type=int, default=settings.CLUSTER_WORKERS or None,
+                        help="Threads comparing blocks (default: all cores)")
+    parser.add_argument("--output", default="clusters.jsonl", help="JSONL file receiving the clusters")
+    parser.add_argument("--collection", help="Only this collection (default: whole gallery)")
+    parser.add_argument("--keep-pairs", action="store_true", help="Keep the binary pairs file next to the output")
+    args = parser.parse_args(argv)
+
+    from app.core.database import SessionLocal, init_db
+    import app.models  # noqa: F401  (register tables before create_all)
+    from app.services.clustering_service import cluster_gallery, load_gallery
+
+    init_db()
+
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        ids, names, matrix = load_gallery(session, args.collection)
+    finally:
+        session.close()
+    print(f"📥 Loaded {len(ids)} face(s) in {time.perf_counter() - start:.1f}s")
+
+    def progress(done: int, total: int):
+        print(f"\r🔍 Blocks {done}/{total}", end="", flush=True)
+
+    start = time.perf_counter()
+    summary = cluster_gallery(
+        ids, names, matrix, args.output,
+        max_distance=args.threshold, method=args.method,
+        block_size=args.block_size, workers=args.workers,
+        keep_pairs=args.keep_pairs, progress=progress
+    )
+    print()
+
+    print(f"✓ {summary['clusters']} cluster(s) covering {summary['clustered_faces']} face(s), "
+          f"{summary['singletons']} singleton(s), {summary['pairs']} pair(s) "
+          f"({time.perf_counter() - start:.1f}s)")
+    print(f"  Largest cluster: {summary['largest_cluster']} face(s)")
+    print(f"  Clusters with several names: {summary['mixed_clusters']}")
+    print(f"  Names spread over several clusters: {summary['split_names']}")
+    for name, count in list(summary["top_split_names"].items())[:10]:
+        print(f"    {name}: {count} clusters")
+    print(f"✓ Clusters saved to: {args.output}")
+    with open(args.output + ".summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
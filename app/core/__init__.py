@@ -1,5 +1,6 @@
 """Core package initialization"""
 from app.core.config import get_settings
-from app.core.database import get_db, init_db
+from app.core.database import get_db, get_async_db, init_db
+from app.core.write_queue import get_write_queue
 
-__all__ = ["get_settings", "get_db", "init_db"]
+__all__ = ["get_settings", "get_db", "get_async_db", "init_db", "get_write_queue"]
@@ -18,16 +18,107 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./database/face_matching.db"
     
+    # SQLite production profile (applied on every new connection)
+    SQLITE_PROFILE_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 268435456  # 256MB
+    SQLITE_CACHE_SIZE: int = -65536  # negative = KiB (64MB)
+    SQLITE_BUSY_TIMEOUT: int = 5000  # ms
+    
+    # Single-writer queue (batches commits from concurrent requests)
+    DB_WRITE_QUEUE_ENABLED: bool = True
+    DB_WRITE_BATCH_SIZE: int = 64
+    DB_WRITE_BATCH_WINDOW_MS: int = 2
+    
+    # Search history (MatchResult) buffered writer
+    HISTORY_FLUSH_INTERVAL_MS: int = 500
+    HISTORY_FLUSH_MAX_ROWS: int = 500
+    HISTORY_MAX_BACKLOG: int = 100000  # oldest records dropped beyond this
+    
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png"  # Changed to str, split later
-    
+    UPLOAD_MAX_DIMENSION: int = 1280  # Browser downscales longer side to this before upload
+    UPLOAD_JPEG_QUALITY: float = 0.9  # Browser re-encode quality (0.0-1.0)
+
+    # Bulk import (/api/import-faces)
+    IMPORT_BATCH_SIZE: int = 32  # faces committed together
+    IMPORT_DECODE_WORKERS: int = 4  # pipeline stage pool sizes
+    IMPORT_DETECT_WORKERS: int = 2
+    IMPORT_EMBED_BATCH_SIZE: int = 16  # faces per model call
+    IMPORT_PARITY_MAX_DISTANCE: float = 0.02  # crop + embed vs encode_face (cosine); above it bulk paths encode directly
+    IMPORT_MAX_ARCHIVE_MB: int = 4096
+
+    # Retention (transient uploads under UPLOAD_DIR/<category>)
+    RETENTION_ENABLED: bool = True
+    RETENTION_SWEEP_INTERVAL: int = 300  # seconds between sweeps
+    RETENTION_MIN_AGE: int = 120  # never evict files younger than this (seconds)
+    RETENTION_QUERIES_TTL: int = 86400  # search-face query images
+    RETENTION_QUERIES_MAX_MB: int = 1024
+    RETENTION_DETECTIONS_TTL: int = 3600  # detect-face originals + annotated copies
+    RETENTION_DETECTIONS_MAX_MB: int = 512
+    RETENTION_CROPS_TTL: int = 3600  # detect-face crops
+    RETENTION_CROPS_MAX_MB: int = 256
+    RETENTION_THUMBNAILS_TTL: int = 2592000  # cached thumbnails (30 days)
+    RETENTION_THUMBNAILS_MAX_MB: int = 512
+
+    # Thumbnails
+    THUMBNAIL_SIZES: str = "64,128,256,512"  # Allowed sizes, split later
+    THUMBNAIL_DEFAULT_SIZE: int = 256
+    THUMBNAIL_QUALITY: int = 80
+
+    # Near-duplicate enrollment (add-face) and offline dedup
+    ENROLL_DUPLICATE_POLICY: str = "reject"  # reject, merge or keep
+    ENROLL_DUPLICATE_DISTANCE: float = 0.15  # cosine distance (match threshold is 0.68)
+    DEDUP_BLOCK_SIZE: int = 1024  # rows per similarity matrix product
+
+    # Gallery clustering (identity audit, python -m app.cluster / POST /api/clusters)
+    CLUSTER_DISTANCE: float = 0.4  # cosine distance linking two faces
+    CLUSTER_BLOCK_SIZE: int = 2048  # rows / columns per similarity tile
+    CLUSTER_WORKERS: int = 0  # threads comparing blocks (0 = all cores)
+    CLUSTER_AGGLOMERATIVE_MAX_SIZE: int = 5000  # larger components are not split by "average"
+    CLUSTER_OUTPUT_DIR: str = "./database/clusters"
+
+    # Identity prototypes (two-stage search: per-person prototypes, then members)
+    IDENTITY_INDEX_ENABLED: bool = True
+    IDENTITY_SEARCH_CANDIDATES: int = 10  # identities re-ranked in stage 2
+    IDENTITY_MEDOIDS: int = 2  # extra prototypes per identity besides the centroid
+    SEARCH_FILTER_CACHE_SIZE: int = 64  # filter bitmaps kept (LRU) for filtered searches
+    COLLECTION_INDEX_MAX_LOADED: int = 16  # collection indexes kept in memory (LRU)
+    COLLECTION_INDEX_MAX_MB: int = 4096  # memory budget of all loaded indexes
+
+    # Metrics (Prometheus text format at GET /metrics)
+    METRICS_ENABLED: bool = True
+
+    # Request tracing (span tree per request; slow ones logged as JSON)
+    TRACE_ENABLED: bool = True
+    TRACE_SLOW_MS: float = 1000  # requests slower than this are logged / buffered
+    TRACE_BUFFER_SIZE: int = 100  # recent slow traces kept for /api/debug/slow-traces
+
+    # On-demand profiling (/api/debug/profile, /api/debug/tracemalloc)
+    PROFILER_ENABLED: bool = False
+    PROFILER_MAX_SECONDS: int = 60
+    ADMIN_TOKEN: str = ""  # required in the X-Admin-Token header; empty = admin endpoints refused
+
+    # Perceptual-hash prefilter (reuse results for near-identical uploads)
+    PHASH_ENABLED: bool = True
+    PHASH_THRESHOLD: int = 4  # max Hamming distance (of 64 bits)
+    PHASH_CACHE_SIZE: int = 20000  # images remembered (LRU, ~3 KB each)
+
     # Face Recognition
     FACE_DETECTION_MODEL: str = "hog"  # hog or cnn
     FACE_RECOGNITION_TOLERANCE: float = 0.6
     NUM_JITTERS: int = 1
     
+    # Inference backend: deepface (models) or stub (offline benchmarks / tests)
+    INFERENCE_BACKEND: str = "deepface"
+    STUB_DETECT_LATENCY_MS: float = 0  # simulated detection time per image
+    STUB_EMBED_LATENCY_MS: float = 0  # simulated embedding time per face
+    STUB_FACES_PER_IMAGE: int = 1
+    STUB_LATENCY_MODE: str = "sleep"  # sleep (releases the GIL, like GPU inference) or spin (CPU-bound)
+    
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
@@ -37,6 +128,11 @@ class Settings(BaseSettings):
     def allowed_extensions_list(self) -> List[str]:
         """Get allowed extensions as list"""
         return [ext.strip() for ext in self.ALLOWED_EXTENSIONS.split(",")]
+
+    @property
+    def thumbnail_sizes_list(self) -> List[int]:
+        """Get allowed thumbnail sizes as list"""
+        return [int(size) for size in self.THUMBNAIL_SIZES.split(",") if size.strip()]
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
@@ -23,9 +24,69 @@ engine = create_engine(
     pool_pre_ping=True  # Enable connection health checks
 )
 
+
+def configure_sqlite_engine(sync_engine):
+    """
+    Apply the SQLite production profile on every new connection
+    
+    WAL lets readers run concurrently with the writer, synchronous=NORMAL
+    drops the per-commit fsync of the WAL, and busy_timeout makes writers
+    wait for the lock instead of failing with "database is locked".
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+if settings.DATABASE_URL.startswith("sqlite") and settings.SQLITE_PROFILE_ENABLED:
+    configure_sqlite_engine(engine)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Map DATABASE_URL to its asyncio driver
+    
+    sqlite:///...      -> sqlite+aiosqlite:///...
+    postgresql://...   -> postgresql+asyncpg://...
+    """
+    scheme, sep, rest = database_url.partition("://")
+    dialect = scheme.split("+")[0]
+    
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return database_url
+
+
+# Create async engine for the API routes (queries do not block the event loop)
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    connect_args=connect_args,
+    pool_pre_ping=True
+)
+
+if settings.DATABASE_URL.startswith("sqlite") and settings.SQLITE_PROFILE_ENABLED:
+    configure_sqlite_engine(async_engine.sync_engine)
+
+# Objects stay usable after commit (no implicit lazy refresh under asyncio)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
@@ -39,6 +100,66 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def add_missing_columns(bind=None):
+    """
+    Add columns introduced after a table was first created
+    
+    Only additive changes are handled: each missing column is added with
+    its server default so existing rows get a value.
+    """
+    from sqlalchemy import inspect, text
+    
+    bind = bind or engine
+    inspector = inspect(bind)
+    # The dialect's DDL compiler quotes identifiers and renders defaults
+    # (escaped string literals, text() and SQL expressions such as now())
+    compiler = bind.dialect.ddl_compiler(bind.dialect, None)
+    preparer = bind.dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=bind.dialect)}"
+            )
+            default = compiler.get_column_default_string(column)
+            backfill = None
+            if default is not None:
+                if bind.dialect.name == "sqlite" and not isinstance(column.server_default.arg, str):
+                    # SQLite only accepts constant defaults in ADD COLUMN,
+                    # so expression defaults are backfilled instead
+                    backfill = (
+                        f"UPDATE {preparer.format_table(table)} "
+                        f"SET {preparer.format_column(column)} = {default}"
+                    )
+                else:
+                    ddl += f" DEFAULT {default}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+            with bind.begin() as connection:
+                connection.execute(text(ddl))
+                if backfill is not None:
+                    connection.execute(text(backfill))
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    
+    # create_all skips existing tables together with their indexes,
+    # so add indexes introduced after a table was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
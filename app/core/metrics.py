@@ -0,0 +1,341 @@
+"""
+Lightweight metrics in Prometheus text format (GET /metrics)
+
+- Counter / Histogram: updated on the request path; one perf_counter pair,
+  a bisect and a short lock per observation (about a microsecond)
+- Gauge: evaluated only when /metrics is scraped (queue depths, gallery
+  size, cache hit rates read from the services' own counters)
+
+Histograms use fixed buckets; next to the *_bucket / *_sum / *_count
+series, p50 / p95 / p99 estimated from the buckets are exported as
+<name>_quantile{quantile="..."} so they can be read without PromQL.
+
+Stages of a request are timed with `timed("stage")` (decorator or
+context manager) into face_stage_seconds{stage=...}; inside a traced
+request the stage also becomes a span of its trace (see app.core.tracing).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.tracing import begin_span, end_span
+
+# Seconds; covers cache hits (sub-millisecond) up to cold model inference
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    """Bucketed distribution per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, labels: Labels = (), span_name: Optional[str] = None) -> "_Timer":
+        return _Timer(self, labels, span_name)
+
+    def _snapshot(self) -> List[Tuple[Labels, List[int], float, int]]:
+        with self._lock:
+            return [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+
+    def quantile(self, q: float, counts: List[int], total: int) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """p50 / p95 / p99, mean and count per label set (JSON friendly)"""
+        result = {}
+        for labels, counts, total_sum, total in self._snapshot():
+            key = ",".join(labels) or self.name
+            result[key] = {
+                "count": total,
+                "mean": total_sum / total if total else 0.0,
+                **{f"p{int(q * 100)}": self.quantile(q, counts, total) for q in QUANTILES},
+            }
+        return result
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        quantile_lines = []
+        for labels, counts, total_sum, total in self._snapshot():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total_sum!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {total}")
+            for q in QUANTILES:
+                extra = f'quantile="{q}"'
+                quantile_lines.append(
+                    f"{self.name}_quantile{_format_labels(self.labelnames, labels, extra)} "
+                    f"{self.quantile(q, counts, total)!r}"
+                )
+        if quantile_lines:
+            lines += [
+                f"# HELP {self.name}_quantile {self.documentation} (estimated from buckets)",
+                f"# TYPE {self.name}_quantile gauge",
+            ] + quantile_lines
+        return lines
+
+
+class Gauge(Metric):
+    """Value read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Any],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        samples: Iterable[Tuple[Labels, float]] = value if self.labelnames else [((), value)]
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(sample)}"
+            for labels, sample in samples
+        ]
+
+
+class _Timer:
+    """Context manager / decorator observing elapsed seconds into a histogram"""
+
+    __slots__ = ("histogram", "labels", "span_name", "start", "span")
+
+    def __init__(self, histogram: Histogram, labels: Labels, span_name: Optional[str] = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.span_name = span_name
+        self.start = 0.0
+        self.span = None
+
+    def __enter__(self):
+        if self.span_name:
+            self.span = begin_span(self.span_name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+        end_span(self.span)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        histogram, labels, span_name = self.histogram, self.labels, self.span_name
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            span = begin_span(span_name) if span_name else None
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, labels)
+                end_span(span)
+
+        return wrapper
+
+
+class Registry:
+    """Metrics exported at /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "face_stage_seconds", "Time spent per processing stage", ("stage",)
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+))
+DB_COMMIT_SECONDS = REGISTRY.register(Histogram(
+    "db_write_commit_seconds", "Write-queue transaction time (jobs + commit)"
+))
+DB_BATCH_JOBS = REGISTRY.register(Histogram(
+    "db_write_batch_jobs", "Write jobs per write-queue commit", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+))
+
+
+def timed(stage: str) -> _Timer:
+    """Time a stage: `with timed("decode"):` or `@timed("decode")`"""
+    return STAGE_SECONDS.time((stage,), stage)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, (stage,))
+
+
+def register_service_gauges():
+    """Gauges over the services' own counters (read at scrape time)"""
+    from app.core.write_queue import get_write_queue
+    from app.services.history_service import get_history_writer
+    from app.services.identity_index import get_index_registry
+    from app.services.phash_service import get_perceptual_cache
+    from app.services.stats_service import get_stats_service
+    from app.services.thumbnail_service import get_thumbnail_service
+
+    def phash(field: str):
+        stats = get_perceptual_cache().get_stats()
+        return [((kind,), stats[kind][field]) for kind in ("encoding", "detection")]
+
+    def indexes(field: str):
+        return [((item["collection"],), item[field]) for item in get_index_registry().get_stats()["indexes"]]
+
+    gauges = [
+        Gauge("write_queue_backlog", "Write jobs waiting for the writer thread",
+              lambda: get_write_queue().backlog()),
+        Gauge("write_queue_jobs", "Write jobs committed", lambda: get_write_queue().jobs),
+        Gauge("write_queue_commits", "Write-queue transactions committed", lambda: get_write_queue().commits),
+        Gauge("write_queue_failures", "Write jobs that failed", lambda: get_write_queue().failures),
+        Gauge("history_writer_backlog", "Search-history rows waiting to be flushed",
+              lambda: get_history_writer().backlog()),
+        Gauge("gallery_faces", "Enrolled faces", lambda: get_stats_service().snapshot()["total_faces"]),
+        Gauge("gallery_identities", "Distinct enrolled names",
+              lambda: get_stats_service().snapshot()["total_identities"]),
+        Gauge("collection_faces", "Enrolled faces per collection",
+              lambda: [((name,), counts.get("faces", 0)) for name, counts in get_stats_service().collections().items()],
+              ("collection",)),
+        Gauge("searches_total", "Searches recorded in history", lambda: get_stats_service().snapshot()["total_searches"]),
+        Gauge("phash_lookups", "Perceptual-cache lookups", lambda: phash("lookups"), ("kind",)),
+        Gauge("phash_hits", "Perceptual-cache hits", lambda: phash("hits"), ("kind",)),
+        Gauge("phash_hit_ratio", "Perceptual-cache hit rate", lambda: phash("hit_rate"), ("kind",)),
+        Gauge("thumbnail_cache_hit_ratio", "Thumbnail cache hit rate",
+              lambda: get_thumbnail_service().get_stats()["hit_rate"]),
+        Gauge("identity_indexes_loaded", "Collection indexes resident in memory",
+              lambda: get_index_registry().get_stats()["loaded"]),
+        Gauge("identity_index_faces", "Faces per resident collection index", lambda: indexes("faces"), ("collection",)),
+        Gauge("identity_index_memory_mb", "Memory per resident collection index",
+              lambda: indexes("memory_mb"), ("collection",)),
+    ]
+    for gauge in gauges:
+        REGISTRY.register(gauge)
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format"""
+    return REGISTRY.render()
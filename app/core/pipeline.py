@@ -0,0 +1,217 @@
+"""
+Staged worker pipeline with bounded queues
+
+Each stage has its own pool of worker threads and reads from a bounded
+queue filled by the previous stage. A full queue blocks the producer, so
+backpressure flows upstream and memory stays bounded; throughput settles
+at the rate of the slowest stage. Threads are enough here because the
+heavy work (file I/O, OpenCV decode, TensorFlow inference, SQLite) runs
+outside the GIL.
+
+Every stage reports its utilisation: busy time divided by wall time x
+workers. The stage close to 100% is the bottleneck; give it more workers
+(or a larger batch) and the others less.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class Stage:
+    """
+    One pipeline step
+
+    Args:
+        name: Stage name used in stats
+        fn: Callable applied to each item, or to a list of items when
+            batch_size > 1; return None to drop the item, a list of results
+            for batched stages
+        workers: Number of worker threads
+        batch_size: Items handed to fn at once
+        batch_wait_ms: How long a batched stage waits to fill a batch
+        queue_size: Capacity of the input queue (0 = 2 x workers x batch_size)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        batch_size: int = 1,
+        batch_wait_ms: int = 20,
+        queue_size: int = 0
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self.queue: "queue.Queue" = queue.Queue(queue_size or 2 * self.workers * self.batch_size)
+
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def get_stats(self, wall_seconds: float) -> Dict[str, Any]:
+        capacity = wall_seconds * self.workers
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize(),
+            "busy_s": round(self.busy_seconds, 3),
+            "utilisation": round(self.busy_seconds / capacity, 3) if capacity > 0 else 0.0,
+            "blocked_s": round(self.blocked_seconds, 3),
+        }
+
+
+class Pipeline:
+    """
+    Run items through a chain of stages
+
+    Args:
+        stages: Stages in order; the output of the last stage is discarded
+        on_error: Optional callback(stage_name, item, exception); failing
+            items are dropped
+    """
+
+    def __init__(self, stages: List[Stage], on_error: Optional[Callable[[str, Any, Exception], None]] = None):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.on_error = on_error
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _put(self, stage: Stage, item: Any):
+        start = time.perf_counter()
+        stage.queue.put(item)
+        return time.perf_counter() - start
+
+    def _next_batch(self, stage: Stage) -> Tuple[List[Any], bool]:
+        """Take up to batch_size items; True if the end marker was seen"""
+        first = stage.queue.get()
+        if first is _END:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = stage.queue.get(timeout=timeout) if timeout > 0 else stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self, index: int, done: List[int], done_lock: threading.Lock):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            batch, ended = self._next_batch(stage)
+            if batch:
+                with stage._lock:
+                    stage.items_in += len(batch)
+
+                start = time.perf_counter()
+                try:
+                    if stage.batch_size > 1:
+                        results = stage.fn(batch) or []
+                    else:
+                        result = stage.fn(batch[0])
+                        results = [] if result is None else [result]
+                except Exception as e:
+                    results = []
+                    with stage._lock:
+                        stage.errors += len(batch)
+                    for item in batch:
+                        if self.on_error:
+                            self.on_error(stage.name, item, e)
+                        else:
+                            logger.error(f"Pipeline stage {stage.name} failed: {str(e)}")
+                busy = time.perf_counter() - start
+
+                blocked = 0.0
+                if downstream is not None:
+                    for result in results:
+                        if result is not None:
+                            blocked += self._put(downstream, result)
+
+                with stage._lock:
+                    stage.busy_seconds += busy
+                    stage.blocked_seconds += blocked
+                    stage.items_out += sum(1 for result in results if result is not None)
+
+            if ended:
+                # Pass the end marker to the sibling workers; the last one
+                # to finish closes the next stage
+                with done_lock:
+                    done[index] += 1
+                    last = done[index] == stage.workers
+                if not last:
+                    stage.queue.put(_END)
+                elif downstream is not None:
+                    downstream.queue.put(_END)
+                return
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Feed items through all stages and wait for the pipeline to drain
+
+        Returns:
+            Per-stage statistics (see get_stats)
+        """
+        self.started_at = time.perf_counter()
+        done = [0] * len(self.stages)
+        done_lock = threading.Lock()
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, done, done_lock),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                self._put(self.stages[0], item)
+        finally:
+            self.stages[0].queue.put(_END)
+            for thread in threads:
+                thread.join()
+            self.finished_at = time.perf_counter()
+
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            return {"wall_s": 0.0, "stages": {}}
+        wall = (self.finished_at or time.perf_counter()) - self.started_at
+        stages = {stage.name: stage.get_stats(wall) for stage in self.stages}
+        bottleneck = max(stages, key=lambda name: stages[name]["utilisation"]) if stages else None
+        return {
+            "wall_s": round(wall, 3),
+            "bottleneck": bottleneck,
+            "stages": stages,
+        }
@@ -0,0 +1,230 @@
+"""
+On-demand profiling of the live process
+
+- StackSampler: a background thread snapshots every thread's Python stack
+  (sys._current_frames) at a fixed interval for N seconds and aggregates
+  them as collapsed stacks ("thread;module:function:line;... count"),
+  the input format of flamegraph.pl and speedscope
+- MemoryProfiler: tracemalloc baseline snapshot, then the allocation
+  growth per source line since the baseline
+
+Both are exposed under /api/debug (admin token, PROFILER_ENABLED) and cost
+nothing while idle. Only one sampling run at a time.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Leaf frames of threads blocked waiting for work (dropped unless idle=True)
+IDLE_FILES = {"threading.py", "selectors.py", "queue.py"}
+
+
+class ProfilerBusy(RuntimeError):
+    """A sampling run is already in progress"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler:
+    """Statistical stack sampler over all threads of the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float = 0.01, idle: bool = False) -> Dict[str, Any]:
+        """
+        Sample stacks for `seconds` (blocks the calling thread)
+
+        Args:
+            seconds: Sampling duration
+            interval: Seconds between samples
+            idle: Keep stacks of threads blocked in waits / selects
+
+        Returns:
+            Dict with collapsed stack counts, top functions and run info
+
+        Raises:
+            ProfilerBusy: if another run is in progress
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profiling run is already in progress")
+        try:
+            stacks: Counter = Counter()
+            own = threading.get_ident()
+            names = {}
+            samples = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if not idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            elapsed = time.perf_counter() - started
+        finally:
+            self._lock.release()
+
+        self.runs += 1
+        self.last_run = {
+            "seconds": round(elapsed, 3),
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "stacks": len(stacks),
+        }
+        return {**self.last_run, "collapsed": stacks, "top": self.top_functions(stacks)}
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """flamegraph.pl / speedscope input: one 'frame;frame;... count' per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def top_functions(stacks: Counter, limit: int = 30) -> List[Dict[str, Any]]:
+        """Functions by samples on top of the stack (self) and anywhere in it (total)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = [frame.rsplit(":", 1)[0] for frame in stack.split(";")[1:]]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [
+            {"function": function, "total": count, "self": own.get(function, 0)}
+            for function, count in total.most_common(limit)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"busy": self.busy, "runs": self.runs, "last_run": self.last_run}
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots diffed against a baseline"""
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        """Snapshot without tracemalloc's own and import machinery traces"""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[float] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        """Start tracing (if needed) and take the baseline snapshot"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+            self._baseline_at = time.time()
+        return self.get_stats()
+
+    def diff(self, limit: int = 25, key_type: str = "lineno", reset: bool = False) -> Dict[str, Any]:
+        """
+        Allocation growth since the baseline, largest first
+
+        Args:
+            limit: Number of entries
+            key_type: "lineno", "filename" or "traceback"
+            reset: Make the current snapshot the new baseline
+
+        Raises:
+            ValueError: if tracing was not started or key_type is invalid
+        """
+        if key_type not in ("lineno", "filename", "traceback"):
+            raise ValueError("key_type must be lineno, filename or traceback")
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                raise ValueError("tracemalloc is not started (POST /api/debug/tracemalloc/start)")
+            # Baseline and snapshot filtered alike, or the dropped frames show as negative diffs
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, key_type)
+            since = time.time() - self._baseline_at
+            if reset:
+                self._baseline = snapshot
+                self._baseline_at = time.time()
+
+        return {
+            "since_seconds": round(since, 1),
+            "size_diff_mb": round(sum(stat.size_diff for stat in stats) / 1024 / 1024, 3),
+            "top": [
+                {
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            self._baseline_at = None
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "tracing": self.tracing,
+            "baseline_age_seconds": round(time.time() - self._baseline_at, 1) if self._baseline_at else None,
+            "traced_mb": round(current / 1024 / 1024, 3),
+            "peak_mb": round(peak / 1024 / 1024, 3),
+        }
+
+
+@lru_cache()
+def get_stack_sampler() -> StackSampler:
+    """Get singleton instance"""
+    return StackSampler()
+
+
+@lru_cache()
+def get_memory_profiler() -> MemoryProfiler:
+    """Get singleton instance"""
+    return MemoryProfiler()
@@ -0,0 +1,168 @@
+"""
+In-process request tracing with slow-request logs
+
+Every HTTP request gets a span tree (a root span per request, one child
+per stage timed with `timed()` / `span()`; stages running in the thread
+pool attach to the request through the copied context). When a request
+takes longer than TRACE_SLOW_MS its whole tree is logged as one JSON line
+on the "app.trace" logger and kept in a ring buffer of recent slow traces
+(GET /api/debug/slow-traces).
+
+Outside a request (background threads, CLIs) spans are no-ops.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("app.trace")
+settings = get_settings()
+
+
+class Span:
+    """One timed stage of a request"""
+
+    __slots__ = ("name", "start", "end", "attrs", "children")
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs or {}
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            # Children may have been appended from pool threads: order by start
+            data["children"] = [child.to_dict(origin) for child in sorted(self.children, key=lambda s: s.start)]
+        return data
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def begin_span(name: str, attrs: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Span, Token]]:
+    """Open a child of the current span (None outside a traced request)"""
+    parent = _current.get()
+    if parent is None:
+        return None
+    child = Span(name, attrs)
+    parent.children.append(child)
+    return child, _current.set(child)
+
+
+def end_span(state: Optional[Tuple[Span, Token]]):
+    if state is None:
+        return
+    child, token = state
+    child.end = time.perf_counter()
+    _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Trace a block without recording a metric: `with span("crop_face", index=i):`"""
+    state = begin_span(name, attrs)
+    try:
+        yield state[0] if state else None
+    finally:
+        end_span(state)
+
+
+def annotate(**attrs: Any):
+    """Attach attributes to the current span (e.g. faces=3, rows=1200)"""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+class Tracer:
+    """Root spans per request and a ring buffer of slow traces"""
+
+    def __init__(self, slow_ms: Optional[float] = None, buffer_size: Optional[int] = None):
+        self.slow_ms = settings.TRACE_SLOW_MS if slow_ms is None else slow_ms
+        self._slow: deque = deque(maxlen=buffer_size or settings.TRACE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self.traced = 0
+        self.slow = 0
+
+    def start(self, name: str, **attrs: Any) -> Tuple[Span, Token]:
+        """Open the root span of a request"""
+        root = Span(name, {"trace_id": uuid.uuid4().hex[:16], **attrs})
+        return root, _current.set(root)
+
+    def finish(self, state: Tuple[Span, Token], **attrs: Any) -> Optional[Dict[str, Any]]:
+        """
+        Close a root span; log and keep it if it was slow
+
+        Returns:
+            The trace as a dict if it was slow, else None
+        """
+        root, token = state
+        root.end = time.perf_counter()
+        root.attrs.update(attrs)
+        _current.reset(token)
+        self.traced += 1
+
+        if root.duration_ms < self.slow_ms:
+            return None
+
+        trace = {
+            "trace_id": root.attrs.get("trace_id"),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(root.duration_ms, 3),
+            "spans": root.to_dict(root.start),
+        }
+        with self._lock:
+            self._slow.append(trace)
+            self.slow += 1
+        logger.warning(json.dumps({"event": "slow_request", **trace}, default=str))
+        return trace
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent slow traces, newest first"""
+        with self._lock:
+            traces = list(self._slow)
+        return traces[::-1][:limit]
+
+    def find(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((trace for trace in self._slow if trace["trace_id"] == trace_id), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.TRACE_ENABLED,
+            "slow_ms": self.slow_ms,
+            "traced": self.traced,
+            "slow": self.slow,
+            "buffered": len(self._slow),
+            "buffer_size": self._slow.maxlen,
+        }
+
+
+@lru_cache()
+def get_tracer() -> Tracer:
+    """Get singleton instance"""
+    return Tracer()
@@ -0,0 +1,266 @@
+"""
+Single-writer queue for database writes
+
+Concurrent requests submit small write jobs (callables taking a Session).
+One writer thread drains whatever is pending, runs the jobs in a single
+transaction and commits once, so N concurrent enrollments cost one commit
+instead of N commits fighting over the SQLite write lock.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import DB_BATCH_JOBS, DB_COMMIT_SECONDS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WriteJob = Callable[[Session], Any]
+
+_STOP = object()
+
+
+def _set_future(future: asyncio.Future, ok: bool, value: Any):
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class WriteQueue:
+    """Funnel database writes through one thread, batching commits"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: Optional[int] = None,
+        batch_window_ms: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        if session_factory is None:
+            from app.core.database import SessionLocal
+            session_factory = SessionLocal
+
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        window = settings.DB_WRITE_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms
+        self.batch_window = window / 1000
+        self.enabled = settings.DB_WRITE_QUEUE_ENABLED if enabled is None else enabled
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+        self.jobs = 0
+        self.commits = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """Start the writer thread"""
+        if not self.enabled or self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Drain pending jobs and stop the writer thread"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    async def submit(self, job: WriteJob) -> Any:
+        """
+        Run a write job and wait until it is committed
+
+        Args:
+            job: Callable receiving a Session; its return value is passed back
+                (mapped instances are refreshed after commit)
+
+        Returns:
+            The job's return value
+        """
+        if not self.running:
+            return await run_in_threadpool(self._execute_one, job)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((job, future, loop))
+        return await future
+
+    async def add(self, *instances: Any) -> List[Any]:
+        """Insert ORM instances and return them refreshed after commit"""
+        def job(session: Session):
+            session.add_all(instances)
+            return list(instances)
+        return await self.submit(job)
+
+    def submit_sync(self, job: WriteJob) -> Any:
+        """Run a write job from a worker thread and wait for its commit"""
+        if not self.running or threading.current_thread() is self._thread:
+            return self._execute_one(job)
+
+        done = threading.Event()
+        outcome: Dict[str, Any] = {}
+
+        def callback(ok: bool, value: Any):
+            outcome["ok"], outcome["value"] = ok, value
+            done.set()
+
+        self._queue.put((job, callback, None))
+        done.wait()
+        if not outcome["ok"]:
+            raise outcome["value"]
+        return outcome["value"]
+
+    def backlog(self) -> int:
+        """Number of jobs waiting for the writer"""
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "backlog": self.backlog(),
+            "jobs": self.jobs,
+            "commits": self.commits,
+            "failures": self.failures,
+            "avg_batch_size": (self.jobs / self.commits) if self.commits else 0.0,
+        }
+
+    def _refresh_results(self, session: Session, results: List[Any]):
+        """Load server defaults (ids, timestamps) so results work detached"""
+        for result in results:
+            values = result if isinstance(result, list) else [result]
+            for value in values:
+                state = sa_inspect(value, raiseerr=False)
+                if state is not None and getattr(state, "persistent", False):
+                    session.refresh(value)
+
+    def _execute_one(self, job: WriteJob) -> Any:
+        session = self.session_factory()
+        try:
+            result = job(session)
+            session.commit()
+            self._refresh_results(session, [result])
+            self.jobs += 1
+            self.commits += 1
+            return result
+        except Exception:
+            session.rollback()
+            self.failures += 1
+            raise
+        finally:
+            session.close()
+
+    def _execute_batch(self, batch: List[Tuple[WriteJob, Any, Any]]) -> List[Tuple[bool, Any]]:
+        """Run a batch in one transaction; fall back to one-by-one on error"""
+        if len(batch) == 1:
+            try:
+                return [(True, self._execute_one(batch[0][0]))]
+            except Exception as e:
+                return [(False, e)]
+
+        session = self.session_factory()
+        try:
+            results = [job(session) for job, _, _ in batch]
+            session.commit()
+            self._refresh_results(session, results)
+            self.jobs += len(batch)
+            self.commits += 1
+            return [(True, result) for result in results]
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Batched write failed, retrying jobs individually: {str(e)}")
+        finally:
+            session.close()
+
+        outcomes = []
+        for job, _, _ in batch:
+            try:
+                outcomes.append((True, self._execute_one(job)))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    def _collect(self, first) -> Tuple[List[Tuple[WriteJob, Any, Any]], bool]:
+        """Gather pending jobs behind the first one"""
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + self.batch_window
+
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _process(self, batch: List[Tuple[WriteJob, Any, Any]]):
+        start = time.perf_counter()
+        outcomes = self._execute_batch(batch)
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        DB_BATCH_JOBS.observe(len(batch))
+
+        for (_, waiter, loop), (ok, value) in zip(batch, outcomes):
+            if loop is None:
+                waiter(ok, value)
+            else:
+                loop.call_soon_threadsafe(_set_future, waiter, ok, value)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch, stop = self._collect(item)
+            self._process(batch)
+
+            if stop:
+                break
+
+        # Jobs that raced with stop() still get committed
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._process(leftover)
+
+
+@lru_cache()
+def get_write_queue() -> WriteQueue:
+    """Get singleton instance"""
+    return WriteQueue()
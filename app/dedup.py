@@ -0,0 +1,78 @@
+"""
+Offline near-duplicate cleanup of the faces table
+
+    python -m app.dedup [--threshold 0.15] [--cross-name] [--apply]
+
+Faces are compared within each name (or across all names with
+--cross-name) in row blocks; near-identical faces are grouped and, with
+--apply, every face but the oldest of each group is deleted together with
+its image. Without --apply the clusters are only reported.
+
+Restart the API server afterwards so its in-memory /api/stats counters
+and identity index pick up the deletions.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.dedup", description="Find and remove near-duplicate faces")
+    parser.add_argument("--threshold", type=float, default=settings.ENROLL_DUPLICATE_DISTANCE,
+                        help="Max cosine distance between duplicates")
+    parser.add_argument("--cross-name", action="store_true", help="Also compare faces with different names")
+    parser.add_argument("--block-size", type=int, default=settings.DEDUP_BLOCK_SIZE,
+                        help="Rows per similarity matrix product")
+    parser.add_argument("--apply", action="store_true", help="Delete duplicates (default: report only)")
+    parser.add_argument("--keep-files", action="store_true", help="Do not delete images of removed faces")
+    parser.add_argument("--output", help="Write clusters to this JSON file")
+    args = parser.parse_args(argv)
+
+    from app.core.database import SessionLocal, init_db
+    import app.models  # noqa: F401  (register tables before create_all)
+    from app.services.dedup_service import find_duplicate_clusters, remove_duplicates
+    from app.services.stats_service import get_stats_service
+
+    init_db()
+    get_stats_service().load()
+
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        clusters = find_duplicate_clusters(session, args.threshold, args.cross_name, args.block_size)
+    finally:
+        session.close()
+    elapsed = time.perf_counter() - start
+
+    duplicates = sum(len(cluster["duplicates"]) for cluster in clusters)
+    print(f"🔍 {len(clusters)} duplicate cluster(s), {duplicates} redundant face(s) "
+          f"(threshold {args.threshold}, {elapsed:.1f}s)")
+    for cluster in clusters[:20]:
+        print(f"  keep #{cluster['keep']} {', '.join(cluster['names'])}: "
+              f"{len(cluster['duplicates'])} duplicate(s), max distance {cluster['max_distance']}")
+    if len(clusters) > 20:
+        print(f"  ... {len(clusters) - 20} more")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(clusters, f, indent=2, ensure_ascii=False)
+        print(f"✓ Clusters saved to: {args.output}")
+
+    if args.apply and duplicates:
+        deleted = remove_duplicates(clusters, delete_files=not args.keep_files)
+        print(f"🗑️  Deleted {deleted} face(s)")
+    elif duplicates:
+        print("Run again with --apply to delete them")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
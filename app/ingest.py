@@ -0,0 +1,364 @@
+"""
+Offline parallel ingestion (no HTTP)
+
+    python -m app.ingest <folder> [--csv manifest.csv] [--workers N] [--collection NAME]
+
+Walks <folder> recursively and enrolls every image straight into the
+database: a process pool (one preloaded ArcFace model per worker) decodes,
+embeds and copies the images into UPLOAD_DIR, and the parent process
+inserts the faces in bulk, one commit per --batch-size rows.
+
+Progress is tracked per file in a SQLite manifest (default
+<folder>/.ingest_manifest.db), so an interrupted run resumes where it
+stopped; --retry-failed also re-runs files that failed before.
+
+Names come from the optional CSV (filename,name,description), otherwise
+from the parent directory (person/001.jpg) or the filename.
+
+Run it while the API server is stopped (or restart the server afterwards)
+so that the server's in-memory /api/stats counters and identity indexes
+pick up the new faces.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+MANIFEST_FILE = ".ingest_manifest.db"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Per-process face service, created by _init_worker
+_service = None
+
+
+class IngestManifest:
+    """Per-file ingest status stored in a small SQLite database"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " face_id INTEGER,"
+            " error TEXT,"
+            " updated_at REAL)"
+        )
+        self.conn.commit()
+
+    def register(self, paths: Iterator[str]) -> int:
+        """Add newly found files as pending (existing rows are kept)"""
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO files (path, status) VALUES (?, ?)",
+            ((path, PENDING) for path in paths)
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def todo(self, retry_failed: bool = False) -> List[str]:
+        statuses = (PENDING, FAILED) if retry_failed else (PENDING,)
+        marks = ",".join("?" * len(statuses))
+        return [row[0] for row in self.conn.execute(
+            f"SELECT path FROM files WHERE status IN ({marks}) ORDER BY path", statuses
+        )]
+
+    def mark(self, rows: List[Tuple[str, str, Optional[int], Optional[str]]]):
+        """Record (path, status, face_id, error) for a batch of files"""
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE files SET status = ?, face_id = ?, error = ?, updated_at = ? WHERE path = ?",
+            [(status, face_id, error, now, path) for path, status, face_id, error in rows]
+        )
+        self.conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+def find_images(folder: str) -> Iterator[str]:
+    """Relative paths of all images below folder (hidden entries skipped)"""
+    extensions = tuple(f".{ext}" for ext in settings.allowed_extensions_list)
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for filename in sorted(files):
+            if filename.lower().endswith(extensions) and not filename.startswith("."):
+                yield os.path.relpath(os.path.join(root, filename), folder).replace(os.sep, "/")
+
+
+def _init_worker(threads: int):
+    """Pin inference threads and preload the model once per process"""
+    global _service
+    if threads:
+        for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+            os.environ[var] = str(threads)
+
+    from app.services.face_recognition_service import get_face_service
+    _service = get_face_service()
+
+
+def _embed(path: str) -> Tuple[str, Optional[str], Optional[bytes], Optional[str]]:
+    """
+    Decode, embed and stage one image (runs in a worker process)
+
+    Returns:
+        (path, staged image path, encoding bytes, error)
+    """
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        if len(content) > settings.MAX_FILE_SIZE:
+            return path, None, None, "File too large"
+
+        image = _service.decode_image(content)
+        if image is None:
+            return path, None, None, "Invalid image file"
+
+        encoding = _service.get_face_encoding(image)
+        if encoding is None:
+            return path, None, None, "No face detected"
+
+        staged = _service.save_uploaded_file(content, os.path.basename(path))
+        return path, staged, _service.encode_face_to_bytes(encoding), None
+    except Exception as e:
+        return path, None, None, str(e)
+
+
+class Progress:
+    """Throughput / ETA printer"""
+
+    def __init__(self, total: int, every: float = 5.0):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.added = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, added: int = 0, failed: int = 0, force: bool = False):
+        self.added += added
+        self.failed += failed
+        self.done += added + failed
+
+        now = time.perf_counter()
+        if not force and now - self._last < self.every:
+            return
+        self._last = now
+
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float("inf") else "--:--:--"
+        print(
+            f"[{self.done}/{self.total}] {self.done * 100 / max(self.total, 1):5.1f}% | "
+            f"✅ {self.added} ❌ {self.failed} | {rate:.1f} img/s | ETA {eta_text}",
+            flush=True
+        )
+
+
+class Ingestor:
+    """Fan images out to a process pool and bulk-insert the results"""
+
+    def __init__(
+        self,
+        folder: str,
+        manifest_path: Optional[str] = None,
+        names: Optional[Dict[str, Dict[str, str]]] = None,
+        workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        batch_size: int = 500,
+        retry_failed: bool = False,
+        collection: str = "default"
+    ):
+        self.folder = os.path.abspath(folder)
+        self.manifest = IngestManifest(manifest_path or os.path.join(self.folder, MANIFEST_FILE))
+        self.names = names or {}
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.retry_failed = retry_failed
+        self.collection = collection
+
+    def _describe(self, rel_path: str) -> Tuple[str, Optional[str]]:
+        from app.services.import_service import name_from_entry
+
+        row = self.names.get(rel_path) or self.names.get(os.path.basename(rel_path))
+        if row:
+            return row["name"], row["description"]
+        return name_from_entry(rel_path), f"Ingested from {rel_path}"
+
+    def _flush(self, results: List[Tuple[str, str, bytes]], progress: Progress):
+        """Insert one batch of embedded images with a single commit"""
+        from app.core.database import SessionLocal
+        from app.models.face import Face
+        from app.services.stats_service import get_stats_service
+
+        faces = []
+        for rel_path, staged, encoding in results:
+            name, description = self._describe(rel_path)
+            faces.append(Face(
+                collection=self.collection, name=name, description=description,
+                image_path=staged, encoding=encoding
+            ))
+
+        session = SessionLocal()
+        try:
+            session.add_all(faces)
+            get_stats_service().faces_added(session, faces)
+            session.commit()
+            rows = [(rel_path, DONE, face.id, None) for (rel_path, _, _), face in zip(results, faces)]
+            added, failed = len(faces), 0
+        except Exception as e:
+            session.rollback()
+            for _, staged, _ in results:
+                try:
+                    os.remove(staged)
+                except OSError:
+                    pass
+            rows = [(rel_path, FAILED, None, f"Database error: {str(e)}") for rel_path, _, _ in results]
+            added, failed = 0, len(results)
+        finally:
+            session.close()
+
+        self.manifest.mark(rows)
+        progress.update(added=added, failed=failed)
+
+    def run(self) -> Dict[str, Any]:
+        from app.core.database import init_db
+        import app.models  # noqa: F401  (register tables before create_all)
+        from app.services.stats_service import get_stats_service
+
+        init_db()
+        get_stats_service().load()  # seeds the counter tables on first use
+
+        found = self.manifest.register(find_images(self.folder))
+        todo = self.manifest.todo(self.retry_failed)
+        print(f"📂 {self.folder}: {found} new file(s), {len(todo)} to ingest "
+              f"({self.workers} worker process(es), manifest: {self.manifest.path})")
+        if not todo:
+            return self.manifest.counts()
+
+        progress = Progress(len(todo))
+        pending: List[Tuple[str, str, bytes]] = []
+        errors: List[Tuple[str, str, Optional[int], Optional[str]]] = []
+
+        # Workers are spawned (not forked) so each builds its own TensorFlow runtime
+        import multiprocessing
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,)
+        ) as executor:
+            # Keep a bounded window of in-flight images
+            window = self.workers * 8
+            paths = iter(todo)
+            in_flight = set()
+
+            def fill():
+                while len(in_flight) < window:
+                    rel_path = next(paths, None)
+                    if rel_path is None:
+                        return
+                    in_flight.add(executor.submit(_embed, os.path.join(self.folder, rel_path)))
+
+            fill()
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                fill()
+
+                for future in finished:
+                    path, staged, encoding, error = future.result()
+                    rel_path = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                    if error:
+                        errors.append((rel_path, FAILED, None, error))
+                    else:
+                        pending.append((rel_path, staged, encoding))
+
+                if len(errors) >= self.batch_size:
+                    self.manifest.mark(errors)
+                    progress.update(failed=len(errors))
+                    errors = []
+                if len(pending) >= self.batch_size:
+                    self._flush(pending, progress)
+                    pending = []
+
+        if pending:
+            self._flush(pending, progress)
+        if errors:
+            self.manifest.mark(errors)
+            progress.update(failed=len(errors))
+        progress.update(force=True)
+
+        return self.manifest.counts()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description="Offline parallel face ingestion")
+    parser.add_argument("folder", help="Folder of face images (searched recursively)")
+    parser.add_argument("--csv", help="Manifest CSV (filename,name,description)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="Inference threads per worker")
+    parser.add_argument("--batch-size", type=int, default=500, help="Faces per database commit")
+    parser.add_argument("--manifest", help=f"Progress database (default: <folder>/{MANIFEST_FILE})")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry files that failed before")
+    parser.add_argument("--collection", default="default", help="Collection (gallery partition) to enroll into")
+    args = parser.parse_args(argv)
+
+    from app.services.collection_service import validate_collection
+    try:
+        collection = validate_collection(args.collection)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if not os.path.isdir(args.folder):
+        print(f"❌ Folder not found: {args.folder}")
+        return 1
+
+    names = None
+    if args.csv:
+        from app.services.import_service import read_manifest
+        with open(args.csv, "rb") as f:
+            names = read_manifest(f)
+
+    ingestor = Ingestor(
+        args.folder,
+        manifest_path=args.manifest,
+        names=names,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        batch_size=args.batch_size,
+        retry_failed=args.retry_failed,
+        collection=collection
+    )
+    try:
+        counts = ingestor.run()
+    finally:
+        ingestor.manifest.close()
+    print(f"📊 Manifest: {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 """Models package initialization"""
 from app.models.face import Face, MatchResult
+from app.models.stats import StatCounter, DailyStat
 
-__all__ = ["Face", "MatchResult"]
+__all__ = ["Face", "MatchResult", "StatCounter", "DailyStat"]
@@ -1,25 +1,45 @@
-from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Float
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Float, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
+from datetime import datetime, timezone
 import json
 
 
+# Collection of faces enrolled without one (and of every pre-collection row)
+DEFAULT_COLLECTION = "default"
+
+
+def utcnow() -> datetime:
+    """Client-side timestamp so every row stores the same datetime format"""
+    return datetime.now(timezone.utc)
+
+
 class Face(Base):
     """Face model for database"""
     __tablename__ = "faces"
+    __table_args__ = (
+        # Keyset pagination of /api/faces
+        Index("ix_faces_created_at_id", "created_at", "id"),
+        # Collection-scoped loads and name lookups
+        Index("ix_faces_collection_name", "collection", "name"),
+        # Keyset pagination of /api/faces?collection=...
+        Index("ix_faces_collection_created_at_id", "collection", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    collection = Column(String, nullable=False, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION)
     name = Column(String, nullable=False, index=True)
     description = Column(String, nullable=True)
     image_path = Column(String, nullable=False)
     encoding = Column(LargeBinary, nullable=False)  # Store face encoding as binary
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def to_dict(self):
         """Convert model to dictionary"""
         return {
             "id": self.id,
+            "collection": self.collection,
             "name": self.name,
             "description": self.description,
             "image_path": self.image_path,
@@ -31,13 +51,17 @@ class Face(Base):
 class MatchResult(Base):
     """Match result model for storing search history"""
     __tablename__ = "match_results"
+    __table_args__ = (
+        # Keyset pagination of /api/match-history (newest first)
+        Index("ix_match_results_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     query_image_path = Column(String, nullable=False)
     matched_face_id = Column(Integer, nullable=True)
     distance = Column(Float, nullable=True)
     confidence = Column(Float, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     
     def to_dict(self):
         """Convert model to dictionary"""
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, BigInteger
+from app.core.database import Base
+
+
+class StatCounter(Base):
+    """Named system-wide counter (total faces, identities, searches, ...)"""
+    __tablename__ = "stat_counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {"name": self.name, "value": self.value}
+
+
+class DailyStat(Base):
+    """Per-day rollup of enrollments and searches (UTC days)"""
+    __tablename__ = "daily_stats"
+    
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    faces_added = Column(Integer, nullable=False, default=0)
+    faces_deleted = Column(Integer, nullable=False, default=0)
+    searches = Column(Integer, nullable=False, default=0)
+    matches = Column(Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            "day": self.day,
+            "faces_added": self.faces_added,
+            "faces_deleted": self.faces_deleted,
+            "searches": self.searches,
+            "matches": self.matches,
+        }
@@ -1,7 +1,7 @@
-"""Services package initialization"""
-from app.services.face_recognition_service import get_face_service
+"""
+Services package initialization
 
-# Create global instance
-face_recognition_service = get_face_service()
-
-__all__ = ["face_recognition_service"]
+The FaceRecognitionService (model weights) is created on first use through
+get_face_service(), not on package import, so CLIs and benchmarks that only
+need helpers (identity index, import, stats) do not load the model.
+"""
@@ -0,0 +1,421 @@
+"""
+Gallery clustering for identity audits
+
+Groups every face of the gallery by embedding similarity, regardless of
+the enrolled name, to surface
+- mixed clusters: one person enrolled under several names (duplicate
+  identities) or a face filed under the wrong name
+- split names: faces of one name spread over several clusters (mislabels)
+
+Steps:
+1. the faces table is streamed into one L2-normalised float32 matrix
+2. row blocks (CLUSTER_BLOCK_SIZE) are compared with the rest of the matrix
+   in cache-sized tiles on CLUSTER_WORKERS threads (numpy releases the GIL
+   inside the matrix products); only pairs within the distance threshold
+   are kept and appended to a pairs file on disk
+3. connected components of the pair graph are the clusters ("components",
+   single linkage); "average" additionally splits each component with
+   average-linkage agglomerative clustering so chains of near pairs do not
+   merge different people (components larger than
+   CLUSTER_AGGLOMERATIVE_MAX_SIZE are kept whole)
+4. clusters are written to a JSONL file, one line per cluster
+
+See `python -m app.cluster` and POST /api/clusters.
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.models.face import Face
+from app.services.similarity import block_pairs, normalize
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+COMPONENTS = "components"
+AVERAGE = "average"
+METHODS = (COMPONENTS, AVERAGE)
+
+# Jobs kept in memory for status queries
+MAX_JOBS_KEPT = 20
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Record layout of the on-disk pairs file
+PAIR_DTYPE = np.dtype([("i", np.int32), ("j", np.int32), ("similarity", np.float32)])
+
+
+def load_gallery(session: Session, collection: Optional[str] = None) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Stream the faces table (or one collection of it) into memory
+
+    Returns:
+        (face ids, names, L2-normalised float32 embedding matrix)
+    """
+    scope = [Face.collection == collection] if collection is not None else []
+    total = session.execute(select(func.count(Face.id)).where(*scope)).scalar() or 0
+    ids = np.zeros(total, dtype=np.int64)
+    names: List[str] = []
+    matrix: Optional[np.ndarray] = None
+
+    stream = session.execute(
+        select(Face.id, Face.name, Face.encoding).where(*scope).order_by(Face.id)
+        .execution_options(yield_per=10000)
+    )
+    count = 0
+    for row in stream:
+        if count == total:  # rows added while streaming
+            break
+        vector = np.asarray(pickle.loads(row.encoding), dtype=np.float32)
+        if matrix is None:
+            matrix = np.zeros((total, len(vector)), dtype=np.float32)
+        matrix[count] = vector
+        ids[count] = row.id
+        names.append(row.name)
+        count += 1
+
+    if matrix is None:
+        return ids[:0], [], np.zeros((0, 0), dtype=np.float32)
+    return ids[:count], names, normalize(matrix[:count])
+
+
+def write_pairs(
+    matrix: np.ndarray,
+    max_distance: float,
+    path: str,
+    block_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """
+    Append every pair within max_distance to a binary pairs file
+
+    Row blocks run on a thread pool; at most 2 x workers blocks are in
+    flight so finished blocks never pile up in memory.
+
+    Returns:
+        Number of pairs written
+    """
+    block_size = block_size or settings.CLUSTER_BLOCK_SIZE
+    workers = workers or settings.CLUSTER_WORKERS or os.cpu_count() or 1
+    min_similarity = 1.0 - max_distance
+    n = len(matrix)
+    starts = list(range(0, n, block_size))
+
+    def compare(start: int) -> np.ndarray:
+        i, j, sims = block_pairs(matrix, start, min(start + block_size, n), min_similarity, block_size)
+        records = np.empty(len(i), dtype=PAIR_DTYPE)
+        records["i"], records["j"], records["similarity"] = i, j, sims
+        return records
+
+    written = 0
+    with open(path, "wb") as f, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cluster") as pool:
+        pending = []
+        next_block = 0
+        done = 0
+        while next_block < len(starts) or pending:
+            while next_block < len(starts) and len(pending) < 2 * workers:
+                pending.append(pool.submit(compare, starts[next_block]))
+                next_block += 1
+            records = pending.pop(0).result()
+            records.tofile(f)
+            written += len(records)
+            done += 1
+            if progress:
+                progress(done, len(starts))
+    return written
+
+
+def read_pairs(path: str) -> np.ndarray:
+    """Memory-map a pairs file written by write_pairs"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=PAIR_DTYPE)
+    return np.memmap(path, dtype=PAIR_DTYPE, mode="r")
+
+
+def component_labels(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Connected component label of every face"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    graph = coo_matrix(
+        (np.ones(len(pairs), dtype=np.int8), (pairs["i"], pairs["j"])),
+        shape=(n, n)
+    )
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def average_linkage(matrix: np.ndarray, max_distance: float) -> np.ndarray:
+    """Average-linkage cluster labels of a (small) set of normalised embeddings"""
+    from scipy.cluster.hierarchy import fcluster, linkage
+
+    distances = np.clip(1.0 - matrix @ matrix.T, 0.0, 2.0)
+    condensed = distances[np.triu_indices(len(matrix), k=1)]
+    return fcluster(linkage(condensed, method="average"), t=max_distance, criterion="distance")
+
+
+def cluster_gallery(
+    ids: np.ndarray,
+    names: List[str],
+    matrix: np.ndarray,
+    output_path: str,
+    max_distance: Optional[float] = None,
+    method: str = COMPONENTS,
+    block_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    keep_pairs: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Cluster a loaded gallery and write the clusters to a JSONL file
+
+    Each line: {"cluster", "size", "face_ids", "names": {name: count},
+    "mixed_names"}; faces without any neighbour within max_distance are
+    only counted as singletons.
+
+    Returns:
+        Summary (counts, largest cluster, mixed clusters, split names)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (use one of: {', '.join(METHODS)})")
+    max_distance = settings.CLUSTER_DISTANCE if max_distance is None else max_distance
+
+    n = len(ids)
+    pairs_path = output_path + ".pairs"
+    num_pairs = write_pairs(matrix, max_distance, pairs_path, block_size, workers, progress)
+    try:
+        labels = component_labels(n, read_pairs(pairs_path))
+    finally:
+        if not keep_pairs:
+            os.remove(pairs_path)
+
+    order = np.argsort(labels, kind="stable")
+    _, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+
+    clusters = 0
+    clustered_faces = 0
+    largest = 0
+    mixed = 0
+    unsplit = 0
+    name_clusters: Dict[str, int] = Counter()
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        def emit(members: np.ndarray):
+            nonlocal clusters, clustered_faces, largest, mixed
+            counts = Counter(names[index] for index in members)
+            record = {
+                "cluster": clusters,
+                "size": int(len(members)),
+                "face_ids": ids[members].tolist(),
+                "names": dict(counts.most_common()),
+                "mixed_names": len(counts) > 1,
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            clusters += 1
+            clustered_faces += len(members)
+            largest = max(largest, len(members))
+            mixed += len(counts) > 1
+            for name in counts:
+                name_clusters[name] += 1
+
+        for start, size in zip(starts.tolist(), sizes.tolist()):
+            if size < 2:
+                continue
+            members = order[start:start + size]
+            if method == AVERAGE and size > 2:
+                if size > settings.CLUSTER_AGGLOMERATIVE_MAX_SIZE:
+                    unsplit += 1
+                    emit(members)
+                    continue
+                sub_labels = average_linkage(matrix[members], max_distance)
+                for label in np.unique(sub_labels):
+                    group = members[sub_labels == label]
+                    if len(group) > 1:
+                        emit(group)
+            else:
+                emit(members)
+
+    split = sorted(
+        ((name, count) for name, count in name_clusters.items() if count > 1),
+        key=lambda item: item[1], reverse=True
+    )
+    summary = {
+        "faces": n,
+        "pairs": num_pairs,
+        "clusters": clusters,
+        "clustered_faces": clustered_faces,
+        "singletons": n - clustered_faces,
+        "largest_cluster": largest,
+        "mixed_clusters": mixed,
+        "split_names": len(split),
+        "top_split_names": dict(split[:50]),
+        "max_distance": max_distance,
+        "method": method,
+        "output": output_path,
+    }
+    if method == AVERAGE:
+        summary["components_not_split"] = unsplit
+    return summary
+
+
+class ClusterJob:
+    """State and summary of one gallery clustering run"""
+
+    def __init__(self, max_distance: float, method: str, collection: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.max_distance = max_distance
+        self.method = method
+        self.collection = collection
+        self.output_path = os.path.join(settings.CLUSTER_OUTPUT_DIR, f"clusters_{self.id}.jsonl")
+
+        self.status = PENDING
+        self.phase: Optional[str] = None
+        self.blocks_done = 0
+        self.blocks_total = 0
+        self.summary: Optional[Dict[str, Any]] = None
+        self.message: Optional[str] = None
+
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at:
+            end = self.finished_at or datetime.now(timezone.utc)
+            elapsed = (end - self.started_at).total_seconds()
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "method": self.method,
+            "collection": self.collection,
+            "max_distance": self.max_distance,
+            "blocks_done": self.blocks_done,
+            "blocks_total": self.blocks_total,
+            "elapsed_s": round(elapsed, 2) if elapsed is not None else None,
+            "summary": self.summary,
+            "message": self.message,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class GalleryClusterer:
+    """Run clustering jobs one at a time on a background thread"""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, ClusterJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+    def submit(
+        self,
+        max_distance: Optional[float] = None,
+        method: str = COMPONENTS,
+        collection: Optional[str] = None
+    ) -> ClusterJob:
+        """
+        Queue a clustering run over the current gallery
+
+        Args:
+            max_distance: Cosine distance threshold (default CLUSTER_DISTANCE)
+            method: "components" or "average"
+            collection: Only this collection (default: whole gallery)
+
+        Returns:
+            The queued job
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}' (use one of: {', '.join(METHODS)})")
+        job = ClusterJob(settings.CLUSTER_DISTANCE if max_distance is None else max_distance, method, collection)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOBS_KEPT:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.done:
+                    break
+                self._jobs.popitem(last=False)
+
+        threading.Thread(target=self.run, args=(job,), name=f"gallery-cluster-{job.id[:8]}", daemon=True).start()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ClusterJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def run(self, job: ClusterJob):
+        """Run a job to completion (blocking)"""
+        def progress(done: int, total: int):
+            job.blocks_done, job.blocks_total = done, total
+
+        with self._run_lock:
+            job.status = RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            try:
+                job.phase = "loading"
+                session = SessionLocal()
+                try:
+                    ids, names, matrix = load_gallery(session, job.collection)
+                finally:
+                    session.close()
+
+                job.phase = "comparing"
+                os.makedirs(settings.CLUSTER_OUTPUT_DIR, exist_ok=True)
+                job.summary = cluster_gallery(
+                    ids, names, matrix, job.output_path,
+                    max_distance=job.max_distance, method=job.method, progress=progress
+                )
+                job.status = COMPLETED
+                job.message = (
+                    f"{job.summary['clusters']} cluster(s), "
+                    f"{job.summary['mixed_clusters']} with mixed names"
+                )
+            except Exception as e:
+                logger.error(f"Clustering {job.id} failed: {str(e)}")
+                job.status = FAILED
+                job.message = str(e)
+            finally:
+                job.phase = None
+                job.finished_at = datetime.now(timezone.utc)
+                job._done.set()
+
+        logger.info(f"Clustering {job.id}: {job.status}, {job.message}")
+
+
+@lru_cache()
+def get_gallery_clusterer() -> GalleryClusterer:
+    """Get singleton instance"""
+    return GalleryClusterer()
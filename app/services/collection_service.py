@@ -0,0 +1,53 @@
+"""
+Face collections (gallery partitions)
+
+Every face belongs to one collection (a site, a customer, ...). Enrollment,
+search and listing are scoped to one collection; each collection has its
+own identity index (see IndexRegistry) and its own face / identity
+counters (see StatsService).
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from app.models.face import DEFAULT_COLLECTION
+from app.services.identity_index import get_index_registry
+from app.services.stats_service import get_stats_service
+
+COLLECTION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def validate_collection(collection: Optional[str]) -> str:
+    """
+    Normalise a collection name from a request
+
+    Raises:
+        ValueError: if the name is not 1-64 letters, digits, '_', '.' or '-'
+    """
+    collection = (collection or DEFAULT_COLLECTION).strip()
+    if not COLLECTION_PATTERN.match(collection):
+        raise ValueError(
+            f"Invalid collection '{collection}' (1-64 letters, digits, '_', '.' or '-')"
+        )
+    return collection
+
+
+def describe_collection(collection: str, counts: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Counters and index state of one collection"""
+    if counts is None:
+        counts = get_stats_service().collections().get(collection, {})
+    index = get_index_registry().loaded(collection)
+    return {
+        "collection": collection,
+        "faces": counts.get("faces", 0),
+        "identities": counts.get("identities", 0),
+        "index": index.get_stats() if index is not None else {"loaded": False},
+    }
+
+
+def list_collections() -> List[Dict[str, Any]]:
+    """Every collection with at least one face"""
+    return [
+        describe_collection(collection, counts)
+        for collection, counts in get_stats_service().collections().items()
+    ]
@@ -0,0 +1,229 @@
+"""
+Near-duplicate enrollment detection
+
+- On add-face the new embedding is compared with the gallery entries of
+  the same name; a near-identical one (cosine distance <=
+  ENROLL_DUPLICATE_DISTANCE) is handled by ENROLL_DUPLICATE_POLICY:
+    reject  the request fails with 409
+    merge   no new row; the existing face's embedding becomes the
+            normalised mean of both
+    keep    insert anyway (previous behaviour)
+- find_duplicate_clusters scans the existing faces table offline (blocked
+  by name, pairwise in row blocks) and groups near-duplicates; see
+  `python -m app.dedup`.
+"""
+
+import logging
+import os
+import pickle
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.write_queue import get_write_queue
+from app.models.face import DEFAULT_COLLECTION, Face
+from app.services.identity_index import get_index_registry
+from app.services.similarity import (
+    UnionFind, cosine_distances, encodings_matrix, normalize, similar_pairs
+)
+from app.services.stats_service import get_stats_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REJECT = "reject"
+MERGE = "merge"
+KEEP = "keep"
+POLICIES = (REJECT, MERGE, KEEP)
+
+
+ADDED = "added"
+MERGED = "merged"
+REJECTED = "rejected"
+
+
+def find_enrollment_duplicate(
+    session: Session,
+    name: str,
+    encoding: np.ndarray,
+    max_distance: Optional[float] = None,
+    collection: str = DEFAULT_COLLECTION
+) -> Optional[Tuple[int, float]]:
+    """
+    Closest face of the same name (and collection) within the duplicate threshold
+
+    Returns:
+        (face_id, cosine distance) or None
+    """
+    max_distance = settings.ENROLL_DUPLICATE_DISTANCE if max_distance is None else max_distance
+
+    rows = session.execute(
+        select(Face.id, Face.encoding).where(Face.collection == collection, Face.name == name)
+    ).all()
+    if not rows:
+        return None
+
+    distances = cosine_distances(encoding, encodings_matrix(row.encoding for row in rows))
+    best = int(np.argmin(distances))
+    if distances[best] > max_distance:
+        return None
+    return rows[best].id, float(distances[best])
+
+
+def merge_encodings(existing: bytes, new: np.ndarray) -> bytes:
+    """Normalised mean of a stored encoding and a new one (pickled)"""
+    merged = normalize(normalize(pickle.loads(existing))[0] + normalize(new)[0])[0]
+    return pickle.dumps(merged.astype(np.float64))
+
+
+async def enroll(
+    face: Face,
+    encoding: np.ndarray,
+    policy: str
+) -> Tuple[str, Optional[Face], Optional[Tuple[int, float]]]:
+    """
+    Insert a new face, or apply the duplicate policy, in one write job
+
+    The duplicate check runs in the same single-writer job as the insert,
+    so concurrent enrollments of the same name see each other's rows.
+
+    Returns:
+        (ADDED / MERGED / REJECTED, inserted or merged face (None when
+        rejected), (duplicate face_id, distance) or None)
+    """
+    outcome: Dict[str, Any] = {}
+
+    def job(session: Session):
+        # Batched jobs may be re-run one by one: reset the outcome each run
+        outcome.clear()
+        duplicate = find_enrollment_duplicate(session, face.name, encoding, collection=face.collection)
+        outcome["duplicate"] = duplicate
+
+        if duplicate and policy == REJECT:
+            outcome["status"] = REJECTED
+            return None
+        if duplicate and policy == MERGE:
+            existing = session.get(Face, duplicate[0])
+            if existing is not None:
+                existing.encoding = merge_encodings(existing.encoding, encoding)
+                get_index_registry().face_updated(session, existing)
+                outcome["status"] = MERGED
+                return existing
+
+        session.add(face)
+        get_stats_service().faces_added(session, [face])
+        get_index_registry().faces_added(session, [face])
+        outcome["status"] = ADDED
+        return face
+
+    result = await get_write_queue().submit(job)
+    return outcome["status"], result, outcome["duplicate"]
+
+
+def _iter_blocks(session: Session, cross_name: bool) -> Iterator[List[Any]]:
+    """
+    Faces grouped into comparison blocks: one per collection and name, or
+    one per collection with cross_name (collections are never compared)
+    """
+    query = select(Face.id, Face.collection, Face.name, Face.encoding)
+    if cross_name:
+        order, key = (Face.collection, Face.id), (lambda row: row.collection)
+    else:
+        order, key = (Face.collection, Face.name, Face.id), (lambda row: (row.collection, row.name))
+
+    stream = session.execute(query.order_by(*order).execution_options(yield_per=10000))
+    for _, group in groupby(stream, key=key):
+        rows = list(group)
+        if len(rows) > 1:
+            yield rows
+
+
+def find_duplicate_clusters(
+    session: Session,
+    max_distance: Optional[float] = None,
+    cross_name: bool = False,
+    block_size: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Group near-identical faces
+
+    Args:
+        session: Database session
+        max_distance: Cosine distance threshold (default ENROLL_DUPLICATE_DISTANCE)
+        cross_name: Also compare faces enrolled under different names
+            (of the same collection)
+        block_size: Rows per similarity matrix product
+
+    Returns:
+        Clusters sorted by size: {"collection", "keep": oldest id, "duplicates": [ids],
+        "names": [...], "max_distance": float}
+    """
+    max_distance = settings.ENROLL_DUPLICATE_DISTANCE if max_distance is None else max_distance
+    block_size = block_size or settings.DEDUP_BLOCK_SIZE
+
+    clusters = []
+    for rows in _iter_blocks(session, cross_name):
+        matrix = encodings_matrix(row.encoding for row in rows)
+        sets = UnionFind(len(rows))
+        pairs = list(similar_pairs(matrix, max_distance, block_size))
+        for i, j, _ in pairs:
+            sets.union(i, j)
+
+        widest: Dict[int, float] = {}
+        for i, _, distance in pairs:
+            root = sets.find(i)
+            widest[root] = max(widest.get(root, 0.0), distance)
+
+        for group in sets.groups(min_size=2):
+            members = sorted(group, key=lambda index: rows[index].id)
+            clusters.append({
+                "collection": rows[members[0]].collection,
+                "keep": rows[members[0]].id,
+                "duplicates": [rows[index].id for index in members[1:]],
+                "names": sorted({rows[index].name for index in members}),
+                "max_distance": round(widest.get(sets.find(members[0]), 0.0), 4),
+            })
+
+    clusters.sort(key=lambda cluster: len(cluster["duplicates"]), reverse=True)
+    return clusters
+
+
+def remove_duplicates(clusters: List[Dict[str, Any]], delete_files: bool = True) -> int:
+    """
+    Delete the duplicate faces of each cluster (the oldest face is kept)
+
+    Returns:
+        Number of faces deleted
+    """
+    face_ids = [face_id for cluster in clusters for face_id in cluster["duplicates"]]
+    deleted = 0
+
+    for start in range(0, len(face_ids), 500):
+        chunk = face_ids[start:start + 500]
+
+        def job(session: Session):
+            faces = session.query(Face.id, Face.collection, Face.name, Face.image_path).filter(
+                Face.id.in_(chunk)
+            ).all()
+            session.query(Face).filter(Face.id.in_(chunk)).delete(synchronize_session=False)
+            get_stats_service().faces_deleted(
+                session, [face.name for face in faces], [face.collection for face in faces]
+            )
+            get_index_registry().faces_removed(session, [face.id for face in faces])
+            return [face.image_path for face in faces]
+
+        paths = get_write_queue().submit_sync(job)
+        deleted += len(paths)
+
+        if delete_files:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    return deleted
@@ -11,10 +11,9 @@ Author: AI Assistant
 Date: 2025
 """
 
-from deepface import DeepFace
 import cv2
 import numpy as np
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from pathlib import Path
 import logging
 from PIL import Image
@@ -22,12 +21,18 @@ import io
 import os
 import uuid
 import pickle
+import threading
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
 # Import settings
 from app.core.config import get_settings
+from app.core.metrics import timed
+from app.core.tracing import annotate, span
+from app.services.inference_backend import create_backend
 settings = get_settings()
 
 
@@ -48,8 +53,6 @@ class FaceRecognitionService:
         if self._initialized:
             return
             
-        print("🚀 Initializing DeepFace (ArcFace model)...")
-        
         # Model configuration
         self.model_name = "ArcFace"  # Best accuracy: 99.82%
         self.distance_metric = "cosine"
@@ -58,11 +61,26 @@ class FaceRecognitionService:
         # Thresholds for ArcFace with cosine distance
         self.recognition_threshold = 0.68
         
+        # DeepFace models, or the offline stub (INFERENCE_BACKEND=stub)
+        self.backend = create_backend(self.model_name, self.detector_backend, self.distance_metric)
+
+        # Whether detect + embed (bulk paths) reproduces encode_face; checked on first use
+        self._crop_parity: Optional[bool] = None
+        self._crop_parity_distance: Optional[float] = None
+        self._parity_lock = threading.Lock()
+        if self.backend.name == "stub":
+            print("🚀 Initializing stub inference backend...")
+        else:
+            print(f"🚀 Initializing {self.backend.name} backend ({self.model_name} model)...")
+        
         # Pre-load model (first call will download if needed)
         try:
-            DeepFace.build_model(self.model_name)
-            print(f"✅ {self.model_name} model loaded successfully!")
-            print(f"   - Detector: {self.detector_backend}")
+            self.backend.build_model()
+            if self.backend.name == "stub":
+                print("✅ Stub backend ready (no model loaded, synthetic detections / embeddings)")
+            else:
+                print(f"✅ {self.model_name} model loaded successfully!")
+                print(f"   - Detector: {self.detector_backend}")
             print(f"   - Distance metric: {self.distance_metric}")
             print(f"   - Threshold: {self.recognition_threshold}")
         except Exception as e:
@@ -82,11 +100,7 @@ class FaceRecognitionService:
         """
         try:
             # DeepFace extract_faces returns list of detected faces
-            faces = DeepFace.extract_faces(
-                img_path=str(image_path),
-                detector_backend=self.detector_backend,
-                enforce_detection=False
-            )
+            faces = self.backend.extract_faces(str(image_path), enforce_detection=False)
             
             if not faces or len(faces) == 0:
                 return {
@@ -118,22 +132,21 @@ class FaceRecognitionService:
                 "message": f"Error: {str(e)}"
             }
     
-    def encode_face(self, image_path: str) -> Dict[str, Any]:
+    @timed("encode")
+    def encode_face(self, image_path: Union[str, np.ndarray]) -> Dict[str, Any]:
         """
         Generate face embedding using ArcFace
         
         Args:
-            image_path: Path to image file
+            image_path: Path to image file or decoded BGR image array
             
         Returns:
             Dict with encoding result
         """
         try:
             # DeepFace.represent returns embeddings
-            embeddings = DeepFace.represent(
-                img_path=str(image_path),
-                model_name=self.model_name,
-                detector_backend=self.detector_backend,
+            embeddings = self.backend.represent(
+                image_path if isinstance(image_path, np.ndarray) else str(image_path),
                 enforce_detection=True
             )
             
@@ -145,6 +158,7 @@ class FaceRecognitionService:
                 }
             
             # Get first face embedding
+            annotate(faces=len(embeddings))
             embedding = np.array(embeddings[0]["embedding"])
             
             return {
@@ -231,14 +245,7 @@ class FaceRecognitionService:
         """
         try:
             # DeepFace.verify compares two images directly
-            result = DeepFace.verify(
-                img1_path=str(image1_path),
-                img2_path=str(image2_path),
-                model_name=self.model_name,
-                detector_backend=self.detector_backend,
-                distance_metric=self.distance_metric,
-                enforce_detection=True
-            )
+            result = self.backend.verify(str(image1_path), str(image2_path), self.recognition_threshold)
             
             return {
                 "success": True,
@@ -259,13 +266,19 @@ class FaceRecognitionService:
                 "message": f"Error: {str(e)}"
             }
     
-    def crop_faces(self, image_path: str, face_locations: List[Tuple[int, int, int, int]]) -> List[str]:
+    def crop_faces(
+        self,
+        image_path: str,
+        face_locations: List[Tuple[int, int, int, int]],
+        output_dir: Optional[str] = None
+    ) -> List[str]:
         """
         🔥 Crop individual faces from an image with multiple people
         
         Args:
             image_path: Path to source image
             face_locations: List of face bounding boxes [(top, right, bottom, left), ...]
+            output_dir: Directory for cropped images (default: UPLOAD_DIR)
         
         Returns:
             List of paths to cropped face images
@@ -279,19 +292,22 @@ class FaceRecognitionService:
                 return []
             
             cropped_paths = []
+            output_dir = output_dir or settings.UPLOAD_DIR
+            os.makedirs(output_dir, exist_ok=True)
             
             # Crop each face
             for idx, (top, right, bottom, left) in enumerate(face_locations):
-                # Extract face region
-                face_img = image[top:bottom, left:right]
-                
-                # Generate unique filename
-                crop_filename = f"{uuid.uuid4()}_face_{idx}.jpg"
-                crop_path = os.path.join(settings.UPLOAD_DIR, crop_filename)
-                
-                # Save cropped face
-                cv2.imwrite(crop_path, face_img)
-                cropped_paths.append(crop_path)
+                with span("crop_face", index=idx):
+                    # Extract face region
+                    face_img = image[top:bottom, left:right]
+                    
+                    # Generate unique filename
+                    crop_filename = f"{uuid.uuid4()}_face_{idx}.jpg"
+                    crop_path = os.path.join(output_dir, crop_filename)
+                    
+                    # Save cropped face
+                    cv2.imwrite(crop_path, face_img)
+                    cropped_paths.append(crop_path)
                 
                 logger.info(f"Cropped face {idx + 1}/{len(face_locations)} → {crop_filename}")
             
@@ -358,31 +374,83 @@ class FaceRecognitionService:
     def batch_encode_faces(
         self,
         image_paths: List[str],
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        read_workers: int = 4,
+        detect_workers: int = 2,
+        embed_batch_size: int = 16
     ) -> List[Dict[str, Any]]:
         """
         Batch process multiple images
         
+        Runs as a staged pipeline (read/decode -> detect -> batched embed)
+        so disk I/O, detection and inference overlap.
+        
         Args:
             image_paths: List of image paths
             progress_callback: Optional callback(index, total)
+            read_workers: Threads reading and decoding images
+            detect_workers: Threads running face detection
+            embed_batch_size: Faces embedded per model call
             
         Returns:
-            List of encoding results
+            List of encoding results (in input order)
         """
-        results = []
+        from app.core.pipeline import Pipeline, Stage
+        
         total = len(image_paths)
+        results: List[Optional[Dict[str, Any]]] = [None] * total
+        lock = threading.Lock()
+        completed = [0]
         
-        for idx, image_path in enumerate(image_paths):
-            result = self.process_image(image_path)
-            result["image_path"] = image_path
-            results.append(result)
-            
+        def finish(idx: int, encoding: Optional[np.ndarray], message: str):
+            results[idx] = {
+                "success": encoding is not None,
+                "encoding": encoding,
+                "message": message,
+                "image_path": image_paths[idx]
+            }
             if progress_callback:
-                progress_callback(idx + 1, total)
+                with lock:
+                    completed[0] += 1
+                    progress_callback(completed[0], total)
+        
+        def read(idx):
+            with open(image_paths[idx], "rb") as f:
+                image = self.decode_image(f.read())
+            if image is None:
+                finish(idx, None, "Invalid image file")
+                return None
+            return idx, image
+        
+        def detect(item):
+            idx, image = item
+            crop, encoding = self.detect_for_embedding(image)
+            if crop is None and encoding is None:
+                finish(idx, None, "No face detected in image")
+                return None
+            return idx, crop, encoding
+        
+        def embed(batch):
+            encodings = self.embed_detected(batch)
+            for (idx, _, _), encoding in zip(batch, encodings):
+                finish(idx, encoding, "Encoding generated successfully" if encoding is not None else "Encoding failed")
+            return []
+        
+        def on_error(stage, item, error):
+            idx = item if isinstance(item, int) else item[0]
+            finish(idx, None, f"Error: {str(error)}")
+        
+        pipeline = Pipeline([
+            Stage("read", read, workers=read_workers),
+            Stage("detect", detect, workers=detect_workers),
+            Stage("embed", embed, batch_size=embed_batch_size),
+        ], on_error=on_error)
+        stats = pipeline.run(range(total))
+        logger.info(f"batch_encode_faces: {total} image(s), pipeline stats: {stats}")
         
         return results
     
+    @timed("validate")
     def validate_image(self, file_content: bytes) -> bool:
         """
         Validate if file is a valid image
@@ -399,25 +467,34 @@ class FaceRecognitionService:
         except:
             return False
     
-    def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
+    @timed("save")
+    def save_uploaded_file(
+        self,
+        file_content: bytes,
+        filename: str,
+        category: Optional[str] = None
+    ) -> str:
         """
         Save uploaded file to disk
         
         Args:
             file_content: File content in bytes
             filename: Original filename
+            category: Optional retention category sub-directory
+                (e.g. "queries"); enrolled images go to UPLOAD_DIR itself
             
         Returns:
             Path to saved file
         """
         try:
             # Create upload directory if not exists
-            os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+            upload_dir = os.path.join(settings.UPLOAD_DIR, category) if category else settings.UPLOAD_DIR
+            os.makedirs(upload_dir, exist_ok=True)
             
             # Generate unique filename
             file_ext = Path(filename).suffix
             unique_filename = f"{uuid.uuid4()}{file_ext}"
-            file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+            file_path = os.path.join(upload_dir, unique_filename)
             
             # Save file
             with open(file_path, "wb") as f:
@@ -427,52 +504,86 @@ class FaceRecognitionService:
         except Exception as e:
             raise Exception(f"Error saving file: {str(e)}")
     
-    def detect_faces(self, image_path: str) -> List[Tuple[int, int, int, int]]:
+    @timed("decode")
+    def decode_image(self, file_content: bytes) -> Optional[np.ndarray]:
         """
-        Detect ALL faces in an image (compatibility wrapper)
+        Decode image bytes in memory (no disk round-trip)
         
         Args:
-            image_path: Path to image file
+            file_content: File content in bytes
             
         Returns:
-            List of face bounding boxes (top, right, bottom, left)
+            BGR image array or None if it cannot be decoded
+        """
+        buffer = np.frombuffer(file_content, dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    
+    @timed("detect")
+    def detect_face_boxes(self, image: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Detect ALL faces and return boxes with confidences
+        
+        Args:
+            image: Path to image file or decoded BGR image array
+            
+        Returns:
+            List of dicts with x, y, w, h, (top, right, bottom, left) and confidence
         """
         try:
             # DeepFace extract_faces returns ALL detected faces
-            faces = DeepFace.extract_faces(
-                img_path=str(image_path),
-                detector_backend=self.detector_backend,
+            faces = self.backend.extract_faces(
+                image if isinstance(image, np.ndarray) else str(image),
                 enforce_detection=False
             )
             
             if not faces or len(faces) == 0:
                 return []
             
-            face_locations = []
-            
-            # Convert ALL faces from DeepFace format to MediaPipe format
+            boxes = []
             for face in faces:
                 bbox = face.get("facial_area", None)
                 if bbox:
                     # DeepFace bbox format: {'x': left, 'y': top, 'w': width, 'h': height}
-                    top = bbox['y']
-                    left = bbox['x']
-                    bottom = bbox['y'] + bbox['h']
-                    right = bbox['x'] + bbox['w']
-                    
-                    face_locations.append((top, right, bottom, left))
-            
-            return face_locations
+                    x, y, w, h = int(bbox['x']), int(bbox['y']), int(bbox['w']), int(bbox['h'])
+                    boxes.append({
+                        "x": x,
+                        "y": y,
+                        "w": w,
+                        "h": h,
+                        "top": y,
+                        "right": x + w,
+                        "bottom": y + h,
+                        "left": x,
+                        "confidence": float(face.get("confidence", 0.0) or 0.0)
+                    })
+            
+            annotate(faces=len(boxes), confidences=[round(box["confidence"], 3) for box in boxes])
+            return boxes
         except Exception as e:
             logger.error(f"Face detection error: {str(e)}")
             return []
     
-    def get_face_encoding(self, image_path: str) -> Optional[np.ndarray]:
+    def detect_faces(self, image_path: Union[str, np.ndarray]) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect ALL faces in an image (compatibility wrapper)
+        
+        Args:
+            image_path: Path to image file or decoded BGR image array
+            
+        Returns:
+            List of face bounding boxes (top, right, bottom, left)
+        """
+        return [
+            (box["top"], box["right"], box["bottom"], box["left"])
+            for box in self.detect_face_boxes(image_path)
+        ]
+    
+    def get_face_encoding(self, image_path: Union[str, np.ndarray]) -> Optional[np.ndarray]:
         """
         Get face encoding from image (compatibility wrapper)
         
         Args:
-            image_path: Path to image file
+            image_path: Path to image file or decoded BGR image array
             
         Returns:
             Face encoding array (512-D) or None if no face detected
@@ -487,7 +598,165 @@ class FaceRecognitionService:
         except Exception as e:
             logger.error(f"Face encoding error: {str(e)}")
             return None
-    
+
+    def get_face_encodings(
+        self,
+        images: List[Union[str, np.ndarray]]
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Get face encodings for a batch of images
+
+        The whole batch is passed to DeepFace in one call when the installed
+        version supports list input; otherwise (or if any image in the batch
+        has no face) each image is encoded on its own.
+
+        Args:
+            images: Image paths or decoded BGR image arrays
+
+        Returns:
+            One encoding (or None if no face detected) per input image
+        """
+        if len(images) > 1:
+            try:
+                batched = self.backend.represent(
+                    [image if isinstance(image, np.ndarray) else str(image) for image in images],
+                    enforce_detection=True
+                )
+                if len(batched) == len(images) and all(isinstance(item, list) for item in batched):
+                    return [
+                        np.array(item[0]["embedding"]) if item else None
+                        for item in batched
+                    ]
+            except Exception as e:
+                logger.debug(f"Batched encoding unavailable, encoding one by one: {str(e)}")
+
+        return [self.get_face_encoding(image) for image in images]
+
+    @timed("detect")
+    def extract_face_crop(self, image: Union[str, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Detect and align the first face of an image (detection stage only)
+
+        Args:
+            image: Path to image file or decoded BGR image array
+
+        Returns:
+            Aligned face crop as a BGR uint8 array, or None if no face detected
+        """
+        try:
+            faces = self.backend.extract_faces(
+                image if isinstance(image, np.ndarray) else str(image),
+                enforce_detection=False,
+                align=True
+            )
+        except Exception as e:
+            logger.error(f"Face extraction error: {str(e)}")
+            return None
+
+        for face in faces or []:
+            # With enforce_detection=False DeepFace returns the whole image at confidence 0
+            crop = face.get("face")
+            if crop is None or not face.get("confidence"):
+                continue
+            if crop.dtype != np.uint8:
+                crop = np.clip(crop * 255, 0, 255).astype(np.uint8)
+            return np.ascontiguousarray(crop[:, :, ::-1])  # RGB -> BGR
+        return None
+
+    @timed("embed")
+    def embed_face_crops(self, crops: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """
+        Embed already detected face crops (embedding stage only)
+
+        Args:
+            crops: Aligned BGR face crops from extract_face_crop
+
+        Returns:
+            One encoding (or None on error) per crop
+        """
+        if len(crops) > 1:
+            try:
+                batched = self.backend.represent(list(crops), detector_backend="skip", enforce_detection=False)
+                if len(batched) == len(crops) and all(isinstance(item, list) for item in batched):
+                    return [np.array(item[0]["embedding"]) if item else None for item in batched]
+            except Exception as e:
+                logger.debug(f"Batched embedding unavailable, embedding one by one: {str(e)}")
+
+        encodings = []
+        for crop in crops:
+            try:
+                result = self.backend.represent(crop, detector_backend="skip", enforce_detection=False)
+                encodings.append(np.array(result[0]["embedding"]) if result else None)
+            except Exception as e:
+                logger.error(f"Face embedding error: {str(e)}")
+                encodings.append(None)
+        return encodings
+
+    def detect_for_embedding(
+        self,
+        image: Union[str, np.ndarray]
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Detection stage of the bulk paths (batch_encode_faces, archive import)
+
+        The crop is embedded later with embed_face_crops. That path skips the
+        detector and re-quantises the crop, so before it is trusted, the first
+        image with a face is also encoded with encode_face (the add / search
+        path) and both embeddings are compared. Above IMPORT_PARITY_MAX_DISTANCE
+        the bulk paths encode every image with encode_face, so imported and
+        added faces always score alike.
+
+        Returns:
+            (crop, None) to embed in the batched stage, (None, encoding) when
+            the image was encoded directly, or (None, None) if no face
+        """
+        if self._crop_parity is None:
+            with self._parity_lock:
+                if self._crop_parity is None:
+                    encoding = self.get_face_encoding(image)
+                    if encoding is not None:
+                        self._check_crop_parity(image, encoding)
+                    return None, encoding
+
+        if self._crop_parity:
+            return self.extract_face_crop(image), None
+        return None, self.get_face_encoding(image)
+
+    def _check_crop_parity(self, image: Union[str, np.ndarray], reference: np.ndarray):
+        crop = self.extract_face_crop(image)
+        encoding = self.embed_face_crops([crop])[0] if crop is not None else None
+        if encoding is None:
+            return  # undecided, check again on the next image
+
+        distance = float(1 - np.dot(reference, encoding) / (np.linalg.norm(reference) * np.linalg.norm(encoding)))
+        self._crop_parity_distance = distance
+        self._crop_parity = distance <= settings.IMPORT_PARITY_MAX_DISTANCE
+        if self._crop_parity:
+            logger.info(f"Detect + embed pipeline matches encode_face (cosine distance {distance:.4f})")
+        else:
+            logger.warning(
+                f"Detect + embed pipeline drifts from encode_face (cosine distance {distance:.4f} > "
+                f"{settings.IMPORT_PARITY_MAX_DISTANCE}); bulk paths encode images directly"
+            )
+
+    def embed_detected(
+        self,
+        items: List[Tuple[Any, Optional[np.ndarray], Optional[np.ndarray]]]
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Embedding stage of the bulk paths: one model call for the crops,
+        encodings already computed by detect_for_embedding pass through
+
+        Args:
+            items: (key, crop, encoding) tuples from the detection stage
+
+        Returns:
+            One encoding (or None on error) per item
+        """
+        crops = [crop for _, crop, encoding in items if encoding is None]
+        embedded = iter(self.embed_face_crops(crops) if crops else [])
+        return [encoding if encoding is not None else next(embedded) for _, _, encoding in items]
+
     def draw_face_boxes(
         self, 
         image_path: str, 
@@ -545,6 +814,48 @@ class FaceRecognitionService:
         """Deserialize face encoding from bytes"""
         return pickle.loads(encoding_bytes)
     
+    @timed("rank")
+    def rank_faces(
+        self,
+        query_encoding: np.ndarray,
+        faces: List[Any],
+        top_k: int = 5
+    ) -> List[Dict]:
+        """
+        Score Face rows against a query encoding
+        
+        Args:
+            query_encoding: Face encoding to search for (512-D)
+            faces: Face rows (with encoding loaded)
+            top_k: Number of top results to return
+            
+        Returns:
+            List of matching faces with confidence scores
+        """
+        results = []
+        
+        # Deserialize encodings
+        with timed("decode_encodings"):
+            known_encodings = [pickle.loads(face.encoding) for face in faces]
+        annotate(faces=len(faces))
+        
+        for face, known_encoding in zip(faces, known_encodings):
+            # Compare faces using compare_faces method
+            comparison = self.compare_faces(known_encoding, query_encoding)
+            
+            results.append({
+                "face": face.to_dict(),
+                "distance": comparison["distance"],
+                "confidence": comparison["confidence"],
+                "is_match": comparison["is_match"]
+            })
+        
+        # Sort by similarity (higher is better)
+        results.sort(key=lambda x: x["confidence"], reverse=True)
+        
+        # Return top_k results
+        return results[:top_k]
+    
     def search_face(
         self, 
         query_encoding: np.ndarray, 
@@ -571,39 +882,132 @@ class FaceRecognitionService:
             if not all_faces:
                 return []
             
-            results = []
+            return self.rank_faces(query_encoding, all_faces, top_k)
+        except Exception as e:
+            raise Exception(f"Error searching face: {str(e)}")
+    
+    async def search_face_async(
+        self,
+        query_encoding: np.ndarray,
+        db: AsyncSession,
+        top_k: int = 5,
+        face_filter: Optional[Any] = None,
+        collection: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Search for similar faces in database (async session)
+        
+        Args:
+            query_encoding: Face encoding to search for (512-D)
+            db: Async database session
+            top_k: Number of top results to return
+            face_filter: Optional SearchFilter restricting the candidates
+            collection: Only faces of this collection (default: all)
             
-            for face in all_faces:
-                # Deserialize encoding
-                known_encoding = pickle.loads(face.encoding)
-                
-                # Compare faces using compare_faces method
-                comparison = self.compare_faces(known_encoding, query_encoding)
-                
-                results.append({
-                    "face": face.to_dict(),
-                    "distance": comparison["distance"],
-                    "confidence": comparison["confidence"],
-                    "is_match": comparison["is_match"]
-                })
+        Returns:
+            List of matching faces with confidence scores
+        """
+        try:
+            from app.models.face import Face
             
-            # Sort by similarity (higher is better)
-            results.sort(key=lambda x: x["confidence"], reverse=True)
+            # Get all faces (of the filtered subset) from database
+            query = select(Face)
+            if collection is not None:
+                query = query.where(Face.collection == collection)
+            if face_filter is not None:
+                query = query.where(*face_filter.where_clauses(db.bind.dialect.name))
+            with timed("db_fetch"):
+                result = await db.execute(query)
+                all_faces = result.scalars().all()
+                annotate(rows=len(all_faces))
             
-            # Return top_k results
-            return results[:top_k]
+            if not all_faces:
+                return []
+            
+            return self.rank_faces(query_encoding, all_faces, top_k)
         except Exception as e:
             raise Exception(f"Error searching face: {str(e)}")
-    
+
+    async def search_identities_async(
+        self,
+        query_encoding: np.ndarray,
+        db: AsyncSession,
+        top_k: int = 5,
+        face_filter: Optional[Any] = None,
+        collection: Optional[str] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Two-stage search through the in-memory identity index
+
+        Only the faces of the best-matching identities are scored and only
+        the top_k result rows are read from the database.
+
+        Args:
+            query_encoding: Face encoding to search for (512-D)
+            db: Async database session
+            top_k: Number of top results to return
+            face_filter: Optional SearchFilter; only faces of the subset are scored
+            collection: Collection to search (its index is loaded on first use)
+
+        Returns:
+            (results in search_face_async format,
+             candidate identities: name, distance, is_match, num_faces)
+        """
+        from fastapi.concurrency import run_in_threadpool
+        from sqlalchemy.orm import defer
+        from app.models.face import Face
+        from app.models.face import DEFAULT_COLLECTION
+        from app.services.identity_index import get_index_registry
+
+        with timed("index_load"):
+            index = await run_in_threadpool(get_index_registry().get, collection or DEFAULT_COLLECTION)
+        with timed("index_search"):
+            ranked, groups = await run_in_threadpool(index.search, query_encoding, top_k, face_filter=face_filter)
+        if not ranked:
+            return [], []
+
+        with timed("db_fetch"):
+            result = await db.execute(
+                select(Face).options(defer(Face.encoding)).where(Face.id.in_([face_id for face_id, _ in ranked]))
+            )
+            rows = {face.id: face for face in result.scalars().all()}
+            annotate(rows=len(rows))
+
+        results = []
+        for face_id, distance in ranked:
+            face = rows.get(face_id)
+            if face is None:  # deleted since the index snapshot
+                continue
+            results.append({
+                "face": face.to_dict(),
+                "distance": distance,
+                "confidence": float((1 - distance) * 100),
+                "is_match": distance <= self.recognition_threshold
+            })
+
+        identities = [
+            {
+                "name": group["name"],
+                "distance": group["distance"],
+                "is_match": group["distance"] <= self.recognition_threshold,
+                "num_faces": group["num_faces"]
+            }
+            for group in groups
+        ]
+        return results, identities
+
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information"""
         return {
             "model_name": self.model_name,
+            "backend": self.backend.name,
             "detector": self.detector_backend,
             "distance_metric": self.distance_metric,
             "embedding_size": 512,
             "accuracy": "99.82% (LFW benchmark)",
             "threshold": self.recognition_threshold,
+            "crop_embedding_parity": self._crop_parity,
+            "crop_embedding_distance": self._crop_parity_distance,
             "status": "initialized" if self._initialized else "not initialized"
         }
 
@@ -0,0 +1,192 @@
+"""
+Buffered writer for MatchResult search history
+
+search-face enqueues one record per search and returns immediately.
+A background thread flushes the buffer with a bulk INSERT every
+HISTORY_FLUSH_INTERVAL_MS or as soon as HISTORY_FLUSH_MAX_ROWS records are
+pending, through the single-writer queue. Records of a failed flush go back
+to the front of the buffer (bounded by HISTORY_MAX_BACKLOG) and are retried
+on the next interval. Pending records are drained on shutdown.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import get_settings
+from app.core.metrics import observe_stage
+from app.core.write_queue import get_write_queue
+from app.models.face import MatchResult
+from app.services.stats_service import get_stats_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class HistoryWriter:
+    """Queue match records in memory and persist them in bulk"""
+
+    def __init__(self):
+        self.flush_interval = settings.HISTORY_FLUSH_INTERVAL_MS / 1000
+        self.flush_max_rows = settings.HISTORY_FLUSH_MAX_ROWS
+        self.max_backlog = settings.HISTORY_MAX_BACKLOG
+
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def record(
+        self,
+        query_image_path: str,
+        matched_face_id: Optional[int],
+        distance: Optional[float],
+        confidence: Optional[float]
+    ):
+        """Enqueue one match record (non-blocking)"""
+        row = {
+            "query_image_path": query_image_path,
+            "matched_face_id": matched_face_id,
+            "distance": distance,
+            "confidence": confidence,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+        with self._lock:
+            if len(self._buffer) >= self.max_backlog:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(row)
+            self.recorded += 1
+            pending = len(self._buffer)
+
+        if not self.running and not self._stop_event.is_set():
+            # Started lazily when the app startup hook did not start it;
+            # after stop() records stay buffered
+            self.start()
+        if pending >= self.flush_max_rows:
+            self._wakeup.set()
+
+    def _insert(self, session, rows):
+        session.execute(insert(MatchResult), rows)
+        get_stats_service().searches_recorded(session, rows)
+
+    def _requeue(self, rows) -> int:
+        """
+        Put rows of a failed flush back at the front of the buffer
+
+        Returns:
+            Number of (oldest) records dropped to stay within HISTORY_MAX_BACKLOG
+        """
+        with self._lock:
+            self._buffer.extendleft(reversed(rows))
+            dropped = 0
+            while len(self._buffer) > self.max_backlog:
+                self._buffer.popleft()
+                dropped += 1
+            self.dropped += dropped
+        return dropped
+
+    def backlog(self) -> int:
+        """Number of records waiting to be written"""
+        return len(self._buffer)
+
+    def flush(self) -> int:
+        """
+        Write all pending records with bulk inserts
+
+        Returns:
+            Number of records written
+        """
+        total = 0
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    break
+                count = min(len(self._buffer), self.flush_max_rows)
+                rows = [self._buffer.popleft() for _ in range(count)]
+
+            start = time.perf_counter()
+            try:
+                get_write_queue().submit_sync(lambda session: self._insert(session, rows))
+            except Exception as e:
+                self.failed += len(rows)
+                dropped = self._requeue(rows)
+                logger.error(
+                    f"History flush error ({len(rows)} records requeued, {dropped} dropped): {str(e)}"
+                )
+                # Retry on the next interval instead of spinning on a failing database
+                break
+
+            self.written += len(rows)
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            observe_stage("history_flush", self.last_flush_ms / 1000)
+            total += len(rows)
+
+        return total
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"History writer error: {str(e)}")
+
+    def start(self):
+        """Start the background flusher"""
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and drain pending records"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "backlog": self.backlog(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms,
+            "flush_interval_ms": settings.HISTORY_FLUSH_INTERVAL_MS,
+            "flush_max_rows": self.flush_max_rows,
+        }
+
+
+@lru_cache()
+def get_history_writer() -> HistoryWriter:
+    """Get singleton instance"""
+    return HistoryWriter()
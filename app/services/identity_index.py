@@ -0,0 +1,604 @@
+"""
+Identity prototypes for two-stage search
+
+Faces sharing a name form one identity. The index keeps every embedding
+(L2-normalised float32) resident in one slot matrix together with the
+face metadata (name, description, created_at), plus per-identity
+prototypes: the centroid (normalised running sum) and optionally up to
+IDENTITY_MEDOIDS medoids (representative members, for people whose photos
+vary a lot).
+
+search() runs in two stages:
+1. score every identity by its best prototype and keep the top
+   IDENTITY_SEARCH_CANDIDATES identities
+2. re-rank only the member faces of those identities
+
+A search restricted by a SearchFilter scores only the faces in the
+subset: the filter is compiled once into a bitmap over the slots (kept in
+an LRU of SEARCH_FILTER_CACHE_SIZE masks and patched on every change) and
+the matching slot list is multiplied with the query directly.
+
+Every collection (gallery partition, e.g. one site or customer) has its
+own index. The IndexRegistry loads an index on first use and evicts the
+least recently used ones beyond COLLECTION_INDEX_MAX_LOADED indexes or
+COLLECTION_INDEX_MAX_MB of embeddings.
+
+Write jobs record their changes on the Session (faces_added /
+faces_removed / face_updated on the registry); they are applied to the
+loaded indexes only after the transaction commits, like the stats
+counters. Changes committed while an index is loading are replayed once
+the load finishes.
+"""
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.core.tracing import annotate
+from app.models.face import DEFAULT_COLLECTION, Face
+from app.services.search_filter import SearchFilter, timestamp
+from app.services.similarity import normalize
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Session.info key holding pending changes until commit
+_PENDING = "identity_changes"
+
+
+def _vector(encoding: Any) -> np.ndarray:
+    if isinstance(encoding, (bytes, bytearray, memoryview)):
+        encoding = pickle.loads(bytes(encoding))
+    return normalize(encoding)[0]
+
+
+class Identity:
+    """Member slots and prototypes of one name"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ids: List[int] = []
+        self.slots: List[int] = []
+        self.total: Optional[np.ndarray] = None
+        self._prototypes: Optional[np.ndarray] = None
+
+    def add(self, face_id: int, slot: int, vector: np.ndarray):
+        self.ids.append(face_id)
+        self.slots.append(slot)
+        self.total = vector.copy() if self.total is None else self.total + vector
+        self._prototypes = None
+
+    def remove(self, face_id: int, vector: np.ndarray):
+        index = self.ids.index(face_id)
+        self.total = self.total - vector
+        del self.ids[index]
+        del self.slots[index]
+        self._prototypes = None
+
+    def update(self, old: np.ndarray, new: np.ndarray):
+        self.total = self.total - old + new
+        self._prototypes = None
+
+    def prototypes(self, vectors: np.ndarray, medoids: int) -> np.ndarray:
+        """Centroid plus up to `medoids` spread-out representative members"""
+        if self._prototypes is None:
+            centroid = normalize(self.total)[0]
+            rows = [centroid]
+            if medoids and len(self.ids) > 1:
+                matrix = vectors[self.slots]
+                # Most central member first, then the member least similar to those chosen
+                chosen = [int(np.argmax(matrix @ centroid))]
+                closest = matrix @ matrix[chosen[0]]
+                while len(chosen) < min(medoids, len(self.ids)):
+                    candidate = int(np.argmin(closest))
+                    if candidate in chosen:
+                        break
+                    chosen.append(candidate)
+                    closest = np.maximum(closest, matrix @ matrix[candidate])
+                rows.extend(matrix[chosen])
+            self._prototypes = np.vstack(rows)
+        return self._prototypes
+
+
+class FilterMask:
+    """Bitmap of the slots matching one filter"""
+
+    def __init__(self, face_filter: SearchFilter, mask: np.ndarray):
+        self.filter = face_filter
+        self.mask = mask
+        self._slots: Optional[np.ndarray] = None
+
+    def set(self, slot: int, value: bool):
+        if self.mask[slot] != value:
+            self.mask[slot] = value
+            self._slots = None
+
+    def grow(self, capacity: int):
+        self.mask = np.concatenate([self.mask, np.zeros(capacity - len(self.mask), dtype=bool)])
+
+    @property
+    def slots(self) -> np.ndarray:
+        if self._slots is None:
+            self._slots = np.flatnonzero(self.mask)
+        return self._slots
+
+
+class IdentityIndex:
+    """In-memory gallery of one collection grouped by identity"""
+
+    def __init__(
+        self,
+        collection: str = DEFAULT_COLLECTION,
+        candidates: Optional[int] = None,
+        medoids: Optional[int] = None,
+        mask_cache_size: Optional[int] = None
+    ):
+        self.candidates = candidates or settings.IDENTITY_SEARCH_CANDIDATES
+        self.medoids = settings.IDENTITY_MEDOIDS if medoids is None else medoids
+        self.mask_cache_size = mask_cache_size or settings.SEARCH_FILTER_CACHE_SIZE
+
+        self.collection = collection
+        self._identities: Dict[str, Identity] = {}
+        self._lock = threading.RLock()
+        self._stage1: Optional[Tuple[np.ndarray, np.ndarray, List[str]]] = None
+        self._reset()
+        self.loaded = False
+        self.last_used = 0.0
+
+        # Changes committed while loading
+        self._backlog: List[Tuple] = []
+        self._backlog_lock = threading.Lock()
+
+        self.searches = 0
+        self.filtered_searches = 0
+        self.faces_scored = 0
+        self.mask_hits = 0
+
+    def _reset(self):
+        """Empty slot store"""
+        self._identities.clear()
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._face_ids = np.zeros(0, dtype=np.int64)
+        self._created = np.zeros(0, dtype=np.float64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._names: List[Optional[str]] = []
+        self._descriptions: List[Optional[str]] = []
+        self._slot_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._masks: "OrderedDict[Tuple, FilterMask]" = OrderedDict()
+        self._stage1 = None
+
+    # ---- slot store ----------------------------------------------------
+
+    def _grow(self, dim: int):
+        capacity = max(64, 2 * len(self._alive))
+        grow = capacity - len(self._alive)
+        if self._vectors.shape[1] != dim:
+            self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._vectors = np.concatenate([self._vectors, np.zeros((grow, dim), dtype=np.float32)])
+        self._face_ids = np.concatenate([self._face_ids, np.zeros(grow, dtype=np.int64)])
+        self._created = np.concatenate([self._created, np.zeros(grow, dtype=np.float64)])
+        self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+        self._names.extend([None] * grow)
+        self._descriptions.extend([None] * grow)
+        self._free.extend(range(capacity - 1, capacity - grow - 1, -1))
+        for mask in self._masks.values():
+            mask.grow(capacity)
+
+    def _add(self, face_id: int, name: str, vector: np.ndarray, description: Optional[str], created: float):
+        if face_id in self._slot_of:
+            self._remove(face_id)
+        if not self._free:
+            self._grow(len(vector))
+        slot = self._free.pop()
+
+        self._vectors[slot] = vector
+        self._face_ids[slot] = face_id
+        self._created[slot] = created
+        self._alive[slot] = True
+        self._names[slot] = name
+        self._descriptions[slot] = description
+        self._slot_of[face_id] = slot
+
+        identity = self._identities.get(name)
+        if identity is None:
+            identity = self._identities[name] = Identity(name)
+        identity.add(face_id, slot, vector)
+
+        for mask in self._masks.values():
+            mask.set(slot, mask.filter.matches(name, description, created))
+        self._stage1 = None
+
+    def _remove(self, face_id: int):
+        slot = self._slot_of.pop(face_id, None)
+        if slot is None:
+            return
+        name = self._names[slot]
+        identity = self._identities[name]
+        identity.remove(face_id, self._vectors[slot])
+        if not identity.ids:
+            del self._identities[name]
+
+        self._alive[slot] = False
+        self._names[slot] = None
+        self._descriptions[slot] = None
+        self._free.append(slot)
+        for mask in self._masks.values():
+            mask.set(slot, False)
+        self._stage1 = None
+
+    def _update(self, face_id: int, vector: np.ndarray):
+        slot = self._slot_of.get(face_id)
+        if slot is None:
+            return
+        self._identities[self._names[slot]].update(self._vectors[slot], vector)
+        self._vectors[slot] = vector
+        self._stage1 = None
+
+    def load(self, session_factory=SessionLocal):
+        """Build the index from the collection's rows of the faces table"""
+        session = session_factory()
+        try:
+            stream = session.execute(
+                select(Face.id, Face.name, Face.description, Face.created_at, Face.encoding)
+                .where(Face.collection == self.collection)
+                .execution_options(yield_per=10000)
+            )
+            with self._lock:
+                self._reset()
+                for row in stream:
+                    self._add(row.id, row.name, _vector(row.encoding), row.description, timestamp(row.created_at))
+                with self._backlog_lock:
+                    self._apply(self._backlog)
+                    self._backlog = []
+                    self.loaded = True
+        finally:
+            session.close()
+        logger.info(
+            f"Identity index '{self.collection}': {len(self._slot_of)} face(s), "
+            f"{len(self._identities)} identities"
+        )
+
+    def apply(self, changes: List[Tuple]):
+        """Apply committed changes (queued until the index is loaded)"""
+        with self._backlog_lock:
+            if not self.loaded:
+                self._backlog.extend(changes)
+                return
+        with self._lock:
+            self._apply(changes)
+
+    def _apply(self, changes: List[Tuple]):
+        for change in changes:
+            if change[0] == "add":
+                self._add(change[1], change[2], _vector(change[3]), change[4], change[5])
+            elif change[0] == "remove":
+                self._remove(change[1])
+            else:
+                self._update(change[1], _vector(change[2]))
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate resident size (slot arrays and filter masks)"""
+        size = self._vectors.nbytes + self._face_ids.nbytes + self._created.nbytes + self._alive.nbytes
+        size += sum(mask.mask.nbytes for mask in list(self._masks.values()))
+        stage1 = self._stage1
+        if stage1 is not None:
+            size += stage1[0].nbytes
+        return size
+
+    # ---- filters -------------------------------------------------------
+
+    def _compile(self, face_filter: SearchFilter) -> np.ndarray:
+        """Bitmap of the slots matching a filter"""
+        if face_filter.names is not None:
+            # Start from the members of the listed identities (proportional to the subset)
+            mask = np.zeros(len(self._alive), dtype=bool)
+            for name in face_filter.names:
+                identity = self._identities.get(name)
+                if identity is not None:
+                    mask[identity.slots] = True
+        else:
+            mask = self._alive.copy()
+
+        if face_filter.created_after is not None:
+            mask &= self._created >= face_filter.created_after.timestamp()
+        if face_filter.created_before is not None:
+            mask &= self._created < face_filter.created_before.timestamp()
+        if face_filter.description is not None:
+            needle = face_filter.description
+            for slot in np.flatnonzero(mask):
+                if needle not in (self._descriptions[slot] or "").lower():
+                    mask[slot] = False
+        return mask
+
+    def _filter_slots(self, face_filter: SearchFilter) -> np.ndarray:
+        key = face_filter.key
+        entry = self._masks.get(key)
+        if entry is None:
+            entry = self._masks[key] = FilterMask(face_filter, self._compile(face_filter))
+            while len(self._masks) > self.mask_cache_size:
+                self._masks.popitem(last=False)
+        else:
+            self._masks.move_to_end(key)
+            self.mask_hits += 1
+        return entry.slots
+
+    # ---- search --------------------------------------------------------
+
+    def _stage1_matrix(self) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Stacked prototypes, the identity each row belongs to, and names"""
+        if self._stage1 is None:
+            names = list(self._identities)
+            blocks, owners = [], []
+            for index, name in enumerate(names):
+                prototypes = self._identities[name].prototypes(self._vectors, self.medoids)
+                blocks.append(prototypes)
+                owners.extend([index] * len(prototypes))
+            matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+            self._stage1 = (matrix, np.asarray(owners, dtype=np.int64), names)
+        return self._stage1
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 5,
+        candidates: Optional[int] = None,
+        face_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[Tuple[int, float]], List[Dict[str, Any]]]:
+        """
+        Two-stage search (or a scan of the filtered subset)
+
+        Args:
+            query: Query encoding
+            top_k: Number of faces to return
+            candidates: Identities re-ranked in stage 2
+            face_filter: Restrict the search to a subset of the gallery
+
+        Returns:
+            ([(face_id, cosine distance)] best first,
+             [{"name", "distance", "num_faces"}] per candidate identity, best first)
+        """
+        q = normalize(query)[0]
+        keep = candidates or max(self.candidates, top_k)
+        with self._lock:
+            if face_filter is not None and not face_filter.empty:
+                return self._search_subset(q, top_k, keep, self._filter_slots(face_filter))
+
+            matrix, owners, names = self._stage1_matrix()
+            if len(matrix) == 0:
+                return [], []
+
+            # Stage 1: best prototype score per identity
+            scores = np.full(len(names), -np.inf, dtype=np.float32)
+            np.maximum.at(scores, owners, matrix @ q)
+            keep = min(keep, len(names))
+            top = np.argpartition(-scores, keep - 1)[:keep]
+
+            # Stage 2: members of the candidate identities only
+            faces: List[Tuple[int, float]] = []
+            groups = []
+            scored = 0
+            for index in top:
+                identity = self._identities[names[index]]
+                sims = self._vectors[identity.slots] @ q
+                scored += len(sims)
+                order = np.argsort(-sims)
+                faces.extend((identity.ids[i], float(1.0 - sims[i])) for i in order[:top_k])
+                groups.append({
+                    "name": identity.name,
+                    "distance": float(1.0 - sims[order[0]]),
+                    "num_faces": len(identity.ids),
+                })
+
+            self.searches += 1
+            self.faces_scored += scored
+
+        annotate(prototypes=len(matrix), candidates=len(top), faces_scored=scored)
+        faces.sort(key=lambda item: item[1])
+        groups.sort(key=lambda group: group["distance"])
+        return faces[:top_k], groups
+
+    def _search_subset(
+        self,
+        q: np.ndarray,
+        top_k: int,
+        keep: int,
+        slots: np.ndarray
+    ) -> Tuple[List[Tuple[int, float]], List[Dict[str, Any]]]:
+        """Exact scan of the given slots"""
+        self.searches += 1
+        self.filtered_searches += 1
+        self.faces_scored += len(slots)
+        annotate(filtered=True, faces_scored=len(slots))
+        if len(slots) == 0:
+            return [], []
+
+        sims = self._vectors[slots] @ q
+        k = min(top_k, len(sims))
+        best = np.argpartition(-sims, k - 1)[:k]
+        best = best[np.argsort(-sims[best])]
+        faces = [(int(self._face_ids[slots[i]]), float(1.0 - sims[i])) for i in best]
+
+        # Best face and subset size per identity
+        names = np.asarray([self._names[slot] for slot in slots], dtype=object)
+        unique, inverse, counts = np.unique(names, return_inverse=True, return_counts=True)
+        scores = np.full(len(unique), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, inverse, sims)
+        order = np.argsort(-scores)[:keep]
+        groups = [
+            {"name": unique[i], "distance": float(1.0 - scores[i]), "num_faces": int(counts[i])}
+            for i in order
+        ]
+        return faces, groups
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            faces = len(self._slot_of)
+            identities = len(self._identities)
+            cached_masks = len(self._masks)
+        return {
+            "collection": self.collection,
+            "loaded": self.loaded,
+            "faces": faces,
+            "identities": identities,
+            "medoids": self.medoids,
+            "candidates": self.candidates,
+            "searches": self.searches,
+            "filtered_searches": self.filtered_searches,
+            "avg_faces_scored": round(self.faces_scored / self.searches, 1) if self.searches else 0.0,
+            "cached_filter_masks": cached_masks,
+            "filter_mask_hits": self.mask_hits,
+            "memory_mb": round(self.memory_bytes / 1024 / 1024, 2),
+        }
+
+
+class IndexRegistry:
+    """Lazily loaded, independently evicted identity indexes per collection"""
+
+    def __init__(self, max_loaded: Optional[int] = None, max_mb: Optional[int] = None):
+        self.max_loaded = max_loaded or settings.COLLECTION_INDEX_MAX_LOADED
+        self.max_bytes = (max_mb or settings.COLLECTION_INDEX_MAX_MB) * 1024 * 1024
+        self._indexes: "OrderedDict[str, IdentityIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, collection: str = DEFAULT_COLLECTION) -> IdentityIndex:
+        """Index of a collection, loading it on first use"""
+        with self._lock:
+            index = self._indexes.get(collection)
+            if index is not None and index.loaded:
+                self._indexes.move_to_end(collection)
+                index.last_used = time.time()
+                return index
+            load_lock = self._load_locks.setdefault(collection, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                index = self._indexes.get(collection)
+                if index is not None and index.loaded:
+                    return index
+                # Registered before loading so commits during the load are queued
+                index = self._indexes[collection] = IdentityIndex(collection)
+            index.load()
+            index.last_used = time.time()
+            self.loads += 1
+            self._evict(keep=collection)
+            return index
+
+    def loaded(self, collection: str) -> Optional[IdentityIndex]:
+        """Index of a collection if it is resident (no loading)"""
+        index = self._indexes.get(collection)
+        return index if index is not None and index.loaded else None
+
+    def evict(self, collection: str) -> bool:
+        """Drop a collection's index from memory (reloaded on next use)"""
+        with self._lock:
+            index = self._indexes.get(collection)
+            if index is None or not index.loaded:
+                return False
+            del self._indexes[collection]
+            self.evictions += 1
+        logger.info(f"Identity index '{collection}' evicted")
+        return True
+
+    def _evict(self, keep: str):
+        """Evict least recently used indexes beyond the count / memory budget"""
+        while True:
+            with self._lock:
+                resident = [(name, index) for name, index in self._indexes.items() if index.loaded]
+                total = sum(index.memory_bytes for _, index in resident)
+                if len(resident) <= self.max_loaded and total <= self.max_bytes:
+                    return
+                victim = next((name for name, _ in resident if name != keep), None)
+                if victim is None:
+                    return
+            self.evict(victim)
+
+    # ---- transactional tracking (called inside write jobs) --------------
+
+    def _pending(self, session: Session) -> List[Tuple]:
+        return session.info.setdefault(_PENDING, [])
+
+    def faces_added(self, session: Session, faces: Iterable[Face]):
+        """Record inserted faces (ids are assigned by flushing)"""
+        faces = list(faces)
+        if not faces:
+            return
+        session.flush()
+        self._pending(session).extend(
+            (
+                face.collection or DEFAULT_COLLECTION,
+                ("add", face.id, face.name, face.encoding, face.description, timestamp(face.created_at))
+            )
+            for face in faces
+        )
+
+    def faces_removed(self, session: Session, face_ids: Iterable[int]):
+        self._pending(session).extend((None, ("remove", face_id)) for face_id in face_ids)
+
+    def face_updated(self, session: Session, face: Face):
+        """Record a changed embedding"""
+        self._pending(session).append((None, ("update", face.id, face.encoding)))
+
+    def _after_commit(self, session: Session):
+        changes = session.info.pop(_PENDING, None)
+        if not changes:
+            return
+        with self._lock:
+            indexes = dict(self._indexes)
+        if not indexes:
+            return
+
+        # Adds go to their collection; removals / updates to every index (unknown ids are ignored)
+        routed: Dict[str, List[Tuple]] = {}
+        for collection, change in changes:
+            targets = [collection] if collection is not None else indexes
+            for name in targets:
+                if name in indexes:
+                    routed.setdefault(name, []).append(change)
+        for name, batch in routed.items():
+            indexes[name].apply(batch)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(_PENDING, None)
+
+    def install(self, session_factory=SessionLocal):
+        """Apply committed changes for sessions from this factory"""
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_soft_rollback", lambda s, t: self._after_rollback(s))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        stats = [index.get_stats() for index in indexes if index.loaded]
+        return {
+            "loaded": len(stats),
+            "max_loaded": self.max_loaded,
+            "memory_mb": round(sum(item["memory_mb"] for item in stats), 2),
+            "max_memory_mb": self.max_bytes // 1024 // 1024,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "indexes": stats,
+        }
+
+
+@lru_cache()
+def get_index_registry() -> IndexRegistry:
+    """Get singleton instance"""
+    registry = IndexRegistry()
+    registry.install()
+    return registry
@@ -0,0 +1,429 @@
+"""
+Bulk face import from zip / tar archives
+
+POST /api/import-faces stages the uploaded archive once and enrolls every
+image in it as a single background job:
+- entries are read one at a time from the archive (nothing is extracted
+  to a working directory)
+- decode, face detection, batched embedding and persistence run as
+  pipeline stages with their own worker pools (IMPORT_*_WORKERS,
+  IMPORT_EMBED_BATCH_SIZE); per-stage utilisation is part of the report
+- every IMPORT_BATCH_SIZE faces are committed with one write job (bulk
+  Face insert)
+- every skipped file is reported with its error
+
+Names and descriptions come from an optional CSV manifest in the
+`filename,name,description` format used by auto_upload/batch_upload.py
+(uploaded next to the archive or stored as manifest.csv inside it).
+Files not listed in the manifest are named after their parent directory
+(person/001.jpg) or, at the top level, after the filename.
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+import tarfile
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import PurePosixPath
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.pipeline import Pipeline, Stage
+from app.core.write_queue import get_write_queue
+from app.models.face import DEFAULT_COLLECTION, Face
+from app.services.face_recognition_service import get_face_service
+from app.services.identity_index import get_index_registry
+from app.services.stats_service import get_stats_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MANIFEST_NAME = "manifest.csv"
+
+# Jobs kept in memory for status queries
+MAX_JOBS_KEPT = 50
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def read_manifest(fileobj: IO[bytes]) -> Dict[str, Dict[str, str]]:
+    """
+    Parse a `filename,name,description` CSV manifest
+
+    Returns:
+        Dict keyed by filename (as written in the CSV) -> {"name", "description"}
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        manifest = {}
+        for row in csv.DictReader(text):
+            filename = (row.get("filename") or "").strip()
+            name = (row.get("name") or "").strip()
+            if filename and name:
+                manifest[filename] = {
+                    "name": name,
+                    "description": (row.get("description") or "").strip() or None
+                }
+        return manifest
+    finally:
+        text.detach()
+
+
+def name_from_entry(entry_name: str) -> str:
+    """
+    Derive a person name from an archive entry path
+
+    - "nguyen_van_a/01.jpg" -> "Nguyen Van A"
+    - "john_doe_01.jpg" -> "John Doe"
+    """
+    path = PurePosixPath(entry_name)
+    raw = path.parent.name if path.parent.name else path.stem
+
+    raw = re.sub(r'[_\-]\d+$', '', raw)
+    raw = re.sub(r'^(IMG|DSC|PIC|PHOTO|IMAGE)[_\-]?\d*[_\-]?', '', raw, flags=re.IGNORECASE)
+    name = ' '.join(word.capitalize() for word in raw.replace('_', ' ').replace('-', ' ').split())
+
+    return name if name else "Unknown Person"
+
+
+def _is_image_entry(entry_name: str) -> bool:
+    path = PurePosixPath(entry_name)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return path.suffix.lower().lstrip(".") in settings.allowed_extensions_list
+
+
+def _archive_kind(path: str) -> str:
+    if zipfile.is_zipfile(path):
+        return "zip"
+    if tarfile.is_tarfile(path):
+        return "tar"
+    raise ValueError("Unsupported archive format (expected .zip or .tar/.tar.gz)")
+
+
+class ArchiveReader:
+    """Read image entries of a zip / tar archive one at a time"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.kind = _archive_kind(path)
+
+    def _members(self, archive) -> List[Tuple[str, int, Any]]:
+        if self.kind == "zip":
+            return [(info.filename, info.file_size, info) for info in archive.infolist() if not info.is_dir()]
+        return [(member.name, member.size, member) for member in archive.getmembers() if member.isfile()]
+
+    def _read(self, archive, handle) -> bytes:
+        if self.kind == "zip":
+            return archive.read(handle)
+        fileobj = archive.extractfile(handle)
+        return fileobj.read() if fileobj else b""
+
+    def _open(self):
+        return zipfile.ZipFile(self.path) if self.kind == "zip" else tarfile.open(self.path, "r:*")
+
+    def read_manifest(self) -> Dict[str, Dict[str, str]]:
+        """Manifest stored inside the archive (empty dict if none)"""
+        with self._open() as archive:
+            for name, _, handle in self._members(archive):
+                if PurePosixPath(name).name.lower() == MANIFEST_NAME:
+                    return read_manifest(io.BytesIO(self._read(archive, handle)))
+        return {}
+
+    def count_images(self) -> int:
+        with self._open() as archive:
+            return sum(1 for name, _, _ in self._members(archive) if _is_image_entry(name))
+
+    def iter_images(self, max_size: int) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+        """
+        Yield (entry name, content, error) for every image entry
+
+        Oversized entries are reported without being read.
+        """
+        with self._open() as archive:
+            for name, size, handle in self._members(archive):
+                if not _is_image_entry(name):
+                    continue
+                if size > max_size:
+                    yield name, None, "File too large"
+                    continue
+                try:
+                    yield name, self._read(archive, handle), None
+                except Exception as e:
+                    yield name, None, f"Cannot read entry: {str(e)}"
+
+
+def validate_archive(path: str) -> int:
+    """
+    Check that a staged upload is a readable zip / tar archive
+
+    Returns:
+        Number of image entries
+
+    Raises:
+        ValueError: If the format is unsupported or the archive is corrupt
+    """
+    reader = ArchiveReader(path)
+    try:
+        return reader.count_images()
+    except (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError) as e:
+        raise ValueError(f"Corrupt archive: {str(e)}") from e
+
+
+class ImportJob:
+    """State and report of one archive import"""
+
+    def __init__(
+        self,
+        archive_path: str,
+        filename: str,
+        manifest: Dict[str, Dict[str, str]],
+        collection: str = DEFAULT_COLLECTION
+    ):
+        self.id = uuid.uuid4().hex
+        self.archive_path = archive_path
+        self.filename = filename
+        self.manifest = manifest
+        self.collection = collection
+
+        self.status = PENDING
+        self.total = 0
+        self.processed = 0
+        self.added = 0
+        self.errors: List[Dict[str, str]] = []
+        self.message: Optional[str] = None
+        self.pipeline: Optional[Pipeline] = None
+        self.lock = threading.Lock()
+
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def lookup(self, entry_name: str) -> Tuple[str, Optional[str]]:
+        """Name and description of an entry (manifest first, then path)"""
+        row = self.manifest.get(entry_name) or self.manifest.get(PurePosixPath(entry_name).name)
+        if row:
+            return row["name"], row["description"]
+        return name_from_entry(entry_name), f"Imported from {self.filename}"
+
+    def to_dict(self, include_errors: bool = True) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at:
+            end = self.finished_at or datetime.now(timezone.utc)
+            elapsed = (end - self.started_at).total_seconds()
+
+        data = {
+            "id": self.id,
+            "filename": self.filename,
+            "collection": self.collection,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "added": self.added,
+            "failed": len(self.errors),
+            "elapsed_s": round(elapsed, 2) if elapsed is not None else None,
+            "faces_per_sec": round(self.added / elapsed, 1) if elapsed else None,
+            "message": self.message,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.pipeline is not None:
+            data["pipeline"] = self.pipeline.get_stats()
+        if include_errors:
+            data["errors"] = self.errors
+        return data
+
+
+class BulkImporter:
+    """Run archive imports one at a time on a background thread"""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+    def submit(
+        self,
+        archive_path: str,
+        filename: str,
+        manifest: Optional[Dict[str, Dict[str, str]]] = None,
+        collection: str = DEFAULT_COLLECTION
+    ) -> ImportJob:
+        """
+        Queue an import of a staged archive
+
+        Args:
+            archive_path: Staged archive (removed when the job finishes)
+            filename: Original archive filename (for descriptions / reports)
+            manifest: Optional CSV manifest uploaded with the archive
+            collection: Collection the faces are enrolled into
+
+        Returns:
+            The queued job
+        """
+        job = ImportJob(archive_path, filename, manifest or {}, collection)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOBS_KEPT:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.done:
+                    break
+                self._jobs.popitem(last=False)
+
+        threading.Thread(target=self.run, args=(job,), name=f"face-import-{job.id[:8]}", daemon=True).start()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ImportJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict(include_errors=False) for job in reversed(jobs)]
+
+    def run(self, job: ImportJob):
+        """Run a job to completion (blocking)"""
+        with self._run_lock:
+            job.status = RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            try:
+                self._import(job)
+                job.status = COMPLETED
+                job.message = f"Imported {job.added} of {job.total} image(s)"
+            except Exception as e:
+                logger.error(f"Import {job.id} failed: {str(e)}")
+                job.status = FAILED
+                job.message = str(e)
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                try:
+                    os.remove(job.archive_path)
+                except OSError:
+                    pass
+                job._done.set()
+
+        logger.info(
+            f"Import {job.id}: {job.status}, {job.added}/{job.total} added, "
+            f"{len(job.errors)} error(s)"
+        )
+
+    def _import(self, job: ImportJob):
+        reader = ArchiveReader(job.archive_path)
+        if not job.manifest:
+            job.manifest = reader.read_manifest()
+        job.total = reader.count_images()
+
+        service = get_face_service()
+
+        def entries():
+            # Archive reads stay sequential; everything after runs in stage pools
+            for entry_name, content, error in reader.iter_images(settings.MAX_FILE_SIZE):
+                if error:
+                    self._fail(job, entry_name, error)
+                else:
+                    yield entry_name, content
+
+        def decode(item):
+            entry_name, content = item
+            image = service.decode_image(content)
+            if image is None:
+                self._fail(job, entry_name, "Invalid image file")
+                return None
+            return entry_name, content, image
+
+        def detect(item):
+            entry_name, content, image = item
+            crop, encoding = service.detect_for_embedding(image)
+            if crop is None and encoding is None:
+                self._fail(job, entry_name, "No face detected")
+                return None
+            return entry_name, content, crop, encoding
+
+        def embed(batch):
+            encodings = service.embed_detected([(entry_name, crop, encoding) for entry_name, _, crop, encoding in batch])
+            results = []
+            for (entry_name, content, _, _), encoding in zip(batch, encodings):
+                if encoding is None:
+                    self._fail(job, entry_name, "Encoding failed")
+                else:
+                    results.append((entry_name, content, encoding))
+            return results
+
+        def on_error(stage, item, error):
+            self._fail(job, item[0], f"{stage}: {str(error)}")
+
+        job.pipeline = Pipeline([
+            Stage("decode", decode, workers=settings.IMPORT_DECODE_WORKERS),
+            Stage("detect", detect, workers=settings.IMPORT_DETECT_WORKERS),
+            Stage("embed", embed, batch_size=settings.IMPORT_EMBED_BATCH_SIZE),
+            Stage("persist", lambda batch: self._persist(job, batch), batch_size=self.batch_size, batch_wait_ms=200),
+        ], on_error=on_error)
+        job.pipeline.run(entries())
+
+    def _fail(self, job: ImportJob, entry_name: str, error: str):
+        with job.lock:
+            job.errors.append({"file": entry_name, "error": error})
+            job.processed += 1
+
+    def _persist(self, job: ImportJob, batch: List[Tuple[str, bytes, Any]]):
+        """Save a batch of embedded images and insert their faces with one commit"""
+        service = get_face_service()
+
+        entries: List[str] = []
+        faces: List[Face] = []
+        for entry_name, content, encoding in batch:
+            name, description = job.lookup(entry_name)
+            entries.append(entry_name)
+            faces.append(Face(
+                collection=job.collection,
+                name=name,
+                description=description,
+                image_path=service.save_uploaded_file(content, PurePosixPath(entry_name).name),
+                encoding=service.encode_face_to_bytes(encoding)
+            ))
+
+        def insert_faces(session):
+            session.add_all(faces)
+            get_stats_service().faces_added(session, faces)
+            get_index_registry().faces_added(session, faces)
+
+        try:
+            get_write_queue().submit_sync(insert_faces)
+        except Exception as e:
+            for entry_name, face in zip(entries, faces):
+                try:
+                    os.remove(face.image_path)
+                except OSError:
+                    pass
+                self._fail(job, entry_name, f"Database error: {str(e)}")
+            return []
+
+        with job.lock:
+            job.added += len(faces)
+            job.processed += len(faces)
+        return []
+
+
+@lru_cache()
+def get_bulk_importer() -> BulkImporter:
+    """Get singleton instance"""
+    return BulkImporter()
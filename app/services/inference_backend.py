@@ -0,0 +1,278 @@
+"""
+Pluggable inference backends for FaceRecognitionService
+
+- DeepFaceBackend: RetinaFace detection + ArcFace embeddings (default)
+- StubBackend: no models, no TensorFlow, no network. Boxes and embeddings
+  are derived deterministically from the image content, with configurable
+  simulated latency, so routing, DB, search, caching and concurrency can be
+  benchmarked end to end on hosts without models
+
+Selected with INFERENCE_BACKEND=deepface|stub. Both backends return
+DeepFace's result shapes (extract_faces / represent / verify), so the
+service code does not depend on which one is active.
+"""
+
+import hashlib
+from abc import ABC, abstractmethod
+import logging
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ImageInput = Union[str, np.ndarray]
+
+
+class InferenceBackend(ABC):
+    """Detection / embedding calls used by FaceRecognitionService"""
+
+    name = "base"
+
+    def __init__(self, model_name: str, detector_backend: str, distance_metric: str = "cosine"):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.distance_metric = distance_metric
+
+    def build_model(self):
+        """Load model weights up front (first request would otherwise pay for it)"""
+
+    @abstractmethod
+    def extract_faces(
+        self,
+        image: ImageInput,
+        detector_backend: Optional[str] = None,
+        enforce_detection: bool = False,
+        align: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Detected faces: {"face": RGB float crop, "facial_area": {x, y, w, h}, "confidence"}"""
+
+    @abstractmethod
+    def represent(
+        self,
+        image: Union[ImageInput, List[ImageInput]],
+        detector_backend: Optional[str] = None,
+        enforce_detection: bool = True
+    ) -> List[Any]:
+        """
+        Embeddings: [{"embedding", "facial_area", "face_confidence"}] per face
+        (one such list per image when a list of images is given)
+
+        Raises:
+            ValueError: if enforce_detection and no face is found
+        """
+
+    def verify(self, image1: ImageInput, image2: ImageInput, threshold: float) -> Dict[str, Any]:
+        """Compare the first face of two images (DeepFace.verify result shape)"""
+        first = np.asarray(self.represent(image1)[0]["embedding"], dtype=np.float64)
+        second = np.asarray(self.represent(image2)[0]["embedding"], dtype=np.float64)
+        distance = float(1 - first @ second / (np.linalg.norm(first) * np.linalg.norm(second)))
+        return {"verified": distance <= threshold, "distance": distance, "threshold": threshold}
+
+
+class DeepFaceBackend(InferenceBackend):
+    """DeepFace models (downloaded on first use)"""
+
+    name = "deepface"
+
+    def __init__(self, model_name: str, detector_backend: str, distance_metric: str = "cosine"):
+        super().__init__(model_name, detector_backend, distance_metric)
+        # Imported here so the stub backend runs without TensorFlow installed
+        from deepface import DeepFace
+        self._deepface = DeepFace
+
+    def build_model(self):
+        self._deepface.build_model(self.model_name)
+
+    def extract_faces(self, image, detector_backend=None, enforce_detection=False, align=True):
+        return self._deepface.extract_faces(
+            img_path=image,
+            detector_backend=detector_backend or self.detector_backend,
+            enforce_detection=enforce_detection,
+            align=align
+        )
+
+    def represent(self, image, detector_backend=None, enforce_detection=True):
+        return self._deepface.represent(
+            img_path=image,
+            model_name=self.model_name,
+            detector_backend=detector_backend or self.detector_backend,
+            enforce_detection=enforce_detection
+        )
+
+    def verify(self, image1, image2, threshold):
+        return self._deepface.verify(
+            img1_path=image1,
+            img2_path=image2,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            distance_metric=self.distance_metric,
+            enforce_detection=True
+        )
+
+
+class StubBackend(InferenceBackend):
+    """
+    Deterministic, content-seeded stand-in for the models
+
+    - Detection: flat (single-colour) or tiny images have no face; other
+      images get STUB_FACES_PER_IMAGE boxes side by side
+    - Embedding: unit vector seeded by a hash of the aligned crop, so the
+      same image always gets the same embedding whichever path (single
+      encode, detect + embed pipeline, batch) produced it
+    - Latency: STUB_DETECT_LATENCY_MS per image and STUB_EMBED_LATENCY_MS
+      per face, slept (GPU-like, releases the GIL) or spun (CPU-bound)
+    """
+
+    name = "stub"
+
+    CROP_SIZE = 112
+    MIN_SIZE = 32
+    MIN_STD = 2.0  # flat images (also JPEG-compressed ones) have no face
+
+    def __init__(
+        self,
+        model_name: str,
+        detector_backend: str,
+        distance_metric: str = "cosine",
+        detect_latency_ms: Optional[float] = None,
+        embed_latency_ms: Optional[float] = None,
+        faces_per_image: Optional[int] = None,
+        latency_mode: Optional[str] = None,
+        dim: int = 512
+    ):
+        super().__init__(model_name, detector_backend, distance_metric)
+        self.detect_latency = (settings.STUB_DETECT_LATENCY_MS if detect_latency_ms is None else detect_latency_ms) / 1000
+        self.embed_latency = (settings.STUB_EMBED_LATENCY_MS if embed_latency_ms is None else embed_latency_ms) / 1000
+        self.faces_per_image = settings.STUB_FACES_PER_IMAGE if faces_per_image is None else faces_per_image
+        self.latency_mode = latency_mode or settings.STUB_LATENCY_MODE
+        self.dim = dim
+
+    def _wait(self, seconds: float):
+        if seconds <= 0:
+            return
+        if self.latency_mode == "spin":
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(seconds)
+
+    @staticmethod
+    def _load(image: ImageInput) -> np.ndarray:
+        if isinstance(image, np.ndarray):
+            return image
+        loaded = cv2.imread(str(image))
+        if loaded is None:
+            raise ValueError(f"Unable to load image: {image}")
+        return loaded
+
+    @staticmethod
+    def _to_bgr_uint8(face: np.ndarray) -> np.ndarray:
+        """Same conversion FaceRecognitionService applies to extracted crops"""
+        crop = np.clip(face * 255, 0, 255).astype(np.uint8)
+        return np.ascontiguousarray(crop[:, :, ::-1])
+
+    def _boxes(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        height, width = image.shape[:2]
+        spread = image.reshape(height * width, -1).std(axis=0).max()
+        if min(height, width) < self.MIN_SIZE or spread < self.MIN_STD:
+            return []
+        digest = hashlib.blake2b(image.tobytes(), digest_size=8).digest()
+        count = max(1, self.faces_per_image)
+        slot = width // count
+        side = max(self.MIN_SIZE // 2, int(min(slot, height) * 0.6))
+        return [
+            {
+                "x": index * slot + (slot - side) // 2,
+                "y": (height - side) // 2,
+                "w": side,
+                "h": side,
+                "confidence": round(0.9 + digest[index % len(digest)] / 255 * 0.099, 4),
+            }
+            for index in range(count)
+        ]
+
+    def _embed(self, crop: np.ndarray) -> List[float]:
+        digest = hashlib.blake2b(np.ascontiguousarray(crop).tobytes(), digest_size=8).digest()
+        vector = np.random.default_rng(int.from_bytes(digest, "little")).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def extract_faces(self, image, detector_backend=None, enforce_detection=False, align=True):
+        image = self._load(image)
+        height, width = image.shape[:2]
+        whole = {"x": 0, "y": 0, "w": width, "h": height}
+        if detector_backend == "skip":
+            return [{"face": image[:, :, ::-1] / 255.0, "facial_area": whole, "confidence": 0}]
+
+        self._wait(self.detect_latency)
+        boxes = self._boxes(image)
+        if not boxes:
+            if enforce_detection:
+                raise ValueError("Face could not be detected (stub backend)")
+            # Like DeepFace: the whole image at confidence 0
+            return [{"face": image[:, :, ::-1] / 255.0, "facial_area": whole, "confidence": 0}]
+
+        faces = []
+        for box in boxes:
+            crop = image[box["y"]:box["y"] + box["h"], box["x"]:box["x"] + box["w"]]
+            crop = cv2.resize(crop, (self.CROP_SIZE, self.CROP_SIZE))
+            faces.append({
+                "face": crop[:, :, ::-1].astype(np.float32) / 255.0,
+                "facial_area": {key: box[key] for key in ("x", "y", "w", "h")},
+                "confidence": box["confidence"],
+            })
+        return faces
+
+    def represent(self, image, detector_backend=None, enforce_detection=True):
+        if isinstance(image, list):
+            return [self.represent(item, detector_backend, enforce_detection) for item in image]
+
+        if detector_backend == "skip":
+            crop = self._load(image)
+            self._wait(self.embed_latency)
+            height, width = crop.shape[:2]
+            return [{
+                "embedding": self._embed(crop),
+                "facial_area": {"x": 0, "y": 0, "w": width, "h": height},
+                "face_confidence": 0,
+            }]
+
+        results = []
+        for face in self.extract_faces(image, detector_backend, enforce_detection):
+            self._wait(self.embed_latency)
+            results.append({
+                "embedding": self._embed(self._to_bgr_uint8(face["face"])),
+                "facial_area": face["facial_area"],
+                "face_confidence": face["confidence"],
+            })
+        return results
+
+
+BACKENDS = {
+    DeepFaceBackend.name: DeepFaceBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def create_backend(
+    model_name: str,
+    detector_backend: str,
+    distance_metric: str = "cosine",
+    name: Optional[str] = None
+) -> InferenceBackend:
+    """
+    Backend selected by INFERENCE_BACKEND (or `name`)
+
+    Raises:
+        ValueError: for an unknown backend name
+    """
+    name = (name or settings.INFERENCE_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_name, detector_backend, distance_metric)
@@ -0,0 +1,312 @@
+"""
+Perceptual-hash prefilter for uploads
+
+Re-encoded, resized or recompressed copies of an image we have already
+processed get a new SHA but an (almost) identical perceptual hash. Each
+decoded upload is hashed with a 64-bit DCT pHash (a few hundred
+microseconds) and looked up in a multi-index hash table; if an image within
+PHASH_THRESHOLD bits was seen before, its stored detections / embedding
+are reused and RetinaFace + ArcFace are skipped.
+
+A pHash match alone does not prove it is the same face (ID-style photos
+of two people can be a few bits apart), so a reused embedding must also
+pass a crop check: the stored face region, cut from the new image at
+32x32 grayscale, must match the stored patch within CROP_MAX_DIFF grey
+levels. Detections are reused on the pHash match alone.
+
+Multi-index lookup: the 64-bit hash is split into PHASH_THRESHOLD + 1
+bands. Two hashes within the threshold must agree exactly on at least one
+band (pigeonhole), so only entries sharing a band are compared.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+HASH_BITS = 64
+CROP_PATCH_SIZE = 32
+CROP_MAX_DIFF = 6.0  # mean absolute difference in grey levels (0-255)
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """
+    64-bit DCT perceptual hash (pHash) of a BGR or grayscale image
+
+    The image is reduced to 32x32 grayscale; each bit says whether one of
+    the 8x8 lowest DCT frequencies is above their median.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def crop_patch(image: np.ndarray, box: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    32x32 grayscale patch of a face region given as fractions of the image
+    size (the whole image when box is None)
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if box is not None:
+        height, width = gray.shape[:2]
+        x0, y0 = int(box["x"] * width), int(box["y"] * height)
+        x1 = max(x0 + 1, int(round((box["x"] + box["w"]) * width)))
+        y1 = max(y0 + 1, int(round((box["y"] + box["h"]) * height)))
+        gray = gray[y0:y1, x0:x1]
+    return cv2.resize(gray, (CROP_PATCH_SIZE, CROP_PATCH_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHashTable:
+    """Near-neighbour lookup of 64-bit hashes under a Hamming radius"""
+
+    def __init__(self, radius: int):
+        self.radius = radius
+        self.bands = min(radius + 1, HASH_BITS)
+        widths = [HASH_BITS // self.bands + (1 if i < HASH_BITS % self.bands else 0) for i in range(self.bands)]
+        self._slices: List[Tuple[int, int]] = []
+        shift = HASH_BITS
+        for width in widths:
+            shift -= width
+            self._slices.append((shift, (1 << width) - 1))
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(self.bands)]
+
+    def _keys(self, value: int) -> List[int]:
+        return [(value >> shift) & mask for shift, mask in self._slices]
+
+    def add(self, value: int):
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, set()).add(value)
+
+    def remove(self, value: int):
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[key]
+
+    def nearest(self, value: int) -> Optional[Tuple[int, int]]:
+        """Closest stored hash within the radius as (hash, distance)"""
+        best = None
+        seen: Set[int] = set()
+        for table, key in zip(self._tables, self._keys(value)):
+            for candidate in table.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = hamming(value, candidate)
+                if distance <= self.radius and (best is None or distance < best[1]):
+                    best = (candidate, distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def within(self, value: int) -> List[Tuple[int, int]]:
+        """All stored hashes within the radius as (hash, distance), closest first"""
+        matches = []
+        seen: Set[int] = set()
+        for table, key in zip(self._tables, self._keys(value)):
+            for candidate in table.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = hamming(value, candidate)
+                if distance <= self.radius:
+                    matches.append((candidate, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+
+class PerceptualCache:
+    """Reuse detections and embeddings of near-identical images"""
+
+    def __init__(
+        self,
+        threshold: Optional[int] = None,
+        capacity: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.threshold = settings.PHASH_THRESHOLD if threshold is None else threshold
+        self.capacity = capacity or settings.PHASH_CACHE_SIZE
+        self.enabled = settings.PHASH_ENABLED if enabled is None else enabled
+
+        self._index = MultiIndexHashTable(self.threshold)
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.metrics = {
+            kind: {"lookups": 0, "hits": 0, "rejected": 0}
+            for kind in ("encoding", "detection")
+        }
+
+    def _find(
+        self,
+        value: int,
+        kind: str,
+        accept: Optional[Callable[[Any], bool]] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.metrics[kind]["lookups"] += 1
+            # The closest hash may only hold the other kind (or fail the
+            # accept check): try the next one
+            for candidate, _ in self._index.within(value):
+                entry = self._entries[candidate]
+                if kind not in entry:
+                    continue
+                if accept is not None and not accept(entry[kind]):
+                    self.metrics[kind]["rejected"] += 1
+                    continue
+                self._entries.move_to_end(candidate)
+                self.metrics[kind]["hits"] += 1
+                return entry
+            return None
+
+    def _store(self, value: int, kind: str, data: Any):
+        with self._lock:
+            entry = self._entries.get(value)
+            if entry is None:
+                entry = self._entries[value] = {}
+                self._index.add(value)
+                while len(self._entries) > self.capacity:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._index.remove(evicted)
+            else:
+                self._entries.move_to_end(value)
+            entry[kind] = data
+
+    def get_encoding(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Face encoding of a decoded image, reusing a near-identical one
+
+        A cached encoding is only reused when the crop check confirms the
+        same face region; enrollment still encodes directly.
+
+        Returns:
+            Encoding array or None if no face detected (also cached)
+        """
+        from app.services.face_recognition_service import get_face_service
+
+        if not self.enabled:
+            return get_face_service().get_face_encoding(image)
+
+        def same_crop(cached: Dict[str, Any]) -> bool:
+            patch = crop_patch(image, cached["box"]).astype(np.float32)
+            return float(np.mean(np.abs(patch - cached["patch"]))) <= CROP_MAX_DIFF
+
+        value = perceptual_hash(image)
+        entry = self._find(value, "encoding", accept=same_crop)
+        if entry is not None:
+            return entry["encoding"]["encoding"]
+
+        encoding, box = None, None
+        try:
+            result = get_face_service().encode_face(image)
+            if result["success"] and result["encoding"] is not None:
+                encoding = result["encoding"]
+                box = self._relative_box(result.get("bbox"), image)
+        except Exception as e:
+            logger.error(f"Face encoding error: {str(e)}")
+
+        self._store(value, "encoding", {
+            "encoding": None if encoding is None else np.asarray(encoding, dtype=np.float32),
+            "box": box,
+            "patch": crop_patch(image, box),
+        })
+        return encoding
+
+    def get_face_boxes(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Face boxes of a decoded image (detect_face_boxes format), reusing
+        the detections of a near-identical image rescaled to this size
+        """
+        from app.services.face_recognition_service import get_face_service
+
+        if not self.enabled:
+            return get_face_service().detect_face_boxes(image)
+
+        height, width = image.shape[:2]
+        value = perceptual_hash(image)
+        entry = self._find(value, "detection")
+        if entry is not None:
+            return [self._scale_box(box, width, height) for box in entry["detection"]]
+
+        boxes = get_face_service().detect_face_boxes(image)
+        self._store(value, "detection", [
+            {
+                "x": box["x"] / width, "y": box["y"] / height,
+                "w": box["w"] / width, "h": box["h"] / height,
+                "confidence": box["confidence"]
+            }
+            for box in boxes
+        ])
+        return boxes
+
+    @staticmethod
+    def _relative_box(area: Optional[Dict[str, Any]], image: np.ndarray) -> Optional[Dict[str, float]]:
+        """Facial area in pixels -> fractions of the image size"""
+        if not area:
+            return None
+        height, width = image.shape[:2]
+        x, y = max(0, area["x"]), max(0, area["y"])
+        w, h = min(area["w"], width - x), min(area["h"], height - y)
+        if w <= 0 or h <= 0:
+            return None
+        return {"x": x / width, "y": y / height, "w": w / width, "h": h / height}
+
+    @staticmethod
+    def _scale_box(box: Dict[str, float], width: int, height: int) -> Dict[str, Any]:
+        x, y = int(round(box["x"] * width)), int(round(box["y"] * height))
+        w, h = int(round(box["w"] * width)), int(round(box["h"] * height))
+        return {
+            "x": x, "y": y, "w": w, "h": h,
+            "top": y, "right": x + w, "bottom": y + h, "left": x,
+            "confidence": box["confidence"]
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index = MultiIndexHashTable(self.threshold)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = {
+                kind: {
+                    **values,
+                    "hit_rate": round(values["hits"] / values["lookups"], 4) if values["lookups"] else 0.0
+                }
+                for kind, values in self.metrics.items()
+            }
+            return {
+                "enabled": self.enabled,
+                "threshold_bits": self.threshold,
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "inference_skipped": sum(values["hits"] for values in self.metrics.values()),
+                **metrics,
+            }
+
+
+@lru_cache()
+def get_perceptual_cache() -> PerceptualCache:
+    """Get singleton instance"""
+    return PerceptualCache()
@@ -0,0 +1,249 @@
+"""
+Retention Manager for transient uploads
+
+Query images (search-face), detection originals / annotated copies,
+detection crops and cached thumbnails are written to their own
+sub-directory of UPLOAD_DIR. A background sweeper enforces a per-category policy:
+- TTL: files older than the TTL are removed
+- Quota: if a category is still above its size quota, the least recently
+  used files are evicted until it fits
+
+Files referenced by faces.image_path are never touched.
+"""
+
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Upload sub-directories managed by the sweeper
+QUERIES = "queries"
+DETECTIONS = "detections"
+CROPS = "crops"
+THUMBNAILS = "thumbnails"
+
+
+class RetentionPolicy:
+    """TTL + size quota for one upload category"""
+
+    def __init__(self, category: str, ttl_seconds: int, max_bytes: int):
+        self.category = category
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(settings.UPLOAD_DIR, self.category)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "category": self.category,
+            "directory": self.directory,
+            "ttl_seconds": self.ttl_seconds,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def category_dir(category: str) -> str:
+    """Get (and create) the upload directory of a category"""
+    path = os.path.join(settings.UPLOAD_DIR, category)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def default_policies() -> List[RetentionPolicy]:
+    """Build retention policies from settings"""
+    mb = 1024 * 1024
+    return [
+        RetentionPolicy(QUERIES, settings.RETENTION_QUERIES_TTL, settings.RETENTION_QUERIES_MAX_MB * mb),
+        RetentionPolicy(DETECTIONS, settings.RETENTION_DETECTIONS_TTL, settings.RETENTION_DETECTIONS_MAX_MB * mb),
+        RetentionPolicy(CROPS, settings.RETENTION_CROPS_TTL, settings.RETENTION_CROPS_MAX_MB * mb),
+        RetentionPolicy(THUMBNAILS, settings.RETENTION_THUMBNAILS_TTL, settings.RETENTION_THUMBNAILS_MAX_MB * mb),
+    ]
+
+
+class RetentionManager:
+    """Background sweeper enforcing retention policies on upload categories"""
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None):
+        self.policies = policies if policies is not None else default_policies()
+        self.interval = settings.RETENTION_SWEEP_INTERVAL
+        self.min_age = settings.RETENTION_MIN_AGE
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._metrics = {
+            policy.category: {
+                "files_deleted": 0,
+                "bytes_reclaimed": 0,
+                "current_files": 0,
+                "current_bytes": 0,
+            }
+            for policy in self.policies
+        }
+        self._sweeps = 0
+        self._last_sweep_at: Optional[float] = None
+        self._last_sweep_duration_ms: Optional[float] = None
+
+    def _protected_paths(self) -> Set[str]:
+        """Absolute paths of all images referenced by enrolled faces"""
+        from app.core.database import SessionLocal
+        from app.models.face import Face
+
+        db = SessionLocal()
+        try:
+            rows = db.query(Face.image_path).all()
+            return {os.path.abspath(path) for (path,) in rows if path}
+        finally:
+            db.close()
+
+    def _sweep_category(self, policy: RetentionPolicy, protected: Set[str], now: float) -> Dict[str, int]:
+        """Apply TTL then LRU quota eviction to one category"""
+        deleted = 0
+        reclaimed = 0
+        entries = []
+
+        if not os.path.isdir(policy.directory):
+            return {"files_deleted": 0, "bytes_reclaimed": 0, "current_files": 0, "current_bytes": 0}
+
+        with os.scandir(policy.directory) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if os.path.abspath(entry.path) in protected:
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                # Most recent of access/modification time approximates LRU
+                # (atime is not updated on noatime mounts)
+                last_used = max(stat.st_atime, stat.st_mtime)
+                entries.append((last_used, stat.st_mtime, stat.st_size, entry.path))
+
+        def remove(path: str, size: int) -> bool:
+            nonlocal deleted, reclaimed
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return True
+            except OSError as e:
+                logger.warning(f"Retention: cannot remove {path}: {e}")
+                return False
+            deleted += 1
+            reclaimed += size
+            return True
+
+        kept = []
+        for last_used, mtime, size, path in entries:
+            age = now - mtime
+            if age >= self.min_age and age > policy.ttl_seconds:
+                if remove(path, size):
+                    continue
+            kept.append((last_used, mtime, size, path))
+
+        total = sum(size for _, _, size, _ in kept)
+        if total > policy.max_bytes:
+            kept.sort()  # least recently used first
+            survivors = []
+            for last_used, mtime, size, path in kept:
+                if total > policy.max_bytes and now - mtime >= self.min_age and remove(path, size):
+                    total -= size
+                else:
+                    survivors.append((last_used, mtime, size, path))
+            kept = survivors
+
+        return {
+            "files_deleted": deleted,
+            "bytes_reclaimed": reclaimed,
+            "current_files": len(kept),
+            "current_bytes": total,
+        }
+
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Run one sweep over all categories
+
+        Returns:
+            Dict with per-category files deleted / bytes reclaimed by this sweep
+        """
+        with self._lock:
+            start = time.time()
+            protected = self._protected_paths()
+            result = {}
+
+            for policy in self.policies:
+                try:
+                    stats = self._sweep_category(policy, protected, start)
+                except Exception as e:
+                    logger.error(f"Retention sweep error ({policy.category}): {str(e)}")
+                    continue
+
+                metrics = self._metrics[policy.category]
+                metrics["files_deleted"] += stats["files_deleted"]
+                metrics["bytes_reclaimed"] += stats["bytes_reclaimed"]
+                metrics["current_files"] = stats["current_files"]
+                metrics["current_bytes"] = stats["current_bytes"]
+                result[policy.category] = stats
+
+            self._sweeps += 1
+            self._last_sweep_at = start
+            self._last_sweep_duration_ms = (time.time() - start) * 1000
+
+            reclaimed = sum(s["bytes_reclaimed"] for s in result.values())
+            if reclaimed:
+                logger.info(f"Retention sweep reclaimed {reclaimed} bytes")
+
+            return result
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Retention sweeper error: {str(e)}")
+
+    def start(self):
+        """Start the background sweeper thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        for policy in self.policies:
+            category_dir(policy.category)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sweeper thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get retention metrics"""
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "sweeps": self._sweeps,
+                "last_sweep_at": self._last_sweep_at,
+                "last_sweep_duration_ms": self._last_sweep_duration_ms,
+                "bytes_reclaimed": sum(m["bytes_reclaimed"] for m in self._metrics.values()),
+                "policies": [policy.to_dict() for policy in self.policies],
+                "categories": {k: dict(v) for k, v in self._metrics.items()},
+            }
+
+
+@lru_cache()
+def get_retention_manager() -> RetentionManager:
+    """Get singleton instance"""
+    return RetentionManager()
@@ -0,0 +1,146 @@
+"""
+Metadata filters for face search
+
+A SearchFilter restricts a search to a subset of the gallery:
+- created_after / created_before: enrollment time range
+- description: case-insensitive substring of the face description (e.g. a
+  department written there at enrollment)
+- names: explicit list of identities
+
+The identity index compiles a filter into a bitmap over its resident
+embedding matrix (cached per filter, see IdentityIndex); the database
+fallback turns it into WHERE clauses.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, FrozenSet, List, Optional, Tuple
+
+from app.models.face import Face
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """ISO date or datetime; naive values are taken as UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def timestamp(value: Optional[datetime]) -> float:
+    """POSIX timestamp of a stored created_at (naive values are UTC)"""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def bind_datetime(value: datetime, dialect: Optional[str] = None) -> datetime:
+    """
+    Datetime as compared against created_at on the given dialect
+
+    created_at is DateTime(timezone=True): TIMESTAMPTZ on PostgreSQL, where
+    asyncpg reads a naive value as server-local time, so aware UTC is bound
+    there. SQLite stores the naive UTC text written at enrollment and compares
+    strings, so tzinfo is stripped there.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    if dialect == "sqlite":
+        value = value.replace(tzinfo=None)
+    return value
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so a pattern matches the literal text (escape char '\\')"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchFilter:
+    """Subset of the gallery a search is restricted to"""
+
+    def __init__(
+        self,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        description: Optional[str] = None,
+        names: Optional[List[str]] = None
+    ):
+        self.created_after = created_after
+        self.created_before = created_before
+        self.description = description.strip().lower() if description and description.strip() else None
+        self.names: Optional[FrozenSet[str]] = frozenset(names) if names else None
+
+    @classmethod
+    def from_params(
+        cls,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        description: Optional[str] = None,
+        names: Optional[str] = None
+    ) -> "SearchFilter":
+        """Build from request parameters (names comma-separated)"""
+        name_list = [name.strip() for name in names.split(",") if name.strip()] if names else None
+        return cls(parse_datetime(created_after), parse_datetime(created_before), description, name_list)
+
+    @property
+    def empty(self) -> bool:
+        return (
+            self.created_after is None and self.created_before is None
+            and self.description is None and self.names is None
+        )
+
+    @property
+    def key(self) -> Tuple:
+        """Hashable identity of the filter (mask cache key)"""
+        return (
+            timestamp(self.created_after) if self.created_after else None,
+            timestamp(self.created_before) if self.created_before else None,
+            self.description,
+            tuple(sorted(self.names)) if self.names else None,
+        )
+
+    def matches(self, name: str, description: Optional[str], created: float) -> bool:
+        """Whether one face (created as POSIX timestamp) is in the subset"""
+        if self.names is not None and name not in self.names:
+            return False
+        if self.created_after is not None and created < self.created_after.timestamp():
+            return False
+        if self.created_before is not None and created >= self.created_before.timestamp():
+            return False
+        if self.description is not None and self.description not in (description or "").lower():
+            return False
+        return True
+
+    def where_clauses(self, dialect: Optional[str] = None) -> List[Any]:
+        """
+        Equivalent SQLAlchemy conditions on Face
+
+        Args:
+            dialect: Name of the database dialect the query runs on
+                (datetimes are bound naive on SQLite, aware elsewhere)
+        """
+        clauses = []
+        if self.names is not None:
+            clauses.append(Face.name.in_(sorted(self.names)))
+        if self.created_after is not None:
+            clauses.append(Face.created_at >= bind_datetime(self.created_after, dialect))
+        if self.created_before is not None:
+            clauses.append(Face.created_at < bind_datetime(self.created_before, dialect))
+        if self.description is not None:
+            clauses.append(Face.description.ilike(f"%{escape_like(self.description)}%", escape="\\"))
+        return clauses
+
+    def to_dict(self) -> dict:
+        return {
+            "created_after": self.created_after.isoformat() if self.created_after else None,
+            "created_before": self.created_before.isoformat() if self.created_before else None,
+            "description": self.description,
+            "names": sorted(self.names) if self.names else None,
+        }
@@ -0,0 +1,123 @@
+"""
+Vectorised embedding similarity helpers
+
+All-pairs comparison of N embeddings is done in blocks: each block of
+`block_size` normalised rows is multiplied against the rest of the matrix
+one column tile at a time, so memory stays at block x tile floats instead
+of N x N while the work runs as BLAS matrix products. Only pairs above the
+similarity threshold leave the block (thresholded sparse output).
+"""
+
+import pickle
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+
+def encodings_matrix(encodings: Iterable[bytes]) -> np.ndarray:
+    """Stack pickled encodings into an L2-normalised float32 matrix"""
+    rows = [np.asarray(pickle.loads(encoding), dtype=np.float32) for encoding in encodings]
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    return normalize(np.vstack(rows))
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise rows (cosine similarity becomes a dot product)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_distances(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Cosine distance of one vector to every row of a normalised matrix"""
+    if len(matrix) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return 1.0 - matrix @ normalize(query)[0]
+
+
+def block_pairs(
+    matrix: np.ndarray,
+    start: int,
+    stop: int,
+    min_similarity: float,
+    tile_size: int = 2048
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs (i, j) with start <= i < stop, i < j and similarity >= min_similarity
+
+    Rows start:stop are compared against the rest of the matrix one
+    tile_size column tile at a time, so each product stays cache-sized
+    (block x tile floats) however large the gallery is.
+
+    Returns:
+        (i, j, similarity) arrays (int64, int64, float32)
+    """
+    n = len(matrix)
+    block = matrix[start:stop]
+    found_i, found_j, found_s = [], [], []
+    for col in range(start, n, tile_size):
+        sims = block @ matrix[col:col + tile_size].T
+        rows, cols = np.nonzero(sims >= min_similarity)
+        i, j = rows + start, cols + col
+        upper = i < j
+        found_i.append(i[upper])
+        found_j.append(j[upper])
+        found_s.append(sims[rows[upper], cols[upper]])
+    if not found_i:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
+
+
+def similar_pairs(
+    matrix: np.ndarray,
+    max_distance: float,
+    block_size: int = 1024
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Yield every pair (i, j, distance) with i < j and cosine distance <= max_distance
+
+    Args:
+        matrix: L2-normalised embeddings (N x D)
+        max_distance: Cosine distance threshold
+        block_size: Rows compared per matrix product
+    """
+    n = len(matrix)
+    min_similarity = 1.0 - max_distance
+    for start in range(0, n, block_size):
+        i, j, sims = block_pairs(matrix, start, min(start + block_size, n), min_similarity, block_size)
+        for a, b, sim in zip(i.tolist(), j.tolist(), sims.tolist()):
+            yield a, b, 1.0 - sim
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (path halving, union by size)"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def groups(self, min_size: int = 1) -> List[List[int]]:
+        members: Dict[int, List[int]] = {}
+        for x in range(len(self.parent)):
+            members.setdefault(self.find(x), []).append(x)
+        return [group for group in members.values() if len(group) >= min_size]
@@ -0,0 +1,330 @@
+"""
+Incrementally maintained system statistics
+
+Counters (faces, identities, searches, matches) and per-day rollups live
+in the stat_counters / daily_stats tables, next to per-collection face /
+identity counters ("collection:<name>:faces", "collection:<name>:identities").
+Every write job that changes them records its deltas on the Session; the
+deltas are written in the same transaction and applied to the in-memory
+snapshot only after the commit succeeds. /api/stats is served from memory,
+with no COUNT(*) scans.
+"""
+
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.face import DEFAULT_COLLECTION, Face, MatchResult
+from app.models.stats import StatCounter, DailyStat
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("total_faces", "total_identities", "total_searches", "total_matches")
+DAILY_FIELDS = ("faces_added", "faces_deleted", "searches", "matches")
+COLLECTION_FIELDS = ("faces", "identities")
+COLLECTION_PREFIX = "collection:"
+
+# Session.info key holding pending deltas until commit
+_PENDING = "stats_deltas"
+
+
+def _collection_counter(collection: str, field: str) -> str:
+    return f"{COLLECTION_PREFIX}{collection}:{field}"
+
+
+def _increment(session: Session, model, key: str, key_value: str, deltas: Dict[str, int]):
+    """
+    Add deltas to the row `key_value`, creating it if missing
+
+    One upsert on SQLite / PostgreSQL, so two transactions creating the same
+    row (first write of a day, new counter) do not conflict on the key.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(model).values(**{key: key_value}, **deltas)
+        statement = statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={field: getattr(model, field) + statement.excluded[field] for field in deltas}
+        )
+        session.execute(statement)
+        return
+
+    increments = {getattr(model, field): getattr(model, field) + delta for field, delta in deltas.items()}
+    query = session.query(model).filter(getattr(model, key) == key_value)
+    if query.update(increments, synchronize_session=False):
+        return
+    try:
+        with session.begin_nested():
+            session.add(model(**{key: key_value}, **deltas))
+    except IntegrityError:
+        # Created concurrently since the update above
+        query.update(increments, synchronize_session=False)
+
+
+def _day(value: Optional[datetime] = None) -> str:
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date().isoformat()
+
+
+class StatsService:
+    """In-memory counters backed by transactional counter tables"""
+
+    def __init__(self, days_kept: int = 30):
+        self.days_kept = days_kept
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._daily: Dict[str, Dict[str, int]] = {}
+        self._collections: Dict[str, Dict[str, int]] = {}
+        self._loaded = False
+
+    # ---- transactional updates (called inside write jobs) -------------
+
+    def _pending(self, session: Session) -> Dict[str, Any]:
+        pending = session.info.get(_PENDING)
+        if pending is None:
+            pending = session.info[_PENDING] = {
+                "counters": defaultdict(int),
+                "daily": defaultdict(lambda: defaultdict(int)),
+            }
+        return pending
+
+    def _add(self, session: Session, counters: Dict[str, int], day: str, daily: Dict[str, int]):
+        """Write deltas in the session's transaction and remember them"""
+        for name, delta in counters.items():
+            if delta:
+                _increment(session, StatCounter, "name", name, {"value": delta})
+
+        if any(daily.values()):
+            _increment(session, DailyStat, "day", day, {k: daily.get(k, 0) for k in DAILY_FIELDS})
+
+        pending = self._pending(session)
+        for name, delta in counters.items():
+            pending["counters"][name] += delta
+        for field, delta in daily.items():
+            pending["daily"][day][field] += delta
+
+    def _name_count(self, session: Session, name: str, collection: Optional[str] = None) -> int:
+        query = session.query(func.count(Face.id)).filter(Face.name == name)
+        if collection is not None:
+            query = query.filter(Face.collection == collection)
+        return query.scalar() or 0
+
+    def faces_added(self, session: Session, faces: Iterable[Face]):
+        """Record enrollments (call after the faces are added to the session)"""
+        faces = list(faces)
+        if not faces:
+            return
+        session.flush()
+
+        names = Counter(face.name for face in faces)
+        keys = Counter((face.collection or DEFAULT_COLLECTION, face.name) for face in faces)
+        counters = {
+            "total_faces": len(faces),
+            "total_identities": sum(
+                1 for name, added in names.items() if self._name_count(session, name) == added
+            ),
+        }
+        for (collection, name), added in keys.items():
+            faces_key = _collection_counter(collection, "faces")
+            identities_key = _collection_counter(collection, "identities")
+            counters[faces_key] = counters.get(faces_key, 0) + added
+            counters[identities_key] = counters.get(identities_key, 0) + (
+                self._name_count(session, name, collection) == added
+            )
+        self._add(session, counters, _day(), {"faces_added": len(faces)})
+
+    def face_deleted(self, session: Session, name: str, collection: str = DEFAULT_COLLECTION):
+        """Record a deletion (call after the face row is deleted)"""
+        self.faces_deleted(session, [name], [collection])
+
+    def faces_deleted(self, session: Session, names: List[str], collections: Optional[List[str]] = None):
+        """
+        Record deletions, one name (and collection) per deleted row
+        (call after deleting)
+        """
+        if not names:
+            return
+        session.flush()
+        collections = collections or [DEFAULT_COLLECTION] * len(names)
+
+        keys = Counter(zip(collections, names))
+        counters = {
+            "total_faces": -len(names),
+            "total_identities": -sum(1 for name in set(names) if self._name_count(session, name) == 0),
+        }
+        for (collection, name), removed in keys.items():
+            faces_key = _collection_counter(collection, "faces")
+            identities_key = _collection_counter(collection, "identities")
+            counters[faces_key] = counters.get(faces_key, 0) - removed
+            counters[identities_key] = counters.get(identities_key, 0) - (
+                self._name_count(session, name, collection) == 0
+            )
+        self._add(session, counters, _day(), {"faces_deleted": len(names)})
+
+    def searches_recorded(self, session: Session, rows: List[Dict[str, Any]]):
+        """Record search history rows inserted by the history writer"""
+        per_day: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            day = _day(row.get("created_at"))
+            per_day[day]["searches"] += 1
+            if row.get("matched_face_id") is not None:
+                per_day[day]["matches"] += 1
+
+        for day, daily in per_day.items():
+            self._add(
+                session,
+                {"total_searches": daily["searches"], "total_matches": daily["matches"]},
+                day,
+                daily
+            )
+
+    # ---- session hooks -------------------------------------------------
+
+    def _after_commit(self, session: Session):
+        pending = session.info.pop(_PENDING, None)
+        if not pending:
+            return
+        with self._lock:
+            for name, delta in pending["counters"].items():
+                if name.startswith(COLLECTION_PREFIX):
+                    self._apply_collection(name, delta)
+                else:
+                    self._counters[name] = self._counters.get(name, 0) + delta
+            for day, fields in pending["daily"].items():
+                bucket = self._daily.setdefault(day, {k: 0 for k in DAILY_FIELDS})
+                for field, delta in fields.items():
+                    bucket[field] += delta
+            self._trim_days()
+
+    def _apply_collection(self, counter: str, value: int, absolute: bool = False):
+        collection, _, field = counter[len(COLLECTION_PREFIX):].rpartition(":")
+        bucket = self._collections.setdefault(collection, {k: 0 for k in COLLECTION_FIELDS})
+        bucket[field] = value if absolute else bucket.get(field, 0) + value
+        if not any(bucket.values()):
+            del self._collections[collection]
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(_PENDING, None)
+
+    def install(self, session_factory=SessionLocal):
+        """Apply committed deltas to memory for sessions from this factory"""
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_soft_rollback", lambda s, t: self._after_rollback(s))
+
+    # ---- loading -------------------------------------------------------
+
+    def _cutoff(self) -> str:
+        return (datetime.now(timezone.utc).date() - timedelta(days=self.days_kept)).isoformat()
+
+    def _trim_days(self):
+        cutoff = self._cutoff()
+        for day in [d for d in self._daily if d < cutoff]:
+            del self._daily[day]
+
+    def _backfill(self, session: Session):
+        """One-time scan to seed the counter tables of an existing database"""
+        logger.info("Stats: seeding counters from existing tables")
+        counters = {
+            "total_faces": session.query(func.count(Face.id)).scalar() or 0,
+            "total_identities": session.query(func.count(func.distinct(Face.name))).scalar() or 0,
+            "total_searches": session.query(func.count(MatchResult.id)).scalar() or 0,
+            "total_matches": session.query(func.count(MatchResult.id)).filter(
+                MatchResult.matched_face_id.isnot(None)
+            ).scalar() or 0,
+        }
+        for name, value in counters.items():
+            session.merge(StatCounter(name=name, value=value))
+
+        daily: Dict[str, Dict[str, int]] = defaultdict(lambda: {k: 0 for k in DAILY_FIELDS})
+        for created_at, in session.query(Face.created_at).filter(Face.created_at.isnot(None)):
+            daily[_day(created_at)]["faces_added"] += 1
+        for created_at, matched in session.query(MatchResult.created_at, MatchResult.matched_face_id).filter(
+            MatchResult.created_at.isnot(None)
+        ):
+            day = daily[_day(created_at)]
+            day["searches"] += 1
+            if matched is not None:
+                day["matches"] += 1
+        for day, fields in daily.items():
+            session.merge(DailyStat(day=day, **fields))
+
+        self._backfill_collections(session)
+        session.commit()
+
+    def _backfill_collections(self, session: Session):
+        """Seed the per-collection counters (databases created before collections)"""
+        faces = session.query(Face.collection, func.count(Face.id)).group_by(Face.collection)
+        identities = session.query(Face.collection, func.count(func.distinct(Face.name))).group_by(Face.collection)
+        for field, rows in (("faces", faces), ("identities", identities)):
+            for collection, value in rows:
+                session.merge(StatCounter(name=_collection_counter(collection, field), value=value))
+
+    def load(self):
+        """Load counters into memory (seeding the tables on first run)"""
+        session = SessionLocal()
+        try:
+            if session.query(StatCounter).count() == 0:
+                self._backfill(session)
+            elif session.query(StatCounter).filter(StatCounter.name.startswith(COLLECTION_PREFIX)).count() == 0:
+                self._backfill_collections(session)
+                session.commit()
+
+            counters = {row.name: int(row.value) for row in session.query(StatCounter)}
+            cutoff = self._cutoff()
+            daily = {
+                row.day: {k: getattr(row, k) for k in DAILY_FIELDS}
+                for row in session.query(DailyStat).filter(DailyStat.day >= cutoff)
+            }
+        finally:
+            session.close()
+
+        with self._lock:
+            self._counters = {name: counters.get(name, 0) for name in COUNTERS}
+            self._daily = daily
+            self._collections = {}
+            for name, value in counters.items():
+                if name.startswith(COLLECTION_PREFIX) and value:
+                    self._apply_collection(name, value, absolute=True)
+            self._loaded = True
+
+    # ---- reads ---------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters, today's rollup and recent days (from memory)"""
+        today = _day()
+        with self._lock:
+            return {
+                **self._counters,
+                "today": dict(self._daily.get(today, {k: 0 for k in DAILY_FIELDS})),
+                "daily": [
+                    {"day": day, **fields}
+                    for day, fields in sorted(self._daily.items(), reverse=True)
+                ],
+            }
+
+    def collections(self) -> Dict[str, Dict[str, int]]:
+        """Face / identity counts per collection (from memory)"""
+        with self._lock:
+            return {name: dict(fields) for name, fields in sorted(self._collections.items())}
+
+
+@lru_cache()
+def get_stats_service() -> StatsService:
+    """Get singleton instance"""
+    service = StatsService()
+    service.install()
+    return service
@@ -0,0 +1,226 @@
+"""
+Thumbnail Service for images under UPLOAD_DIR
+
+Resized WebP/JPEG variants are generated on first request and cached in
+UPLOAD_DIR/thumbnails, keyed by the source content hash and target size.
+The cache directory is a retention category, so it stays bounded.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import quote
+
+from PIL import Image, ImageOps
+
+from app.core.config import get_settings
+from app.services.retention_service import THUMBNAILS, category_dir
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# Generation locks are striped by key: bounded memory, rare false sharing
+LOCK_STRIPES = 64
+
+
+def thumbnail_url(image_path: Optional[str], size: Optional[int] = None) -> Optional[str]:
+    """Build the thumbnail URL of an uploaded image"""
+    if not image_path:
+        return None
+    size = size or settings.THUMBNAIL_DEFAULT_SIZE
+    return f"/api/thumbnails?path={quote(image_path)}&size={size}"
+
+
+class ThumbnailService:
+    """Generate and cache resized variants of uploaded images"""
+
+    def __init__(self):
+        self.sizes = sorted(settings.thumbnail_sizes_list)
+        self.quality = settings.THUMBNAIL_QUALITY
+        self.upload_root = os.path.realpath(settings.UPLOAD_DIR)
+
+        # (abs path, mtime_ns, size) -> sha1 of content
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._hash_cache_size = 10000
+        self._lock = threading.Lock()
+        self._key_locks: List[threading.Lock] = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve_source(self, image_path: str) -> str:
+        """
+        Resolve an image path (symlinks included) and make sure it stays inside UPLOAD_DIR
+
+        Raises:
+            ValueError: If the path is outside UPLOAD_DIR
+            FileNotFoundError: If the image does not exist
+        """
+        source = os.path.realpath(image_path)
+        if os.path.commonpath([source, self.upload_root]) != self.upload_root:
+            raise ValueError("Path is outside the upload directory")
+        if not os.path.isfile(source):
+            raise FileNotFoundError(image_path)
+        return source
+
+    def snap_size(self, size: int) -> int:
+        """Round a requested size up to the nearest configured size"""
+        for allowed in self.sizes:
+            if size <= allowed:
+                return allowed
+        return self.sizes[-1]
+
+    def source_hash(self, source: str) -> str:
+        """Content hash of a source image (memoized by path/mtime/size)"""
+        stat = os.stat(source)
+        key = (source, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._hashes.get(key)
+            if digest is not None:
+                self._hashes.move_to_end(key)
+                return digest
+
+        sha1 = hashlib.sha1()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+
+        with self._lock:
+            self._hashes[key] = digest
+            if len(self._hashes) > self._hash_cache_size:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[hash(key) % LOCK_STRIPES]
+
+    def _render(self, source: str, size: int, fmt: str) -> bytes:
+        """
+        Decode, downscale and encode one thumbnail
+
+        Raises:
+            ValueError: If the source cannot be decoded as an image
+        """
+        try:
+            return self._encode(source, size, fmt)
+        except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            raise ValueError(f"Cannot decode image: {e}") from e
+
+    def _encode(self, source: str, size: int, fmt: str) -> bytes:
+        pil_format, _ = FORMATS[fmt]
+        with Image.open(source) as image:
+            # Let the JPEG decoder downscale via DCT scaling (much cheaper)
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+            buffer = io.BytesIO()
+            if pil_format == "JPEG":
+                image.save(buffer, pil_format, quality=self.quality, optimize=True, progressive=True)
+            else:
+                image.save(buffer, pil_format, quality=self.quality, method=4)
+            return buffer.getvalue()
+
+    def describe(self, image_path: str, size: int, fmt: str = "webp") -> Dict[str, Any]:
+        """
+        Resolve the cache entry of a thumbnail without rendering it
+
+        The ETag only depends on the source content hash, size and format,
+        so conditional requests can be answered before any decoding.
+
+        Args:
+            image_path: Path of an image under UPLOAD_DIR
+            size: Requested max dimension (snapped to a configured size)
+            fmt: "webp" or "jpeg"
+
+        Returns:
+            Dict with source, path, format, media_type, etag and size of the thumbnail
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+        source = self.resolve_source(image_path)
+        size = self.snap_size(size)
+        digest = self.source_hash(source)
+        key = f"{digest}_{size}.{fmt}"
+
+        return {
+            "source": source,
+            "key": key,
+            "path": os.path.join(category_dir(THUMBNAILS), key),
+            "format": fmt,
+            "media_type": FORMATS[fmt][1],
+            "etag": f'"{digest}-{size}-{fmt}"',
+            "size": size,
+        }
+
+    def get_thumbnail(self, image_path: str, size: int, fmt: str = "webp") -> Dict[str, Any]:
+        """
+        Get (and create if needed) a cached thumbnail
+
+        Args:
+            image_path: Path of an image under UPLOAD_DIR
+            size: Requested max dimension (snapped to a configured size)
+            fmt: "webp" or "jpeg"
+
+        Returns:
+            Dict with path, media_type and etag of the cached thumbnail
+
+        Raises:
+            ValueError: If the format is unsupported or the image cannot be decoded
+            FileNotFoundError: If the image does not exist
+        """
+        thumbnail = self.describe(image_path, size, fmt)
+        return self.render(thumbnail)
+
+    def render(self, thumbnail: Dict[str, Any]) -> Dict[str, Any]:
+        """Make sure the thumbnail described by describe() exists on disk"""
+        path = thumbnail["path"]
+
+        with self._key_lock(thumbnail["key"]):
+            if os.path.exists(path):
+                self.hits += 1
+                # Refresh access time so LRU eviction keeps hot thumbnails
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+            else:
+                self.misses += 1
+                data = self._render(thumbnail["source"], thumbnail["size"], thumbnail["format"])
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+        return thumbnail
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            "sizes": self.sizes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+@lru_cache()
+def get_thumbnail_service() -> ThumbnailService:
+    """Get singleton instance"""
+    return ThumbnailService()
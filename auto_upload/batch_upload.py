@@ -5,13 +5,24 @@ Tự động upload hàng loạt ảnh khuôn mặt từ folder
 
 import os
 import sys
+import json
+import random
+import argparse
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import time
 
 # Configuration
 API_BASE_URL = "http://localhost:8000/api"
+COLLECTION = "default"  # Collection (gallery) nhận ảnh
 IMAGES_FOLDER = "batch_images"  # Folder chứa ảnh cần upload
+MAX_WORKERS = 8  # Số luồng upload song song
+MAX_RETRIES = 5  # Số lần retry khi lỗi mạng / 429 / 5xx
+BACKOFF_BASE = 0.5  # giây
+BACKOFF_MAX = 30  # giây
+CHECKPOINT_FILE = ".batch_upload_checkpoint.jsonl"  # Lưu trong folder ảnh
 
 def extract_name_from_filename(filename: str) -> str:
     """
@@ -61,133 +72,285 @@ def generate_description(filename: str, index: int, total: int) -> str:
     return descriptions[index % len(descriptions)]
 
 
+class RateController:
+    """
+    Giới hạn số request đồng thời, tự điều chỉnh theo phản hồi của server
+
+    - 429/503: giảm một nửa số luồng được phép chạy và tạm dừng theo Retry-After
+    - Thành công liên tiếp: tăng dần lại (tối đa max_workers)
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.limit = max_workers
+        self.active = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                if self.active < self.limit:
+                    self.active += 1
+                    return
+                self._cond.wait()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self.limit < self.max_workers and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_overload(self, retry_after: float):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+class Checkpoint:
+    """
+    File checkpoint (JSON lines) ghi lại các file đã upload thành công,
+    chạy lại sẽ bỏ qua các file này
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)['file'])
+                    except (ValueError, KeyError):
+                        continue
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.done
+
+    def mark_done(self, filename: str, face_id=None):
+        with self._lock:
+            self.done.add(filename)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'file': filename, 'face_id': face_id}, ensure_ascii=False) + '\n')
+
+
+class UploadClient:
+    """
+    Upload song song qua một requests.Session dùng chung (connection pool),
+    retry với exponential backoff cho lỗi tạm thời
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_retries: int = MAX_RETRIES):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.rate = RateController(max_workers)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def upload(self, image_path: str, name: str, description: str) -> dict:
+        """
+        Upload một ảnh lên server (có retry)
+
+        Sau timeout / lỗi 5xx server có thể đã lưu ảnh, nên 409 (trùng lặp)
+        ở lần retry được coi là thành công với id của face đã có.
+        """
+        error = None
+        maybe_applied = False
+        for attempt in range(self.max_retries + 1):
+            self.rate.acquire()
+            try:
+                with open(image_path, 'rb') as f:
+                    response = self.session.post(
+                        f"{API_BASE_URL}/add-face",
+                        files={'file': (os.path.basename(image_path), f, 'image/jpeg')},
+                        data={'name': name, 'description': description, 'collection': COLLECTION},
+                        timeout=60
+                    )
+            except requests.RequestException as e:
+                response, error = None, str(e)
+                maybe_applied = True
+            finally:
+                self.rate.release()
+
+            if response is not None:
+                if response.status_code == 200:
+                    self.rate.on_success()
+                    return {'success': True, 'response': response.json(), 'error': None}
+
+                error = response.text
+                if response.status_code in (429, 503):
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', ''))
+                    except ValueError:
+                        retry_after = self._backoff(attempt)
+                    self.rate.on_overload(retry_after)
+                    continue
+                duplicate_of = response.headers.get('X-Duplicate-Of')
+                if response.status_code == 409 and maybe_applied and duplicate_of:
+                    self.rate.on_success()
+                    return {
+                        'success': True,
+                        'response': {'face': {'id': int(duplicate_of)}, 'duplicate_of': int(duplicate_of)},
+                        'error': None
+                    }
+                if response.status_code < 500:
+                    # Lỗi dữ liệu (không có khuôn mặt, file sai định dạng...) - không retry
+                    return {'success': False, 'response': None, 'error': error}
+                maybe_applied = True
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+
+        return {'success': False, 'response': None, 'error': error}
+
+
 def upload_single_image(image_path: str, name: str, description: str) -> dict:
     """
     Upload một ảnh lên server
     """
-    try:
-        with open(image_path, 'rb') as f:
-            files = {'file': (os.path.basename(image_path), f, 'image/jpeg')}
-            data = {
-                'name': name,
-                'description': description
-            }
-            
-            response = requests.post(
-                f"{API_BASE_URL}/add-face",
-                files=files,
-                data=data,
-                timeout=30
-            )
-            
-            return {
-                'success': response.status_code == 200,
-                'response': response.json() if response.status_code == 200 else None,
-                'error': response.text if response.status_code != 200 else None
-            }
-    except Exception as e:
-        return {
-            'success': False,
-            'response': None,
-            'error': str(e)
-        }
+    return UploadClient(max_workers=1).upload(image_path, name, description)
+
 
+def list_image_files(folder_path: str) -> list:
+    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
+    return sorted(
+        f for f in os.listdir(folder_path)
+        if Path(f).suffix.lower() in image_extensions
+    )
+
+
+def run_uploads(folder_path: str, tasks: list, max_workers: int = MAX_WORKERS, checkpoint_file: str = None):
+    """
+    Upload danh sách (filename, name, description) bằng worker pool
+
+    Các file đã có trong checkpoint được bỏ qua; file upload thành công được
+    ghi vào checkpoint ngay lập tức nên có thể dừng / chạy lại bất cứ lúc nào.
+    """
+    checkpoint = Checkpoint(checkpoint_file or os.path.join(folder_path, CHECKPOINT_FILE))
+    pending = [task for task in tasks if task[0] not in checkpoint]
+    skipped = len(tasks) - len(pending)
+
+    total = len(pending)
+    print(f"\n{'='*60}")
+    print(f"🚀 Bắt đầu upload {total} ảnh từ folder: {folder_path} ({max_workers} luồng)")
+    if skipped:
+        print(f"⏭️  Bỏ qua {skipped} ảnh đã upload (checkpoint: {checkpoint.path})")
+    print(f"{'='*60}\n")
+
+    client = UploadClient(max_workers=max_workers)
+    success_count = 0
+    failed_files = []
+    start = time.time()
+
+    def upload_task(task):
+        filename, name, description = task
+        return task, client.upload(os.path.join(folder_path, filename), name, description)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(upload_task, task) for task in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            (filename, name, _), result = future.result()
+
+            if result['success']:
+                face_id = (result['response'] or {}).get('face', {}).get('id')
+                checkpoint.mark_done(filename, face_id)
+                success_count += 1
+                print(f"[{done}/{total}] ✅ {filename} -> {name}")
+            else:
+                failed_files.append({'filename': filename, 'error': result['error'] or ''})
+                print(f"[{done}/{total}] ❌ {filename}: {(result['error'] or '')[:100]}")
 
-def batch_upload(folder_path: str, name_mapping: dict = None):
+    elapsed = time.time() - start
+
+    # Summary
+    print(f"\n{'='*60}")
+    print(f"📊 KẾT QUẢ UPLOAD")
+    print(f"{'='*60}")
+    print(f"✅ Thành công: {success_count}/{total}")
+    print(f"❌ Thất bại: {len(failed_files)}/{total}")
+    if elapsed > 0 and total:
+        print(f"⏱️  Thời gian: {elapsed:.1f}s ({success_count / elapsed:.1f} ảnh/giây)")
+
+    if failed_files:
+        print(f"\n📋 Danh sách file thất bại:")
+        for item in failed_files:
+            print(f"  - {item['filename']}: {item['error'][:100]}")
+
+    print(f"\n{'='*60}\n")
+
+    return {'success': success_count, 'failed': failed_files, 'skipped': skipped}
+
+
+def batch_upload(folder_path: str, name_mapping: dict = None, max_workers: int = MAX_WORKERS):
     """
     Upload hàng loạt ảnh từ folder
-    
+
     Args:
         folder_path: Đường dẫn folder chứa ảnh
         name_mapping: Dict mapping filename -> name (optional)
+        max_workers: Số luồng upload song song
     """
     # Kiểm tra folder tồn tại
     if not os.path.exists(folder_path):
         print(f"❌ Folder không tồn tại: {folder_path}")
         return
-    
+
     # Lấy danh sách file ảnh
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-    image_files = [
-        f for f in os.listdir(folder_path)
-        if Path(f).suffix.lower() in image_extensions
-    ]
-    
+    image_files = list_image_files(folder_path)
+
     if not image_files:
         print(f"❌ Không tìm thấy file ảnh trong folder: {folder_path}")
         return
-    
+
     total = len(image_files)
-    print(f"\n{'='*60}")
-    print(f"🚀 Bắt đầu upload {total} ảnh từ folder: {folder_path}")
-    print(f"{'='*60}\n")
-    
-    success_count = 0
-    failed_count = 0
-    failed_files = []
-    
+    tasks = []
     for index, filename in enumerate(image_files):
-        image_path = os.path.join(folder_path, filename)
-        
         # Lấy tên từ mapping hoặc tự động extract
         if name_mapping and filename in name_mapping:
             name = name_mapping[filename]
         else:
             name = extract_name_from_filename(filename)
-        
-        # Tạo description
-        description = generate_description(filename, index, total)
-        
-        print(f"[{index + 1}/{total}] Uploading: {filename}")
-        print(f"    Name: {name}")
-        print(f"    Description: {description}")
-        
-        # Upload
-        result = upload_single_image(image_path, name, description)
-        
-        if result['success']:
-            print(f"    ✅ Success!\n")
-            success_count += 1
-        else:
-            print(f"    ❌ Failed: {result['error']}\n")
-            failed_count += 1
-            failed_files.append({
-                'filename': filename,
-                'error': result['error']
-            })
-        
-        # Delay nhẹ để không quá tải server
-        time.sleep(0.5)
-    
-    # Summary
-    print(f"\n{'='*60}")
-    print(f"📊 KẾT QUẢ UPLOAD")
-    print(f"{'='*60}")
-    print(f"✅ Thành công: {success_count}/{total}")
-    print(f"❌ Thất bại: {failed_count}/{total}")
-    
-    if failed_files:
-        print(f"\n📋 Danh sách file thất bại:")
-        for item in failed_files:
-            print(f"  - {item['filename']}: {item['error'][:100]}")
-    
-    print(f"\n{'='*60}\n")
 
+        tasks.append((filename, name, generate_description(filename, index, total)))
 
-def batch_upload_with_csv(folder_path: str, csv_file: str):
+    return run_uploads(folder_path, tasks, max_workers)
+
+
+def batch_upload_with_csv(folder_path: str, csv_file: str, max_workers: int = MAX_WORKERS):
     """
     Upload hàng loạt với thông tin từ CSV file
-    
+
     CSV format:
     filename,name,description
     person1.jpg,Nguyen Van A,Employee
     person2.jpg,Tran Thi B,Manager
     """
     import csv
-    
+
     name_mapping = {}
     desc_mapping = {}
-    
+
     try:
         with open(csv_file, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
@@ -199,41 +362,24 @@ def batch_upload_with_csv(folder_path: str, csv_file: str):
     except Exception as e:
         print(f"❌ Lỗi đọc CSV file: {e}")
         return
-    
-    # Modify batch_upload to use desc_mapping
+
     if not os.path.exists(folder_path):
         print(f"❌ Folder không tồn tại: {folder_path}")
         return
-    
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-    image_files = [
-        f for f in os.listdir(folder_path)
-        if Path(f).suffix.lower() in image_extensions
-    ]
-    
+
+    image_files = list_image_files(folder_path)
+
     total = len(image_files)
-    print(f"\n🚀 Uploading {total} images with CSV data...\n")
-    
-    success_count = 0
-    for index, filename in enumerate(image_files):
-        image_path = os.path.join(folder_path, filename)
-        
-        name = name_mapping.get(filename, extract_name_from_filename(filename))
-        description = desc_mapping.get(filename, generate_description(filename, index, total))
-        
-        print(f"[{index + 1}/{total}] {filename}: {name}")
-        
-        result = upload_single_image(image_path, name, description)
-        
-        if result['success']:
-            print(f"    ✅ Success!\n")
-            success_count += 1
-        else:
-            print(f"    ❌ Failed: {result['error']}\n")
-        
-        time.sleep(0.5)
-    
-    print(f"\n✅ Uploaded {success_count}/{total} images successfully!\n")
+    tasks = [
+        (
+            filename,
+            name_mapping.get(filename, extract_name_from_filename(filename)),
+            desc_mapping.get(filename, generate_description(filename, index, total))
+        )
+        for index, filename in enumerate(image_files)
+    ]
+
+    return run_uploads(folder_path, tasks, max_workers)
 
 
 def main():
@@ -308,7 +454,23 @@ Chọn phương thức upload:
         print("❌ Lựa chọn không hợp lệ!")
 
 
+def parse_args():
+    """Tham số dòng lệnh (chạy không cần menu, phù hợp chạy tự động)"""
+    parser = argparse.ArgumentParser(description="Batch upload face images")
+    parser.add_argument("folder", nargs="?", help="Folder chứa ảnh (bỏ trống để dùng menu)")
+    parser.add_argument("--csv", help="CSV file (filename,name,description)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Số luồng upload song song")
+    parser.add_argument("--api", default=API_BASE_URL, help="API base URL")
+    parser.add_argument("--reset", action="store_true", help="Xóa checkpoint và upload lại từ đầu")
+    parser.add_argument("--collection", default=COLLECTION, help="Collection (gallery) nhận ảnh")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    API_BASE_URL = args.api.rstrip('/')
+    COLLECTION = args.collection
+    
     # Kiểm tra server đang chạy
     try:
         response = requests.get(f"{API_BASE_URL}/stats", timeout=5)
@@ -320,4 +482,14 @@ if __name__ == "__main__":
         print("   Hãy chạy server trước: python main.py")
         sys.exit(1)
     
-    main()
+    if args.folder:
+        if args.reset:
+            checkpoint_path = os.path.join(args.folder, CHECKPOINT_FILE)
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+        if args.csv:
+            batch_upload_with_csv(args.folder, args.csv, max_workers=args.workers)
+        else:
+            batch_upload(args.folder, max_workers=args.workers)
+    else:
+        main()
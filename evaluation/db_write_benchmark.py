@@ -0,0 +1,177 @@
+"""
+Database Write Throughput Benchmark
+Đo thông lượng ghi SQLite khi nhiều request ghi đồng thời:
+- baseline: cấu hình mặc định, mỗi request commit riêng
+- tuned: WAL + synchronous=NORMAL + mmap/cache/busy_timeout, commit riêng
+- tuned_queue: cấu hình tuned + single-writer queue (gộp commit)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, configure_sqlite_engine
+from app.core.write_queue import WriteQueue
+from app.models.face import MatchResult
+
+
+class DBWriteBenchmark:
+    def __init__(self, threads: int = 16, writes_per_thread: int = 200):
+        self.threads = threads
+        self.writes_per_thread = writes_per_thread
+        self.results = {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "threads": threads,
+                "writes_per_thread": writes_per_thread
+            },
+            "scenarios": {}
+        }
+
+    def _make_session_factory(self, db_path: str, tuned: bool):
+        engine = create_engine(
+            f"sqlite:///{db_path}",
+            connect_args={"check_same_thread": False},
+            pool_size=self.threads,
+            max_overflow=self.threads
+        )
+        if tuned:
+            configure_sqlite_engine(engine)
+        Base.metadata.create_all(bind=engine)
+        return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @staticmethod
+    def _make_row(i: int) -> MatchResult:
+        return MatchResult(
+            query_image_path=f"./uploads/queries/bench_{i}.jpg",
+            matched_face_id=None,
+            distance=0.5,
+            confidence=50.0
+        )
+
+    def _run(self, name: str, tuned: bool, use_queue: bool) -> Dict:
+        print(f"\n=== BENCHMARK: {name} ===")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, SessionFactory = self._make_session_factory(os.path.join(tmp, "bench.db"), tuned)
+
+            write_queue = None
+            if use_queue:
+                write_queue = WriteQueue(session_factory=SessionFactory, enabled=True)
+                write_queue.start()
+
+            latencies: List[float] = []
+            errors = {"count": 0, "locked": 0}
+            lock = threading.Lock()
+
+            def worker(worker_id: int):
+                local = []
+                for n in range(self.writes_per_thread):
+                    row_id = worker_id * self.writes_per_thread + n
+                    start = time.perf_counter()
+                    try:
+                        if write_queue:
+                            write_queue.submit_sync(lambda s, i=row_id: s.add(self._make_row(i)))
+                        else:
+                            session = SessionFactory()
+                            try:
+                                session.add(self._make_row(row_id))
+                                session.commit()
+                            finally:
+                                session.close()
+                        local.append((time.perf_counter() - start) * 1000)
+                    except Exception as e:
+                        with lock:
+                            errors["count"] += 1
+                            if "locked" in str(e):
+                                errors["locked"] += 1
+                with lock:
+                    latencies.extend(local)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+            wall_start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            wall = time.perf_counter() - wall_start
+
+            queue_stats = None
+            if write_queue:
+                write_queue.stop()
+                queue_stats = write_queue.get_stats()
+
+            engine.dispose()
+
+        latencies.sort()
+        result = {
+            "writes_ok": len(latencies),
+            "errors": errors["count"],
+            "locked_errors": errors["locked"],
+            "wall_time_s": round(wall, 3),
+            "writes_per_sec": round(len(latencies) / wall, 1) if wall > 0 else 0,
+        }
+        if latencies:
+            result.update({
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+                "max_ms": round(latencies[-1], 2)
+            })
+        if queue_stats:
+            result["avg_batch_size"] = round(queue_stats["avg_batch_size"], 2)
+
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+        return result
+
+    def run(self) -> Dict:
+        """Chạy tất cả các kịch bản"""
+        self.results["scenarios"]["baseline"] = self._run("baseline (default pragmas, commit per write)", False, False)
+        self.results["scenarios"]["tuned"] = self._run("tuned (WAL profile, commit per write)", True, False)
+        self.results["scenarios"]["tuned_queue"] = self._run("tuned + single-writer queue", True, True)
+
+        base = self.results["scenarios"]["baseline"]["writes_per_sec"]
+        if base:
+            for name, data in self.results["scenarios"].items():
+                data["speedup_vs_baseline"] = round(data["writes_per_sec"] / base, 2)
+
+        return self.results
+
+    def save_results(self, output_path: str):
+        """Lưu kết quả ra file JSON"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Results saved to: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite write throughput benchmark")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="Writes per thread")
+    args = parser.parse_args()
+
+    benchmark = DBWriteBenchmark(threads=args.threads, writes_per_thread=args.writes)
+    benchmark.run()
+
+    output_dir = Path(__file__).parent / "results"
+    output_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    benchmark.save_results(str(output_dir / f"db_write_benchmark_{timestamp}.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ class ReportGenerator:
         
         self.performance_data = {}
         self.comparison_data = {}
+        self.search_scalability_data = {}
         
     def load_latest_results(self):
         """Tải kết quả mới nhất từ các file benchmark"""
@@ -37,6 +38,14 @@ class ReportGenerator:
             with open(latest_comp, 'r', encoding='utf-8') as f:
                 self.comparison_data = json.load(f)
             print(f"✓ Loaded comparison data from {latest_comp.name}")
+        
+        # Load search scalability results
+        search_files = list(self.results_dir.glob("search_scalability_*.json"))
+        if search_files:
+            latest_search = max(search_files, key=os.path.getmtime)
+            with open(latest_search, 'r', encoding='utf-8') as f:
+                self.search_scalability_data = json.load(f)
+            print(f"✓ Loaded search scalability data from {latest_search.name}")
     
     def generate_latex_tables(self) -> Dict[str, str]:
         """Tạo các bảng LaTeX cho thesis"""
@@ -54,6 +63,10 @@ class ReportGenerator:
         # Table 4: Scalability results
         tables["scalability"] = self._generate_scalability_table()
         
+        # Table 5: Search latency per engine and gallery size
+        if self.search_scalability_data:
+            tables["search_scalability"] = self._generate_search_scalability_table()
+        
         return tables
     
     def _generate_performance_table(self) -> str:
@@ -195,7 +208,7 @@ class ReportGenerator:
             
             for result in results:
                 num = result.get("num_faces", 0)
-                time_ms = result.get("avg_query_time_ms", 0)
+                time_ms = result.get("avg_query_time_ms") or 0
                 
                 perf = "Tốt" if time_ms < 100 else "Chấp nhận được" if time_ms < 500 else "Cần tối ưu"
                 latex.append(f"{num} & {time_ms} & {perf} \\\\")
@@ -216,6 +229,47 @@ class ReportGenerator:
         
         return "\n".join(latex)
     
+    def _generate_search_scalability_table(self) -> str:
+        """Bảng độ trễ tìm kiếm theo engine và kích thước gallery"""
+        config = self.search_scalability_data.get("config", {})
+        top_k = config.get("top_k", 10)
+        engine_names = {
+            "per_row": "Per-row (pickle)",
+            "exact": "Exact (vector hóa)",
+            "identity_index": "Identity index",
+        }
+        
+        latex = []
+        latex.append("\\begin{table}[h]")
+        latex.append("\\centering")
+        latex.append("\\caption{Độ trễ tìm kiếm theo kích thước gallery (embedding tổng hợp 512-D)}")
+        latex.append("\\begin{tabular}{|r|l|r|r|r|r|r|r|}")
+        latex.append("\\hline")
+        latex.append("\\textbf{Số khuôn mặt} & \\textbf{Engine} & \\textbf{p50 (ms)} & "
+                    "\\textbf{p99 (ms)} & \\textbf{QPS} & \\textbf{Bộ nhớ (MB)} & "
+                    f"\\textbf{{Build (s)}} & \\textbf{{Recall@{top_k}}} \\\\")
+        latex.append("\\hline")
+        
+        for result in self.search_scalability_data.get("results", []):
+            size = f"{result['gallery_size']:,}"
+            engine = engine_names.get(result["engine"], result["engine"])
+            if "skipped" in result:
+                latex.append(f"{size} & {engine} & \\multicolumn{{6}}{{c|}}{{bỏ qua}} \\\\")
+                continue
+            recall = result.get(f"recall_at_{top_k}")
+            latex.append(
+                f"{size} & {engine} & {result['p50_ms']} & {result['p99_ms']} & {result['qps']} & "
+                f"{result['memory_mb']} & {result['build_s']} & "
+                f"{recall if recall is not None else '-'} \\\\"
+            )
+        
+        latex.append("\\hline")
+        latex.append("\\end{tabular}")
+        latex.append("\\label{tab:search_scalability}")
+        latex.append("\\end{table}")
+        
+        return "\n".join(latex)
+    
     def generate_summary_statistics(self) -> str:
         """Tạo thống kê tóm tắt"""
         stats = []
@@ -0,0 +1,542 @@
+"""
+HTTP Load Test
+Đo thông lượng và độ trễ đuôi của các endpoint thật dưới tải đồng thời:
+- mix: tỉ lệ request /api/search-face, /api/add-face, /api/detect-face
+- closed loop (--concurrency): N client, mỗi client gửi request kế tiếp
+  ngay khi nhận được response
+- open loop (--rates): request đến theo tiến trình Poisson với tốc độ cố
+  định, độ trễ tính từ thời điểm lẽ ra được gửi (không bị coordinated
+  omission khi server chậm)
+- saturation curve: lặp lại ở nhiều mức concurrency / rate
+
+Mặc định tự khởi động app (uvicorn) trong thư mục tạm với database riêng,
+--stub để dùng backend suy luận giả lập (không cần model).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+
+try:
+    import httpx
+except ImportError:  # required at runtime; checked in main()
+    httpx = None
+
+ENDPOINTS = {
+    "search": "/api/search-face",
+    "add": "/api/add-face",
+    "detect": "/api/detect-face",
+}
+STAGE_LINE = re.compile(r'^face_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'search=0.7,add=0.2,detect=0.1' -> normalised weights"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (expected one of: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Mix weights must sum to a positive number")
+    return {name: weight / total for name, weight in mix.items() if weight > 0}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {}
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+class ImageFactory:
+    """
+    JPEG payloads for the requests
+
+    Synthetic images are textured (the stub backend finds faces in them)
+    and each one has a different low-frequency pattern, so they do not hit
+    the server's pHash cache unless --repeat-ratio asks for it. With
+    --images, real photos from a directory are cycled instead.
+    """
+
+    def __init__(self, size: int = 160, seed: int = 0, image_dir: Optional[str] = None, repeat_ratio: float = 0.0):
+        self.size = size
+        self.repeat_ratio = repeat_ratio
+        self.rng = np.random.default_rng(seed)
+        self.files: List[bytes] = []
+        if image_dir:
+            for path in sorted(Path(image_dir).iterdir()):
+                if path.suffix.lower() in (".jpg", ".jpeg", ".png"):
+                    self.files.append(path.read_bytes())
+            if not self.files:
+                raise ValueError(f"No .jpg/.png images in {image_dir}")
+        self._index = 0
+        self._recent: List[bytes] = []
+
+    def _synthesize(self) -> bytes:
+        pattern = self.rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+        image = cv2.resize(pattern, (self.size, self.size), interpolation=cv2.INTER_CUBIC)
+        noise = self.rng.integers(-12, 13, image.shape)
+        image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        return buffer.tobytes()
+
+    def next(self) -> bytes:
+        if self.files:
+            data = self.files[self._index % len(self.files)]
+            self._index += 1
+            return data
+        if self._recent and self.rng.random() < self.repeat_ratio:
+            return self._recent[int(self.rng.integers(len(self._recent)))]
+        data = self._synthesize()
+        self._recent = (self._recent + [data])[-256:]
+        return data
+
+
+class LocalServer:
+    """uvicorn running main:app in its own working directory (database, uploads)"""
+
+    def __init__(self, workdir: str, port: int, workers: int = 1, stub: bool = False, env: Optional[Dict[str, str]] = None):
+        self.workdir = workdir
+        self.port = port
+        self.workers = workers
+        self.env = {**os.environ, **(env or {})}
+        self.env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))
+        if stub:
+            self.env["INFERENCE_BACKEND"] = "stub"
+        self.log_path = os.path.join(workdir, "server.log")
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @staticmethod
+    def free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start(self, timeout: float = 120.0):
+        """Start the server and wait until /health answers"""
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(self.port),
+            "--workers", str(self.workers), "--log-level", "warning",
+        ]
+        with open(self.log_path, "wb") as log:
+            self.process = subprocess.Popen(command, cwd=self.workdir, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}, see {self.log_path}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"Server did not become ready in {timeout:.0f}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class LoadTest:
+    def __init__(
+        self,
+        url: str,
+        mix: Dict[str, float],
+        duration: float = 20.0,
+        warmup: float = 3.0,
+        timeout: float = 30.0,
+        top_k: int = 5,
+        max_in_flight: int = 1024,
+        images: Optional[ImageFactory] = None,
+        seed: int = 0,
+        scrape_metrics: bool = True
+    ):
+        self.url = url.rstrip("/")
+        self.mix = mix
+        self.duration = duration
+        self.warmup = warmup
+        self.timeout = timeout
+        self.top_k = top_k
+        self.max_in_flight = max_in_flight
+        self.images = images or ImageFactory(seed=seed)
+        self.rng = random.Random(seed)
+        self.scrape_metrics = scrape_metrics
+        self._added = 0
+        self.results = {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "url": self.url,
+                "mix": mix,
+                "duration_s": duration,
+                "warmup_s": warmup,
+                "timeout_s": timeout,
+                "top_k": top_k,
+                "max_in_flight": max_in_flight,
+                "image_source": "directory" if self.images.files else "synthetic",
+                "repeat_ratio": self.images.repeat_ratio,
+            },
+            "levels": [],
+        }
+
+    def _pick(self) -> str:
+        return self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    def _payload(self, op: str) -> Tuple[Dict, Dict]:
+        files = {"file": ("load.jpg", self.images.next(), "image/jpeg")}
+        if op == "search":
+            return files, {"top_k": str(self.top_k)}
+        if op == "add":
+            self._added += 1
+            # keep: repeated payloads are enrolled, not rejected as duplicates
+            return files, {"name": f"load_{self._added}", "duplicate_policy": "keep"}
+        return files, {}
+
+    async def _request(self, client, op: str, samples: List[Tuple], scheduled: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        files, data = self._payload(op)
+        start = loop.time()
+        try:
+            response = await client.post(ENDPOINTS[op], files=files, data=data)
+            status = str(response.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        end = loop.time()
+        # Open loop: latency from the scheduled send time (includes client-side queueing)
+        samples.append((start, op, status, (end - (scheduled or start)) * 1000))
+
+    async def _closed_loop(self, client, concurrency: int, samples: List[Tuple]) -> Dict:
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + self.warmup + self.duration
+
+        async def worker():
+            while loop.time() < stop_at:
+                await self._request(client, self._pick(), samples)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return {}
+
+    async def _open_loop(self, client, rate: float, samples: List[Tuple]) -> Dict:
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + self.warmup + self.duration
+        in_flight = set()
+        dropped = 0
+        next_at = loop.time()
+        while next_at < stop_at:
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= self.max_in_flight:
+                dropped += 1
+            else:
+                task = asyncio.create_task(self._request(client, self._pick(), samples, scheduled=next_at))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_at += self.rng.expovariate(rate)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        return {"dropped": dropped}
+
+    async def _stage_totals(self, client) -> Optional[Dict[str, List[float]]]:
+        """face_stage_seconds sum/count per stage from /metrics"""
+        if not self.scrape_metrics:
+            return None
+        try:
+            response = await client.get("/metrics")
+        except httpx.HTTPError:
+            return None
+        if response.status_code != 200:
+            return None
+        totals: Dict[str, List[float]] = {}
+        for line in response.text.splitlines():
+            match = STAGE_LINE.match(line)
+            if match:
+                kind, stage, value = match.groups()
+                totals.setdefault(stage, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+        return totals
+
+    @staticmethod
+    def _stage_means(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict[str, Dict]]:
+        """Server-side mean time per stage during the level (delta of sum / count)"""
+        if before is None or after is None:
+            return None
+        stages = {}
+        for stage, (total, count) in after.items():
+            previous_total, previous_count = before.get(stage, (0.0, 0.0))
+            calls = count - previous_count
+            if calls > 0:
+                stages[stage] = {
+                    "calls": int(calls),
+                    "mean_ms": round((total - previous_total) / calls * 1000, 3),
+                }
+        return dict(sorted(stages.items(), key=lambda item: -item[1]["mean_ms"] * item[1]["calls"]))
+
+    def _summarize(self, mode: str, level: float, samples: List[Tuple], measure_from: float, extra: Dict) -> Dict:
+        measured = [sample for sample in samples if sample[0] >= measure_from]
+        ok = [sample for sample in measured if sample[2].startswith("2")]
+        statuses: Dict[str, int] = {}
+        for sample in measured:
+            statuses[sample[2]] = statuses.get(sample[2], 0) + 1
+
+        result = {
+            "mode": mode,
+            "level": level,
+            "requests": len(measured),
+            "errors": len(measured) - len(ok),
+            "error_rate": round((len(measured) - len(ok)) / len(measured), 4) if measured else 0,
+            "rps": round(len(measured) / self.duration, 2),
+            "ok_rps": round(len(ok) / self.duration, 2),
+            **latency_summary([sample[3] for sample in ok]),
+            "status_codes": statuses,
+            "endpoints": {},
+            **extra,
+        }
+        for op in self.mix:
+            op_samples = [sample for sample in measured if sample[1] == op]
+            op_ok = [sample[3] for sample in op_samples if sample[2].startswith("2")]
+            result["endpoints"][op] = {
+                "requests": len(op_samples),
+                "errors": len(op_samples) - len(op_ok),
+                "rps": round(len(op_samples) / self.duration, 2),
+                **latency_summary(op_ok),
+            }
+        return result
+
+    async def _run_level(self, mode: str, level: float) -> Dict:
+        label = f"concurrency={int(level)}" if mode == "closed" else f"rate={level:g}/s"
+        print(f"\n=== LOAD: {label} ({self.warmup:g}s warmup + {self.duration:g}s) ===")
+
+        connections = int(level) if mode == "closed" else self.max_in_flight
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        # Scrapes use their own connection: the load workers keep the pool busy
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=self.url, timeout=self.timeout) as scraper:
+            samples: List[Tuple] = []
+            loop = asyncio.get_running_loop()
+            measure_from = loop.time() + self.warmup
+            before = None
+            if self.warmup <= 0:
+                before = await self._stage_totals(scraper)
+
+            async def snapshot_after_warmup():
+                nonlocal before
+                await asyncio.sleep(self.warmup)
+                before = await self._stage_totals(scraper)
+
+            warmup_task = asyncio.create_task(snapshot_after_warmup()) if self.warmup > 0 else None
+            if mode == "closed":
+                extra = await self._closed_loop(client, int(level), samples)
+            else:
+                extra = await self._open_loop(client, level, samples)
+            if warmup_task:
+                await warmup_task
+            after = await self._stage_totals(scraper)
+
+        result = self._summarize(mode, level, samples, measure_from, extra)
+        stages = self._stage_means(before, after)
+        if stages is not None:
+            result["server_stages"] = stages
+
+        print(
+            f"  rps: {result['rps']}  ok_rps: {result['ok_rps']}  error_rate: {result['error_rate']}  "
+            f"p50/p95/p99: {result.get('p50_ms')}/{result.get('p95_ms')}/{result.get('p99_ms')} ms"
+            + (f"  dropped: {result['dropped']}" if "dropped" in result else "")
+        )
+        for op, data in result["endpoints"].items():
+            print(f"    {op:<7} {data['requests']:>6} req  p50 {data.get('p50_ms')}  p99 {data.get('p99_ms')} ms  errors {data['errors']}")
+        return result
+
+    async def seed_gallery(self, faces: int, concurrency: int = 8):
+        """Enroll faces before measuring so searches scan a non-empty gallery"""
+        if faces <= 0:
+            return
+        print(f"\nSeeding gallery with {faces} faces...")
+        samples: List[Tuple] = []
+        queue = list(range(faces))
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout, limits=limits) as client:
+            async def worker():
+                while queue:
+                    queue.pop()
+                    await self._request(client, "add", samples)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        ok = sum(1 for sample in samples if sample[2].startswith("2"))
+        self.results["config"]["seed_faces"] = ok
+        print(f"  ✓ {ok}/{faces} enrolled")
+
+    @staticmethod
+    def saturation(levels: List[Dict], tolerance: float = 0.9) -> Dict:
+        """
+        Knee of the throughput curve: the first level reaching `tolerance`
+        of the peak successful throughput. Levels past it only add latency.
+        """
+        if not levels:
+            return {}
+        peak = max(levels, key=lambda level: level["ok_rps"])
+        knee = next(level for level in levels if level["ok_rps"] >= tolerance * peak["ok_rps"])
+        return {
+            "peak_ok_rps": peak["ok_rps"],
+            "peak_level": peak["level"],
+            "knee_level": knee["level"],
+            "knee_p99_ms": knee.get("p99_ms"),
+            "curve": [
+                {
+                    "level": level["level"],
+                    "ok_rps": level["ok_rps"],
+                    "p50_ms": level.get("p50_ms"),
+                    "p99_ms": level.get("p99_ms"),
+                    "error_rate": level["error_rate"],
+                }
+                for level in levels
+            ],
+        }
+
+    async def run(self, concurrency: List[int], rates: List[float]) -> Dict:
+        """Chạy tất cả các mức tải"""
+        mode, levels = ("open", rates) if rates else ("closed", concurrency)
+        self.results["config"]["mode"] = mode
+        for level in levels:
+            self.results["levels"].append(await self._run_level(mode, level))
+        self.results["saturation"] = self.saturation(self.results["levels"])
+
+        sat = self.results["saturation"]
+        print(f"\nPeak: {sat['peak_ok_rps']} ok rps at {mode} level {sat['peak_level']:g}; knee at {sat['knee_level']:g}")
+        return self.results
+
+    def save_results(self, output_path: str):
+        """Lưu kết quả ra file JSON"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Results saved to: {output_path}")
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def _float_list(text: str) -> List[float]:
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load test of the face matching API")
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--stub", action="store_true", help="Local server: INFERENCE_BACKEND=stub")
+    parser.add_argument("--workers", type=int, default=1, help="Local server: uvicorn workers")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Local server: extra setting, e.g. --env STUB_EMBED_LATENCY_MS=20 (repeatable)")
+    parser.add_argument("--workdir", help="Local server: working directory (default: temporary, removed afterwards)")
+    parser.add_argument("--mix", default="search=0.7,add=0.2,detect=0.1")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 2, 4, 8, 16, 32],
+                        help="Closed-loop levels (comma-separated)")
+    parser.add_argument("--rates", type=_float_list, default=[],
+                        help="Open-loop request rates per second (comma-separated); overrides --concurrency")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds per level")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=1024, help="Open loop: cap on outstanding requests")
+    parser.add_argument("--seed-faces", type=int, default=200, help="Faces enrolled before measuring")
+    parser.add_argument("--images", help="Directory of real face photos (default: synthetic images)")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Synthetic images: share of requests reusing a recent image (pHash cache hits)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-metrics", action="store_true", help="Do not scrape /metrics for server stage times")
+    args = parser.parse_args()
+
+    if httpx is None:
+        parser.error("httpx is required: pip install httpx")
+
+    mix = parse_mix(args.mix)
+    images = ImageFactory(seed=args.seed, image_dir=args.images, repeat_ratio=args.repeat_ratio)
+
+    server = None
+    workdir = None
+    if not args.url:
+        workdir = args.workdir or tempfile.mkdtemp(prefix="face_load_")
+        os.makedirs(workdir, exist_ok=True)
+        env = dict(item.split("=", 1) for item in args.env)
+        server = LocalServer(workdir, LocalServer.free_port(), workers=args.workers, stub=args.stub, env=env)
+        print(f"Starting local server ({'stub' if args.stub else 'deepface'} backend) in {workdir}...")
+        server.start()
+        print(f"  ✓ {server.url}")
+
+    try:
+        test = LoadTest(
+            args.url or server.url,
+            mix,
+            duration=args.duration,
+            warmup=args.warmup,
+            timeout=args.timeout,
+            max_in_flight=args.max_in_flight,
+            images=images,
+            seed=args.seed,
+            scrape_metrics=not args.no_metrics
+        )
+        if server:
+            test.results["config"]["server"] = {
+                "workers": args.workers,
+                "backend": "stub" if args.stub else os.environ.get("INFERENCE_BACKEND", "deepface"),
+                "env": dict(item.split("=", 1) for item in args.env),
+            }
+        asyncio.run(test.seed_gallery(args.seed_faces))
+        asyncio.run(test.run(args.concurrency, args.rates))
+    finally:
+        if server:
+            server.stop()
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    output_dir = Path(__file__).parent / "results"
+    output_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    test.save_results(str(output_dir / f"load_test_{timestamp}.json"))
+
+
+if __name__ == "__main__":
+    main()
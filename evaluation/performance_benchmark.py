@@ -17,8 +17,7 @@ from datetime import datetime
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from deepface import DeepFace
-from app.services.face_recognition_service import FaceRecognitionService
+from app.services.face_recognition_service import FaceRecognitionService, get_face_service
 from app.core.database import SessionLocal, init_db
 from app.models.face import Face
 import cv2
@@ -31,7 +30,11 @@ class PerformanceBenchmark:
             "metrics": {},
             "system_info": self._get_system_info()
         }
-        self.service = FaceRecognitionService()
+
+    @property
+    def service(self) -> FaceRecognitionService:
+        """Face service, loaded on first use (the scalability benchmark needs no model)"""
+        return get_face_service()
         
     def _get_system_info(self) -> Dict:
         """Thu thập thông tin hệ thống"""
@@ -58,9 +61,8 @@ class PerformanceBenchmark:
                 
             start = time.time()
             try:
-                faces = DeepFace.extract_faces(
-                    img_path=img_path,
-                    detector_backend='retinaface',
+                faces = self.service.backend.extract_faces(
+                    img_path,
                     enforce_detection=False
                 )
                 elapsed = (time.time() - start) * 1000  # Convert to ms
@@ -90,10 +92,8 @@ class PerformanceBenchmark:
                 
             start = time.time()
             try:
-                embedding = DeepFace.represent(
-                    img_path=img_path,
-                    model_name='ArcFace',
-                    detector_backend='retinaface',
+                embedding = self.service.backend.represent(
+                    img_path,
                     enforce_detection=False
                 )
                 elapsed = (time.time() - start) * 1000
@@ -135,9 +135,8 @@ class PerformanceBenchmark:
             # Detection
             detect_start = time.time()
             try:
-                faces = DeepFace.extract_faces(
-                    img_path=img_path,
-                    detector_backend='retinaface',
+                faces = self.service.backend.extract_faces(
+                    img_path,
                     enforce_detection=False
                 )
                 detect_time = (time.time() - detect_start) * 1000
@@ -148,10 +147,8 @@ class PerformanceBenchmark:
                 
                 # Encoding
                 encode_start = time.time()
-                embedding = DeepFace.represent(
-                    img_path=img_path,
-                    model_name='ArcFace',
-                    detector_backend='retinaface',
+                embedding = self.service.backend.represent(
+                    img_path,
                     enforce_detection=False
                 )[0]["embedding"]
                 encode_time = (time.time() - encode_start) * 1000
@@ -205,14 +202,7 @@ class PerformanceBenchmark:
         
         for img1, img2, is_same in test_pairs:
             try:
-                result = DeepFace.verify(
-                    img1_path=img1,
-                    img2_path=img2,
-                    model_name='ArcFace',
-                    detector_backend='retinaface',
-                    enforce_detection=False,
-                    distance_metric='cosine'
-                )
+                result = self.service.backend.verify(img1, img2, threshold)
                 
                 predicted_same = result['distance'] < threshold
                 
@@ -255,29 +245,34 @@ class PerformanceBenchmark:
             "threshold": threshold
         }
     
-    def benchmark_scalability(self, num_faces_list: List[int] = [10, 50, 100, 500]) -> Dict:
-        """Đánh giá khả năng mở rộng với số lượng khuôn mặt khác nhau"""
+    def benchmark_scalability(self, num_faces_list: List[int] = [1000, 10000, 100000]) -> Dict:
+        """
+        Đánh giá khả năng mở rộng: độ trễ tìm kiếm thật theo kích thước gallery
+        (embedding tổng hợp, xem search_scalability_benchmark.py)
+        """
         print("\n=== BENCHMARK: Scalability ===")
+        from search_scalability_benchmark import SearchScalabilityBenchmark
         
-        db = SessionLocal()
-        results = []
+        search_benchmark = SearchScalabilityBenchmark(
+            sizes=num_faces_list,
+            engines=["exact", "identity_index"],
+            queries=50
+        )
+        engines = search_benchmark.run()["results"]
         
+        results = []
         for num_faces in num_faces_list:
-            times = []
-            for _ in range(5):  # 5 iterations per size
-                start = time.time()
-                faces = db.query(Face).limit(num_faces).all()
-                elapsed = (time.time() - start) * 1000
-                times.append(elapsed)
-            
-            avg_time = statistics.mean(times)
+            measured = {
+                item["engine"]: item for item in engines
+                if item["gallery_size"] == num_faces and "skipped" not in item
+            }
+            default = measured.get("identity_index") or measured.get("exact", {})
             results.append({
                 "num_faces": num_faces,
-                "avg_query_time_ms": round(avg_time, 2)
+                "avg_query_time_ms": default.get("mean_ms"),
+                "engines": measured
             })
-            print(f"  {num_faces} faces: {avg_time:.2f}ms")
         
-        db.close()
         return {"scalability_results": results}
     
     def benchmark_batch_processing(self, group_image_path: str, num_faces: int) -> Dict:
@@ -292,10 +287,8 @@ class PerformanceBenchmark:
         sequential_start = time.time()
         for i in range(num_faces):
             try:
-                DeepFace.represent(
-                    img_path=group_image_path,
-                    model_name='ArcFace',
-                    detector_backend='retinaface',
+                self.service.backend.represent(
+                    group_image_path,
                     enforce_detection=False
                 )
             except:
@@ -305,9 +298,8 @@ class PerformanceBenchmark:
         # Batch processing (single detection + multiple encodings)
         batch_start = time.time()
         try:
-            faces = DeepFace.extract_faces(
-                img_path=group_image_path,
-                detector_backend='retinaface',
+            faces = self.service.backend.extract_faces(
+                group_image_path,
                 enforce_detection=False
             )
             
@@ -370,7 +362,7 @@ class PerformanceBenchmark:
         
         # Scalability
         self.results["metrics"]["scalability"] = self.benchmark_scalability(
-            config.get("num_faces_list", [10, 50, 100])
+            config.get("num_faces_list", [1000, 10000, 100000])
         )
         
         # Batch processing
@@ -489,7 +481,7 @@ def main():
         "e2e_iterations": min(len(image_paths), 5),
         
         # Scalability test
-        "num_faces_list": [10, 50, 100, 500, 1000]
+        "num_faces_list": [1000, 10000, 100000]
     }
     
     # Run benchmark
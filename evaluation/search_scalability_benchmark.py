@@ -0,0 +1,374 @@
+"""
+Search Scalability Benchmark
+Đo độ trễ tìm kiếm thật trên gallery tổng hợp (1k ... 10M khuôn mặt):
+- per_row: đường cũ của rank_faces (unpickle + scipy cosine từng dòng)
+- exact: quét vector hóa (ma trận chuẩn hóa @ query, chia block)
+- identity_index: IdentityIndex hai tầng (prototype -> thành viên)
+
+Embedding 512-D tổng hợp được sinh theo danh tính (tâm ngẫu nhiên + nhiễu,
+cosine cùng người ~0.6, khác người ~0), query là ảnh mới của một danh tính
+có trong gallery. Báo cáo p50/p95/p99, QPS, bộ nhớ, thời gian build và
+recall@k so với exact; gallery lớn hơn --max-memory-gb được ghi ra memmap.
+"""
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.identity_index import IdentityIndex
+from app.services.similarity import normalize
+
+try:
+    import psutil
+except ImportError:  # optional: RSS deltas are reported when available
+    psutil = None
+
+DIM = 512
+ENGINES = ("per_row", "exact", "identity_index")
+SearchFn = Callable[[np.ndarray], List[int]]
+
+
+class SyntheticGallery:
+    """Identity-clustered unit embeddings, generated chunk by chunk"""
+
+    def __init__(
+        self,
+        size: int,
+        faces_per_identity: int = 5,
+        noise: float = 0.8,
+        seed: int = 42,
+        chunk_identities: int = 20000
+    ):
+        self.size = size
+        self.faces_per_identity = faces_per_identity
+        self.noise = noise / np.sqrt(DIM)
+        self.seed = seed
+        self.chunk_identities = chunk_identities
+        self.num_identities = -(-size // faces_per_identity)
+
+    def chunks(self, query_identities: np.ndarray):
+        """
+        Yield (start, vectors, queries) per chunk of identities
+
+        queries: {identity: fresh embedding of that identity} for the
+        requested identities falling into the chunk
+        """
+        wanted = set(int(i) for i in query_identities)
+        for first in range(0, self.num_identities, self.chunk_identities):
+            last = min(first + self.chunk_identities, self.num_identities)
+            rng = np.random.default_rng([self.seed, first])
+            centers = normalize(rng.standard_normal((last - first, DIM), dtype=np.float32))
+
+            start = first * self.faces_per_identity
+            stop = min(last * self.faces_per_identity, self.size)
+            owners = np.arange(start, stop) // self.faces_per_identity - first
+            vectors = centers[owners] + rng.normal(0, self.noise, (stop - start, DIM)).astype(np.float32)
+
+            queries = {}
+            for identity in range(first, last):
+                if identity in wanted:
+                    center = centers[identity - first]
+                    queries[identity] = normalize(
+                        center + rng.normal(0, self.noise, DIM).astype(np.float32)
+                    )[0]
+            yield start, normalize(vectors), queries
+
+
+class SearchScalabilityBenchmark:
+    def __init__(
+        self,
+        sizes: List[int],
+        engines: List[str],
+        queries: int = 100,
+        top_k: int = 10,
+        per_row_max: int = 50000,
+        per_row_queries: int = 10,
+        max_memory_gb: float = 2.0,
+        work_dir: Optional[str] = None,
+        faces_per_identity: int = 5,
+        seed: int = 42
+    ):
+        self.sizes = sizes
+        self.engines = engines
+        self.queries = queries
+        self.top_k = top_k
+        self.per_row_max = per_row_max
+        self.per_row_queries = per_row_queries
+        self.max_bytes = int(max_memory_gb * 1024 ** 3)
+        self.work_dir = work_dir
+        self.faces_per_identity = faces_per_identity
+        self.seed = seed
+        self.results = {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "sizes": sizes,
+                "engines": engines,
+                "queries": queries,
+                "top_k": top_k,
+                "dim": DIM,
+                "faces_per_identity": faces_per_identity,
+                "per_row_max": per_row_max,
+                "max_memory_gb": max_memory_gb,
+            },
+            "system_info": {
+                "os": platform.system(),
+                "processor": platform.processor(),
+                "cpu_count": os.cpu_count(),
+                "python_version": platform.python_version(),
+                "numpy_version": np.__version__,
+            },
+            "results": []
+        }
+
+    @staticmethod
+    def _rss_mb() -> Optional[float]:
+        return psutil.Process().memory_info().rss / 1024 ** 2 if psutil else None
+
+    # ---- gallery -------------------------------------------------------
+
+    def _build_gallery(self, size: int, tmp: str) -> Tuple[np.ndarray, np.ndarray, float]:
+        """Materialise the gallery (RAM or memmap) and the query set"""
+        gallery = SyntheticGallery(size, self.faces_per_identity, seed=self.seed)
+        rng = np.random.default_rng(self.seed + size)
+        query_identities = rng.choice(gallery.num_identities, size=self.queries, replace=True)
+
+        nbytes = size * DIM * 4
+        if nbytes <= self.max_bytes:
+            matrix = np.empty((size, DIM), dtype=np.float32)
+        else:
+            path = os.path.join(tmp, f"gallery_{size}.f32")
+            print(f"  gallery {nbytes / 1024 ** 3:.1f} GB > budget, memmap at {path}")
+            matrix = np.memmap(path, dtype=np.float32, mode="w+", shape=(size, DIM))
+
+        start_time = time.perf_counter()
+        found = {}
+        for start, vectors, queries in gallery.chunks(query_identities):
+            matrix[start:start + len(vectors)] = vectors
+            found.update(queries)
+        elapsed = time.perf_counter() - start_time
+
+        queries = np.vstack([found[int(identity)] for identity in query_identities])
+        return matrix, queries, elapsed
+
+    # ---- engines -------------------------------------------------------
+
+    def _build_per_row(self, matrix: np.ndarray) -> Tuple[SearchFn, int]:
+        """Pickled float64 encodings as stored in faces.encoding"""
+        from scipy.spatial.distance import cosine
+
+        rows = [pickle.dumps(np.asarray(vector, dtype=np.float64)) for vector in matrix]
+
+        def search(query: np.ndarray) -> List[int]:
+            scored = []
+            for face_id, encoding in enumerate(rows):
+                scored.append((1 - float(cosine(pickle.loads(encoding), query)), face_id))
+            scored.sort(reverse=True)
+            return [face_id for _, face_id in scored[:self.top_k]]
+
+        return search, sum(len(row) for row in rows)
+
+    def _build_exact(self, matrix: np.ndarray) -> Tuple[SearchFn, int]:
+        """Blocked matrix-vector product + argpartition (works on memmaps)"""
+        block = 1 << 18
+        top_k = self.top_k
+
+        def search(query: np.ndarray) -> List[int]:
+            best_ids = []
+            best_sims = []
+            for start in range(0, len(matrix), block):
+                sims = np.asarray(matrix[start:start + block]) @ query
+                k = min(top_k, len(sims))
+                top = np.argpartition(-sims, k - 1)[:k]
+                best_ids.append(top + start)
+                best_sims.append(sims[top])
+            ids = np.concatenate(best_ids)
+            sims = np.concatenate(best_sims)
+            order = np.argsort(-sims)[:top_k]
+            return ids[order].tolist()
+
+        resident = 0 if isinstance(matrix, np.memmap) else matrix.nbytes
+        return search, resident
+
+    def _build_identity_index(self, matrix: np.ndarray) -> Tuple[SearchFn, int]:
+        """The service's two-stage index, fed through its change log"""
+        index = IdentityIndex(collection="benchmark")
+        index.loaded = True
+        faces_per_identity = self.faces_per_identity
+        step = 100000
+        for start in range(0, len(matrix), step):
+            vectors = np.asarray(matrix[start:start + step])
+            index.apply([
+                ("add", start + i, f"id{(start + i) // faces_per_identity}", vector, None, 0.0)
+                for i, vector in enumerate(vectors)
+            ])
+        index.search(matrix[0], self.top_k)  # builds the stage-1 prototype matrix
+
+        def search(query: np.ndarray) -> List[int]:
+            ranked, _ = index.search(query, self.top_k)
+            return [face_id for face_id, _ in ranked]
+
+        return search, index.memory_bytes
+
+    # ---- runs ----------------------------------------------------------
+
+    def _skip_reason(self, engine: str, size: int, matrix: np.ndarray) -> Optional[str]:
+        if engine == "per_row" and size > self.per_row_max:
+            return f"gallery larger than --per-row-max ({self.per_row_max})"
+        if engine == "identity_index" and size * DIM * 4 > self.max_bytes:
+            return "index would not fit in --max-memory-gb"
+        return None
+
+    def _measure(self, search: SearchFn, queries: np.ndarray) -> Tuple[List[float], List[List[int]]]:
+        latencies, answers = [], []
+        for query in queries:
+            start = time.perf_counter()
+            answers.append(search(query))
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies, answers
+
+    def _run_engine(
+        self,
+        engine: str,
+        size: int,
+        matrix: np.ndarray,
+        queries: np.ndarray,
+        truth: Optional[List[List[int]]]
+    ) -> Tuple[Dict, List[List[int]]]:
+        gc.collect()
+        rss_before = self._rss_mb()
+        start = time.perf_counter()
+        search, memory = getattr(self, f"_build_{engine}")(matrix)
+        build = time.perf_counter() - start
+        rss_after = self._rss_mb()
+
+        if engine == "per_row":
+            queries = queries[:self.per_row_queries]
+        latencies, answers = self._measure(search, queries)
+        ordered = sorted(latencies)
+
+        def percentile(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+        result = {
+            "gallery_size": size,
+            "engine": engine,
+            "queries": len(latencies),
+            "build_s": round(build, 3),
+            "memory_mb": round(memory / 1024 ** 2, 1),
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None else None,
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "qps": round(len(latencies) / (sum(latencies) / 1000), 1),
+        }
+        if engine == "exact":
+            result[f"recall_at_{self.top_k}"] = 1.0
+        elif truth is not None:
+            hits = [
+                len(set(answer) & set(expected)) / len(expected)
+                for answer, expected in zip(answers, truth)
+                if expected
+            ]
+            result[f"recall_at_{self.top_k}"] = round(statistics.mean(hits), 4) if hits else None
+
+        print(
+            f"  {engine:>15}: p50 {result['p50_ms']}ms  p99 {result['p99_ms']}ms  "
+            f"{result['qps']} qps  build {result['build_s']}s  {result['memory_mb']} MB  "
+            f"recall@{self.top_k} {result.get(f'recall_at_{self.top_k}')}"
+        )
+        return result, answers
+
+    def run(self) -> Dict:
+        """Chạy tất cả kích thước gallery và engine"""
+        with tempfile.TemporaryDirectory(dir=self.work_dir) as tmp:
+            for size in self.sizes:
+                print(f"\n=== BENCHMARK: gallery {size:,} faces ===")
+                matrix, queries, generated = self._build_gallery(size, tmp)
+                print(f"  generated in {generated:.1f}s")
+
+                # Exact search is the ground truth for recall@k
+                order = ["exact"] + [engine for engine in self.engines if engine != "exact"]
+                truth = None
+                for engine in order:
+                    reason = self._skip_reason(engine, size, matrix)
+                    if reason:
+                        print(f"  {engine:>15}: skipped ({reason})")
+                        self.results["results"].append({"gallery_size": size, "engine": engine, "skipped": reason})
+                        continue
+                    result, answers = self._run_engine(engine, size, matrix, queries, truth)
+                    if engine == "exact":
+                        truth = answers
+                    if engine in self.engines:
+                        self.results["results"].append(result)
+
+                del matrix
+                gc.collect()
+
+        return self.results
+
+    def save_results(self, output_path: str):
+        """Lưu kết quả ra file JSON"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Results saved to: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency vs gallery size on synthetic embeddings")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="Comma-separated gallery sizes (up to 10000000)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Subset of {','.join(ENGINES)}")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--per-row-max", type=int, default=50000, help="Largest gallery for the per-row path")
+    parser.add_argument("--per-row-queries", type=int, default=10)
+    parser.add_argument("--max-memory-gb", type=float, default=2.0,
+                        help="Larger galleries are generated to a memmap; in-RAM indexes are skipped")
+    parser.add_argument("--work-dir", default=None, help="Directory for memmapped galleries")
+    parser.add_argument("--faces-per-identity", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(sorted(unknown))}")
+
+    benchmark = SearchScalabilityBenchmark(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        engines=engines,
+        queries=args.queries,
+        top_k=args.top_k,
+        per_row_max=args.per_row_max,
+        per_row_queries=args.per_row_queries,
+        max_memory_gb=args.max_memory_gb,
+        work_dir=args.work_dir,
+        faces_per_identity=args.faces_per_identity,
+        seed=args.seed
+    )
+    benchmark.run()
+
+    output_dir = Path(__file__).parent / "results"
+    output_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    benchmark.save_results(str(output_dir / f"search_scalability_{timestamp}.json"))
+
+
+if __name__ == "__main__":
+    main()
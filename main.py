@@ -10,14 +10,23 @@ if sys.platform == "win32":
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
+import time
 import uvicorn
 
 from app.core.config import get_settings
-from app.core.database import init_db
+from app.core.database import init_db, async_engine
+from app.core import metrics
+from app.core.tracing import get_tracer
+from app.core.write_queue import get_write_queue
 from app.api.routes import router
+from app.services.history_service import get_history_writer
+from app.models.face import DEFAULT_COLLECTION
+from app.services.identity_index import get_index_registry
+from app.services.retention_service import get_retention_manager
+from app.services.stats_service import get_stats_service
 
 # Get settings
 settings = get_settings()
@@ -40,6 +49,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    metrics.register_service_gauges()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        """Count requests and time them per route template"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route template keeps label cardinality bounded (/api/faces/{face_id})
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - start, (request.method, route))
+            metrics.HTTP_REQUESTS.inc((request.method, route, str(status)))
+
+if settings.TRACE_ENABLED:
+    @app.middleware("http")
+    async def tracing_middleware(request: Request, call_next):
+        """Span tree per request; slow requests are logged with their trace"""
+        tracer = get_tracer()
+        state = tracer.start(f"{request.method} {request.url.path}")
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Trace-Id"] = state[0].attrs["trace_id"]
+            return response
+        finally:
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            tracer.finish(state, method=request.method, route=route, status=status)
+
 # Create necessary directories
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 os.makedirs("database", exist_ok=True)
@@ -64,10 +107,28 @@ async def startup_event():
     """Initialize database on startup"""
     init_db()
     print(f"✅ Database initialized")
+    get_stats_service().load()
+    if settings.IDENTITY_INDEX_ENABLED:
+        index = get_index_registry().get(DEFAULT_COLLECTION)  # others load on first search
+        print(f"✅ Identity index '{DEFAULT_COLLECTION}' loaded ({index.get_stats()['identities']} identities)")
+    get_write_queue().start()
+    get_history_writer().start()
+    if settings.RETENTION_ENABLED:
+        get_retention_manager().start()
+        print(f"✅ Retention sweeper started (every {settings.RETENTION_SWEEP_INTERVAL}s)")
     print(f"✅ {settings.APP_NAME} v{settings.APP_VERSION} started")
     print(f"📝 API Documentation: http://{settings.HOST}:{settings.PORT}/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    get_retention_manager().stop()
+    get_history_writer().stop()
+    get_write_queue().stop()
+    await async_engine.dispose()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main page"""
@@ -84,6 +145,14 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Metrics in Prometheus text exposition format"""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     # Disable reload on Windows to avoid multiprocessing issues with SQLAlchemy
     # For development with auto-reload, use: uvicorn main:app --reload --host 0.0.0.0 --port 8000
@@ -1,6 +1,12 @@
 // API Base URL
 const API_BASE = '/api';
 
+// Preferred upload parameters (overridden by /api/upload-config)
+let uploadConfig = {
+    max_dimension: 1280,
+    jpeg_quality: 0.9
+};
+
 // Loading Modal Management - DISABLED
 function showLoading() {
     // Disabled - no loading modal
@@ -32,6 +38,82 @@ function showAlert(message, type = 'success', targetId = null) {
     }
 }
 
+// Prefer the cached thumbnail over the full-resolution upload
+function imageUrl(face) {
+    return face.thumbnail_url || `/${face.image_path}`;
+}
+
+// Load Upload Config
+async function loadUploadConfig() {
+    try {
+        const response = await fetch(`${API_BASE}/upload-config`);
+        const data = await response.json();
+        
+        if (data.success) {
+            uploadConfig = { ...uploadConfig, ...data.config };
+        }
+    } catch (error) {
+        console.error('Error loading upload config:', error);
+    }
+}
+
+// Load an image file with EXIF orientation applied
+function loadImageFile(file) {
+    if (window.createImageBitmap) {
+        return createImageBitmap(file, { imageOrientation: 'from-image' });
+    }
+    
+    return new Promise((resolve, reject) => {
+        const url = URL.createObjectURL(file);
+        const img = new Image();
+        img.onload = () => {
+            URL.revokeObjectURL(url);
+            resolve(img);
+        };
+        img.onerror = () => {
+            URL.revokeObjectURL(url);
+            reject(new Error('Cannot read image'));
+        };
+        img.src = url;
+    });
+}
+
+// Downscale and re-encode an image in the browser before upload
+async function prepareUpload(file) {
+    try {
+        const image = await loadImageFile(file);
+        const width = image.width;
+        const height = image.height;
+        const scale = Math.min(1, uploadConfig.max_dimension / Math.max(width, height));
+        
+        const canvas = document.createElement('canvas');
+        canvas.width = Math.round(width * scale);
+        canvas.height = Math.round(height * scale);
+        
+        const ctx = canvas.getContext('2d');
+        ctx.imageSmoothingQuality = 'high';
+        ctx.drawImage(image, 0, 0, canvas.width, canvas.height);
+        if (image.close) {
+            image.close();
+        }
+        
+        const blob = await new Promise(resolve => {
+            canvas.toBlob(resolve, 'image/jpeg', uploadConfig.jpeg_quality);
+        });
+        
+        // Keep the original if re-encoding does not help
+        if (!blob || (scale === 1 && blob.size >= file.size)) {
+            return file;
+        }
+        
+        const baseName = file.name.replace(/\.[^.]+$/, '');
+        return new File([blob], `${baseName}.jpg`, { type: 'image/jpeg' });
+    } catch (error) {
+        console.error('Error resizing image, uploading original:', error);
+        return file;
+    }
+}
+
 // Load Statistics
 async function loadStats() {
     try {
@@ -78,8 +160,15 @@ document.getElementById('detectForm').addEventListener('submit', async function(
         return;
     }
     
+    const saveImages = document.getElementById('detectSaveImages').checked;
+    
     const formData = new FormData();
-    formData.append('file', file);
+    formData.append('file', await prepareUpload(file));
+    // Rendered image and crops are only produced on explicit request
+    if (saveImages) {
+        formData.append('render', 'true');
+        formData.append('crop', 'true');
+    }
     
     // Disable submit button
     submitBtn.disabled = true;
@@ -96,7 +185,7 @@ document.getElementById('detectForm').addEventListener('submit', async function(
         const data = await response.json();
         
         if (response.ok && data.success) {
-            displayDetectionResult(data);
+            displayDetectionResult(data, file);
         } else {
             showAlert(data.detail || 'Error detecting faces', 'error', 'detectResult');
         }
@@ -112,7 +201,7 @@ document.getElementById('detectForm').addEventListener('submit', async function(
 });
 
 // Display Detection Result
-function displayDetectionResult(data) {
+function displayDetectionResult(data, file) {
     const resultDiv = document.getElementById('detectResult');
     
     let html = '';
@@ -133,49 +222,124 @@ function displayDetectionResult(data) {
         </div>
     `;
     
-    if (data.num_faces > 0 && data.detected_image) {
+    if (data.num_faces === 0) {
         html += `
-            <div class="text-center">
-                <img src="/${data.detected_image}" class="img-preview fade-in" alt="Detected faces">
-                <p class="mt-2 text-muted">
-                    <i class="bi bi-info-circle"></i> 
-                    Faces detected: ${data.num_faces}
-                </p>
+            <div class="empty-state">
+                <i class="bi bi-emoji-frown"></i>
+                <p>No faces detected in the image</p>
             </div>
         `;
-        
-        // Show cropped faces if available
-        if (data.cropped_faces && data.cropped_faces.length > 0) {
+        resultDiv.innerHTML = html;
+        return;
+    }
+    
+    // Server-rendered image if requested, otherwise draw boxes client-side
+    const imageHtml = data.detected_image
+        ? `<img src="/${data.detected_image}" class="img-preview fade-in" alt="Detected faces">`
+        : `<canvas id="detectCanvas" class="img-preview fade-in"></canvas>`;
+    
+    html += `
+        <div class="text-center">
+            ${imageHtml}
+            <p class="mt-2 text-muted">
+                <i class="bi bi-info-circle"></i> 
+                Faces detected: ${data.num_faces}
+            </p>
+        </div>
+        <div class="cropped-faces-container">
+            <h5 class="mt-3"><i class="bi bi-scissors"></i> Cropped Faces</h5>
+            <div class="row" id="detectCrops">
+    `;
+    
+    if (data.cropped_faces && data.cropped_faces.length > 0) {
+        data.cropped_faces.forEach((path, idx) => {
             html += `
-                <div class="cropped-faces-container">
-                    <h5 class="mt-3"><i class="bi bi-scissors"></i> Cropped Faces</h5>
-                    <div class="row">
+                <div class="col-md-4 mb-2">
+                    <img src="/${path}" class="img-thumbnail" alt="Face ${idx + 1}">
+                    <p class="text-center">Face ${idx + 1}</p>
+                </div>
             `;
+        });
+    }
+    
+    html += `
+            </div>
+        </div>
+    `;
+    
+    resultDiv.innerHTML = html;
+    
+    if (!data.detected_image || !data.cropped_faces || data.cropped_faces.length === 0) {
+        renderDetectionOverlay(data, file, !data.detected_image, data.cropped_faces.length === 0);
+    }
+}
+
+// Draw face boxes and crops from the local file (no server-side rendering)
+function renderDetectionOverlay(data, file, drawBoxes, drawCrops) {
+    const url = URL.createObjectURL(file);
+    const img = new Image();
+    
+    img.onload = function() {
+        if (drawBoxes) {
+            const canvas = document.getElementById('detectCanvas');
+            const ctx = canvas.getContext('2d');
+            canvas.width = img.naturalWidth;
+            canvas.height = img.naturalHeight;
+            ctx.drawImage(img, 0, 0);
             
-            data.cropped_faces.forEach((path, idx) => {
-                html += `
-                    <div class="col-md-4 mb-2">
-                        <img src="/${path}" class="img-thumbnail" alt="Face ${idx + 1}">
-                        <p class="text-center">Face ${idx + 1}</p>
-                    </div>
-                `;
+            // Boxes are in the coordinates of the decoded image
+            const scaleX = img.naturalWidth / (data.image_width || img.naturalWidth);
+            const scaleY = img.naturalHeight / (data.image_height || img.naturalHeight);
+            const lineWidth = Math.max(2, Math.round(img.naturalWidth / 300));
+            
+            ctx.strokeStyle = '#00ff00';
+            ctx.fillStyle = '#00ff00';
+            ctx.lineWidth = lineWidth;
+            ctx.font = `${lineWidth * 8}px sans-serif`;
+            
+            data.faces.forEach(face => {
+                const { x, y, w, h } = face.box;
+                ctx.strokeRect(x * scaleX, y * scaleY, w * scaleX, h * scaleY);
+                ctx.fillText(
+                    `Face ${(face.confidence * 100).toFixed(0)}%`,
+                    x * scaleX,
+                    Math.max(lineWidth * 8, y * scaleY - lineWidth * 2)
+                );
             });
+        }
+        
+        if (drawCrops) {
+            const cropsDiv = document.getElementById('detectCrops');
+            const scaleX = img.naturalWidth / (data.image_width || img.naturalWidth);
+            const scaleY = img.naturalHeight / (data.image_height || img.naturalHeight);
             
-            html += `
-                    </div>
-                </div>
-            `;
+            data.faces.forEach((face, idx) => {
+                const { x, y, w, h } = face.box;
+                const col = document.createElement('div');
+                col.className = 'col-md-4 mb-2';
+                
+                const crop = document.createElement('canvas');
+                crop.className = 'img-thumbnail';
+                crop.width = Math.max(1, Math.round(w * scaleX));
+                crop.height = Math.max(1, Math.round(h * scaleY));
+                crop.getContext('2d').drawImage(
+                    img, x * scaleX, y * scaleY, w * scaleX, h * scaleY, 0, 0, crop.width, crop.height
+                );
+                
+                const label = document.createElement('p');
+                label.className = 'text-center';
+                label.textContent = `Face ${idx + 1}`;
+                
+                col.appendChild(crop);
+                col.appendChild(label);
+                cropsDiv.appendChild(col);
+            });
         }
-    } else {
-        html += `
-            <div class="empty-state">
-                <i class="bi bi-emoji-frown"></i>
-                <p>No faces detected in the image</p>
-            </div>
-        `;
-    }
+        
+        URL.revokeObjectURL(url);
+    };
     
-    resultDiv.innerHTML = html;
+    img.src = url;
 }
 
 // Add Face Form
@@ -193,7 +357,7 @@ document.getElementById('addForm').addEventListener('submit', async function(e)
     }
     
     const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
+    formData.append('file', await prepareUpload(fileInput.files[0]));
     formData.append('name', name);
     if (description) {
         formData.append('description', description);
@@ -248,7 +412,7 @@ document.getElementById('searchForm').addEventListener('submit', async function(
     }
     
     const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
+    formData.append('file', await prepareUpload(fileInput.files[0]));
     formData.append('top_k', topK);
     
     // Disable submit button
@@ -311,7 +475,7 @@ function displaySearchResults(data) {
             <div class="result-card fade-in">
                 <div class="row align-items-center">
                     <div class="col-md-3 text-center">
-                        <img src="/${result.face.image_path}" class="result-image" alt="${result.face.name}">
+                        <img src="${imageUrl(result.face)}" class="result-image" alt="${result.face.name}" loading="lazy">
                     </div>
                     <div class="col-md-9">
                         <h5 class="mb-2">
@@ -341,16 +505,38 @@ function displaySearchResults(data) {
     resultsDiv.innerHTML = html;
 }
 
-// Load All Faces
+// Gallery pagination state (keyset cursor from /api/faces)
+let loadedFaces = [];
+let facesNextCursor = null;
+
+// Load All Faces (first page)
 async function loadFaces() {
+    loadedFaces = [];
+    facesNextCursor = null;
+    await fetchFacesPage(null);
+}
+
+// Load the next page of faces
+async function loadMoreFaces() {
+    if (facesNextCursor) {
+        await fetchFacesPage(facesNextCursor);
+    }
+}
+
+async function fetchFacesPage(cursor) {
     showLoading();
     
     try {
-        const response = await fetch(`${API_BASE}/faces`);
+        const url = cursor
+            ? `${API_BASE}/faces?cursor=${encodeURIComponent(cursor)}`
+            : `${API_BASE}/faces`;
+        const response = await fetch(url);
         const data = await response.json();
         
         if (response.ok && data.success) {
-            displayFaces(data.faces);
+            loadedFaces = loadedFaces.concat(data.faces);
+            facesNextCursor = data.next_cursor;
+            displayFaces(loadedFaces, Boolean(facesNextCursor));
         } else {
             showAlert('Error loading faces', 'error', 'facesList');
         }
@@ -364,7 +550,7 @@ async function loadFaces() {
 }
 
 // Display Faces
-function displayFaces(faces) {
+function displayFaces(faces, hasMore = false) {
     const facesDiv = document.getElementById('facesList');
     
     if (faces.length === 0) {
@@ -380,14 +566,15 @@ function displayFaces(faces) {
         return;
     }
     
-    let html = `<div class="mb-3"><strong><i class="bi bi-people"></i> Total: ${faces.length} face(s)</strong></div>`;
+    const total = hasMore ? `${faces.length}+` : faces.length;
+    let html = `<div class="mb-3"><strong><i class="bi bi-people"></i> Total: ${total} face(s)</strong></div>`;
     
     faces.forEach(face => {
         const createdDate = new Date(face.created_at).toLocaleString('vi-VN');
         
         html += `
             <div class="face-card fade-in">
-                <img src="/${face.image_path}" class="face-card-img" alt="${face.name}">
+                <img src="${imageUrl(face)}" class="face-card-img" alt="${face.name}" loading="lazy">
                 <div class="face-card-info">
                     <h6 class="mb-1">${face.name}</h6>
                     <p class="text-muted mb-1 small">${face.description || 'No description'}</p>
@@ -404,6 +591,16 @@ function displayFaces(faces) {
         `;
     });
     
+    if (hasMore) {
+        html += `
+            <div class="text-center mt-3">
+                <button class="btn btn-outline-primary" onclick="loadMoreFaces()">
+                    <i class="bi bi-chevron-down"></i> Load more
+                </button>
+            </div>
+        `;
+    }
+    
     facesDiv.innerHTML = html;
 }
 
@@ -444,8 +641,9 @@ document.addEventListener('DOMContentLoaded', function() {
     setupImagePreview('searchImage', 'searchPreview');
     setupImagePreview('batchImage', 'batchPreview');
     
-    // Load initial stats
+    // Load initial stats and preferred upload size
     loadStats();
+    loadUploadConfig();
     
     // Load faces when manage tab is shown
     document.getElementById('manage-tab').addEventListener('click', loadFaces);
@@ -476,7 +674,7 @@ document.getElementById('batchAddForm').addEventListener('submit', async functio
     }
     
     const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
+    formData.append('file', await prepareUpload(fileInput.files[0]));
     formData.append('names', names);
     
     // Disable submit button